@@ -1,12 +1,212 @@
 """
 This module contains the (Last-Write-Wins)LWW-element-graph class from (Conflict-free Replicated Data Types) CRDT
 """
+import sys
 import time
 import logging
+from collections import Counter, namedtuple
 
-logging.basicConfig(format='%(filename)s - %(levelname)s - %(asctime)s %(message)s',
-                    datefmt='%m/%d/%Y %I:%M:%S %p',
-                    level=logging.DEBUG)
+import lww_element_graph_numpy as vectorized
+from lww_element_graph_cache import MISS
+
+logger = logging.getLogger(__name__)
+
+
+LWW_SETS = ('add_vertex_set', 'remove_vertex_set', 'add_edge_set', 'remove_edge_set')
+
+Delta = namedtuple('Delta', ('version',) + LWW_SETS)
+Delta.__doc__ = """
+Join-decomposition of a graph state: the entries of the four timestamp sets written after some version.
+A delta can be applied to any replica with merge_delta, exactly like a full graph can be merged with merge.
+"""
+
+StateChunk = namedtuple('StateChunk', ('kind', 'rows'))
+StateChunk.__doc__ = """
+Bounded part of the state of a graph, see iter_state: kind is 'vertices' or 'edges' and rows is a list of
+(element, add timestamp, remove timestamp), None standing for an absent timestamp.
+"""
+
+BatchResult = namedtuple('BatchResult', ('operations', 'changed_vertices', 'changed_edges', 'rejected'))
+
+BATCH_OPERATIONS = {
+    'add_vertex': 'add_vertex_set',
+    'remove_vertex': 'remove_vertex_set',
+    'add_edge': 'add_edge_set',
+    'remove_edge': 'remove_edge_set',
+}
+EDGE_OPERATIONS = frozenset(('add_edge', 'remove_edge'))
+# fraction of the digest buckets up to which merge only merges the diverging buckets, see LWW_Element_Graph.merge
+DIGEST_MERGE_LIMIT = 0.125
+
+EVENTS = ('vertex_added', 'vertex_exists', 'vertex_removed', 'vertex_missing',
+          'edge_added', 'edge_exists', 'edge_removed', 'edge_missing', 'invalid_vertices', 'biased_towards_add')
+
+
+class EventCounter(Counter):
+    """
+    Listener counting the events of a graph, see LWW_Element_Graph.subscribe.
+    """
+
+    def __call__(self, event, element, timestamp):
+        self[event] += 1
+
+
+def log_event(event, element, timestamp):
+    """
+    Listener logging the events of a graph at DEBUG level, see LWW_Element_Graph.subscribe.
+    """
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug('%s %r at %r', event, element, timestamp)
+
+
+GarbageCollection = namedtuple('GarbageCollection', ('vertices', 'edges', 'tombstones', 'bytes_reclaimed'))
+
+
+def breadth_first_levels(successors, start, max_depth=None) -> dict:
+    """
+    Iterative breadth first search from start.
+    :param successors: dict of vertex to the iterable of its live neighbours.
+    :param start: start vertex.
+    :param max_depth: stop after this many hops, None to visit everything reachable.
+    :return: dict of vertex to number of hops from start.
+    """
+    depths = {start: 0}
+    level = [start]
+    depth = 0
+    while level and (max_depth is None or depth < max_depth):
+        depth += 1
+        next_level = []
+        for vertex in level:
+            for neighbour in successors[vertex]:
+                if neighbour not in depths:
+                    depths[neighbour] = depth
+                    next_level.append(neighbour)
+        level = next_level
+    return depths
+
+
+def bidirectional_path(successors, predecessors, start, end, excluded=()):
+    """
+    Shortest path between start and end with a breadth first search run from both ends at once,
+    always expanding the smaller frontier. Both searches keep a parent pointer for every visited vertex.
+    :param successors: dict of vertex to the iterable of its live out-neighbours.
+    :param predecessors: dict of vertex to the iterable of its live in-neighbours.
+    :param start: start vertex.
+    :param end: end vertex.
+    :param excluded: vertices which must not be visited.
+    :return: list of vertices from start to end if a path is found else None.
+    """
+    if start == end:
+        return [start]
+    forward_parents = {start: None}
+    backward_parents = {end: None}
+    forward = [start]
+    backward = [end]
+    while forward and backward:
+        if len(forward) <= len(backward):
+            frontier, neighbours, parents, others = forward, successors, forward_parents, backward_parents
+        else:
+            frontier, neighbours, parents, others = backward, predecessors, backward_parents, forward_parents
+        next_level = []
+        for vertex in frontier:
+            for neighbour in neighbours[vertex]:
+                if neighbour in parents or neighbour in excluded:
+                    continue
+                parents[neighbour] = vertex
+                if neighbour in others:
+                    return _join_paths(forward_parents, backward_parents, neighbour)
+                next_level.append(neighbour)
+        if frontier is forward:
+            forward = next_level
+        else:
+            backward = next_level
+    return None
+
+
+def _join_paths(forward_parents, backward_parents, meeting):
+    """
+    Follows the parent pointers of both searches from the vertex where they met.
+    :return: list of vertices from start to end.
+    """
+    path = []
+    vertex = meeting
+    while vertex is not None:
+        path.append(vertex)
+        vertex = forward_parents[vertex]
+    path.reverse()
+    vertex = backward_parents[meeting]
+    while vertex is not None:
+        path.append(vertex)
+        vertex = backward_parents[vertex]
+    return path
+
+
+def connected_components(adjacency_list) -> list:
+    """
+    Connected components of an undirected adjacency list.
+    :param adjacency_list: dict of vertex to the iterable of its live neighbours.
+    :return: list of sets of vertices.
+    """
+    components = []
+    visited = set()
+    for vertex in adjacency_list:
+        if vertex not in visited:
+            component = breadth_first_levels(adjacency_list, vertex).keys()
+            visited.update(component)
+            components.append(set(component))
+    return components
+
+
+def canonical_edge(edge) -> tuple:
+    """
+    Key of an undirected edge: its two vertices in increasing order, the label of a labeled edge staying last.
+    Vertices which do not compare, being of different types or only partially ordered like sets, are ordered by
+    their repr, the same on every replica, so the key of (a, b) and (b, a) is the same and keying a key keeps it.
+    :param edge: tuple of vertices, optionally followed by a label.
+    :return: tuple
+    """
+    first, second = edge[0], edge[1]
+    try:
+        ordered = first <= second
+        if not ordered and not second <= first:
+            ordered = repr(first) <= repr(second)
+    except TypeError:
+        ordered = repr(first) <= repr(second)
+    return edge if ordered else (second, first) + edge[2:]
+
+
+def labeled_edge(edge) -> tuple:
+    """
+    Key of a directed labeled edge, the edge itself once checked.
+    :param edge: tuple of the two vertices and the label.
+    :return: tuple
+    """
+    if type(edge) is not tuple or len(edge) != 3:
+        raise TypeError('labeled edges are (first, second, label) tuples, got %r' % (edge,))
+    return edge
+
+
+def canonical_labeled_edge(edge) -> tuple:
+    """
+    Key of an undirected labeled edge, see canonical_edge.
+    """
+    return canonical_edge(labeled_edge(edge))
+
+
+class UndirectedView:
+    """
+    Neighbours of every vertex of a directed graph, ignoring the direction of the edges, for the breadth first searches.
+    """
+
+    def __init__(self, successors, predecessors):
+        self.successors = successors
+        self.predecessors = predecessors
+
+    def __iter__(self):
+        return iter(self.successors)
+
+    def __getitem__(self, vertex):
+        return self.successors[vertex] | self.predecessors[vertex]
 
 
 class LWW_Element_Graph:
@@ -19,47 +219,161 @@ class LWW_Element_Graph:
     remove_vertex_set = None
     remove_edge_set = None
 
-    def __init__(self, adjacency_list):
-        self.add_vertex_set = {}
-        self.remove_vertex_set = {}
-        self.add_edge_set = {}
-        self.remove_edge_set = {}
+    def __init__(self, adjacency_list, delta_mode=False, compact=False, clock=None, directed=None, multi=False):
+        # adjacency_list holds a set of live neighbours for every live vertex, incident_edges indexes
+        # every edge ever added by both of its endpoints so a vertex can be (re)linked in O(deg).
+        # directed=None keys the edges as given and links both of their vertices to each other, directed=False
+        # keys the edges canonically, see canonical_edge, directed=True keeps (a, b) and (b, a) apart and links
+        # the vertices one way: adjacency_list holds the successors and predecessors the predecessors.
+        # multi=True keys the edges by (first, second, label), the vertices are neighbours while any is live.
+        if multi and compact:
+            raise ValueError('labeled edges need the dict storage, compact storage only holds pairs of vertices')
+        self.directed = directed
+        self.multi = multi
+        # function turning the edges given to the operations into their keys, None to key them as given
+        if directed is False:
+            self.edge_key = canonical_labeled_edge if multi else canonical_edge
+        else:
+            self.edge_key = labeled_edge if multi else None
+        if compact:
+            # array columns of lww_element_graph_compact behind the dict API, they index the edges themselves
+            from lww_element_graph_compact import compact_storage
+            (self.add_vertex_set, self.remove_vertex_set, self.add_edge_set, self.remove_edge_set,
+             self.incident_edges) = compact_storage(getattr(clock, 'typecode', 'd'))
+        else:
+            self.add_vertex_set = {}
+            self.remove_vertex_set = {}
+            self.add_edge_set = {}
+            self.remove_edge_set = {}
+            self.incident_edges = {}
         self.adjacency_list = adjacency_list
+        for vertex in adjacency_list:
+            adjacency_list[vertex] = set(adjacency_list[vertex])
+        # live in-neighbours of every live vertex of a directed graph, the adjacency list itself otherwise
+        self.predecessors = adjacency_list
+        if directed:
+            self.predecessors = {vertex: set() for vertex in adjacency_list}
+            for vertex, neighbours in adjacency_list.items():
+                for neighbour in neighbours:
+                    self.predecessors.setdefault(neighbour, set()).add(vertex)
+        self.live_edge_set = set()
+        # version counts every write into the four timestamp sets, the delta buffer keeps the
+        # (set name, element) written at versions delta_base + 1 .. version when delta mode is on.
+        self.version = 0
+        self.delta_base = 0
+        self.delta_buffer = [] if delta_mode else None
+        # OperationLog of lww_element_graph_wal receiving every write, see OperationLog.recover
+        self.operation_log = None
+        # callables notified of the outcome of every single operation, see subscribe
+        self.listeners = ()
+        # RangeDigest of lww_element_graph_digest kept up to date by every write, see enable_digest
+        self.digest = None
+        # clock of lww_element_graph_clock issuing the timestamps of the operations called without one,
+        # None to take the timestamps of the callers
+        self.clock = clock
+        # GraphMetrics of lww_element_graph_metrics timing the operations, see enable_metrics
+        self.metrics = None
+        # QueryCache of lww_element_graph_cache told of every change of the adjacency list, see enable_cache
+        self.cache = None
+        # CopyOnWrite of lww_element_graph_cow while containers are shared with snapshots, see snapshot
+        self.cow = None
+        # Partition of lww_element_graph_partition the merges are restricted to, see restrict
+        self.partition = None
 
     def __str__(self):
         """
         :return: string -- returns adjacency list as a string.
         """
-        string = ''
-        for j in self.adjacency_list:
-            string += str(j) + ':\t' + str(self.adjacency_list[j]) + '\n'
-        return string
+        return ''.join(['%s:\t%s\n' % (vertex, neighbours) for vertex, neighbours in self.adjacency_list.items()])
+
+    def subscribe(self, listener):
+        """
+        This method registers a listener called as listener(event, element, timestamp) after every add_vertex,
+        add_edge, remove_vertex and remove_edge, event being one of EVENTS.
+        Nothing is done per operation while no listener is registered.
+        :param listener: callable, e.g. an EventCounter or log_event.
+        :return: the listener.
+        """
+        self.listeners += (listener,)
+        return listener
+
+    def unsubscribe(self, listener):
+        """
+        This method removes a listener registered with subscribe.
+        :param listener: registered callable.
+        """
+        self.listeners = tuple(registered for registered in self.listeners if registered is not listener)
+
+    def _emit(self, event, element, timestamp):
+        """
+        Notifies the listeners of an event.
+        """
+        for listener in self.listeners:
+            listener(event, element, timestamp)
+
+    def _error(self, operation, error):
+        """
+        Logs the error of an operation rejecting its input, and counts it in the metrics of the graph.
+        :param operation: name of the operation.
+        :param error: exception caught by the operation.
+        """
+        logger.error(str(error))
+        if self.metrics is not None:
+            self.metrics.count_error(operation)
+
+    def _timestamp(self, timestamp):
+        """
+        :param timestamp: timestamp given to an operation, None to issue one.
+        :return: timestamp of the operation, issued by the clock (or time.time() without clock) when None,
+                 else the given timestamp, observed by the clock.
+        """
+        if timestamp is None:
+            return time.time() if self.clock is None else self.clock.now()
+        if self.clock is not None:
+            self.clock.observe(timestamp)
+        return timestamp
+
+    def _store(self, lww_set, element, timestamp):
+        """
+        Writes timestamp of the element in one of the four timestamp sets and records the write in the delta buffer.
+        :param lww_set: name of the timestamp set, one of LWW_SETS.
+        :param element: vertex or edge.
+        :param timestamp: timestamp to store.
+        """
+        timestamps = getattr(self, lww_set)
+        if self.operation_log is not None:
+            self.operation_log.append(lww_set, element, timestamp)
+        if self.digest is not None:
+            self.digest.update(lww_set, element, timestamps.get(element), timestamp)
+        timestamps[element] = timestamp
+        self.version += 1
+        if self.delta_buffer is not None:
+            self.delta_buffer.append((lww_set, element))
 
     def check_edge_exists(self, edge) -> bool:
         """
-        Checks if edge already exists in the graph.
-        :param edge: integer
+        Checks if edge already exists in the graph: both vertices exist and the edge is in add_set,
+        and either not in remove_set or removed before (or when) it was added.
+        Looked up in the live edges, kept up to date by every write.
+        :param edge: tuple of vertices, (first, second, label) in a multi-edge graph.
         :return: boolean
         """
-        if self.check_vertex_exists(edge[0]) and self.check_vertex_exists(edge[1]):
-            if edge not in self.add_edge_set:
-                # Element not in add_set
-                return False
-            elif edge not in self.remove_edge_set:
-                # Element in add_set and not in remove_set
-                return True
-            elif self.remove_edge_set[edge] <= self.add_edge_set[edge]:
-                # Element in both add_set and remove_set, but addition is after removal
-                return True
-            else:
-                return False
-        else:
-            # Element in both add_set and remove_set, but addition is before removal
-            return False
+        if self.edge_key is not None:
+            edge = self.edge_key(edge)
+        return edge in self.live_edge_set
 
     def check_vertex_exists(self, vertex) -> bool:
         """
         Checks if vertex exists in the graph.
+        Looked up in the adjacency list, which holds exactly the live vertices.
+        :param vertex: integer
+        :return: boolean
+        """
+        return vertex in self.adjacency_list
+
+    def _vertex_alive(self, vertex) -> bool:
+        """
+        Checks the timestamps of the vertex.
         :param vertex: integer
         :return: boolean
         """
@@ -79,136 +393,274 @@ class LWW_Element_Graph:
             # Element in both add_set and remove_set, but addition is before removal
             return False
 
-    def add_vertex(self, vertex, timestamp):
+    def __len__(self) -> int:
+        """
+        :return: number of vertices in the graph.
+        """
+        return len(self.adjacency_list)
+
+    def __contains__(self, vertex) -> bool:
+        """
+        :return: True if the vertex is in the graph.
+        """
+        return vertex in self.adjacency_list
+
+    def vertex_count(self) -> int:
+        """
+        :return: number of vertices in the graph.
+        """
+        return len(self.adjacency_list)
+
+    def edge_count(self) -> int:
+        """
+        :return: number of edges in the graph.
+        """
+        return len(self.live_edge_set)
+
+    def live_vertices(self):
+        """
+        This method returns a read-only view of the vertices present in the graph, nothing is copied.
+        The view follows the changes of the graph and can not be iterated while the graph changes.
+        A view taken before a snapshot stops following the graph on its next change, see snapshot.
+        :return: keys view of the vertices.
+        """
+        return self.adjacency_list.keys()
+
+    def live_edges(self):
+        """
+        This method iterates over the edges present in the graph, nothing is copied.
+        The graph must not change during the iteration.
+        :return: iterator of edges.
+        """
+        return iter(self.live_edge_set)
+
+    def iter_vertices(self):
+        """
+        This method yields the vertices present in the graph one by one, without building a list.
+        The graph must not change during the iteration.
+        :return: generator of vertices.
+        """
+        yield from self.adjacency_list
+
+    def iter_edges(self):
+        """
+        This method yields the edges present in the graph one by one, without building a list.
+        The graph must not change during the iteration.
+        :return: generator of edges.
+        """
+        yield from self.live_edge_set
+
+    def iter_state(self, chunk_size=10000):
+        """
+        This method yields the whole state of the graph, the vertices then the edges, in chunks of at most
+        chunk_size rows, so it can be written to a file or a socket without a copy of the state.
+        The graph must not change during the iteration.
+        :param chunk_size: maximum number of rows in a chunk, at least 1.
+        :return: generator of StateChunk, to rebuild the graph with load_stream.
+        """
+        if chunk_size < 1:
+            raise ValueError('chunk size must be at least 1, got %r' % (chunk_size,))
+        return self._state_chunks(chunk_size)
+
+    def _state_chunks(self, chunk_size):
+        """
+        Generator of iter_state, once its chunk size is checked.
+        """
+        for kind, add_name, remove_name in (('vertices', 'add_vertex_set', 'remove_vertex_set'),
+                                            ('edges', 'add_edge_set', 'remove_edge_set')):
+            add_set, remove_set = getattr(self, add_name), getattr(self, remove_name)
+            rows = []
+            for element, added in add_set.items():
+                rows.append((element, added, remove_set.get(element)))
+                if len(rows) == chunk_size:
+                    yield StateChunk(kind, rows)
+                    rows = []
+            for element, removed in remove_set.items():
+                if element not in add_set:
+                    rows.append((element, None, removed))
+                    if len(rows) == chunk_size:
+                        yield StateChunk(kind, rows)
+                        rows = []
+            if rows:
+                yield StateChunk(kind, rows)
+
+    def load_stream(self, chunks):
+        """
+        This method merges the chunks yielded by iter_state of another graph, one chunk at a time.
+        Every chunk is merged by merge_delta, so a graph restricted to a partition (see restrict) only keeps its
+        sub-state. The edges come after the vertices, the entries of the vertices outside of the partition wait
+        for them, then only the ones linked to the partition by an edge are merged.
+        :param chunks: iterable of StateChunk, or of (kind, rows) tuples.
+        :return: merged [LWWElementGraph]
+        """
+        try:
+            outside = Delta(None, {}, {}, {}, {}) if self.partition is not None else None
+            for kind, rows in chunks:
+                if kind not in ('vertices', 'edges'):
+                    raise ValueError('unknown chunk kind %r' % (kind,))
+                delta = Delta(None, {}, {}, {}, {})
+                add_set, remove_set = (delta.add_vertex_set, delta.remove_vertex_set) if kind == 'vertices' else \
+                    (delta.add_edge_set, delta.remove_edge_set)
+                for element, added, removed in rows:
+                    if added is not None:
+                        add_set[element] = added
+                    if removed is not None:
+                        remove_set[element] = removed
+                if outside is not None and kind == 'vertices':
+                    for lww_set in ('add_vertex_set', 'remove_vertex_set'):
+                        entries, waiting = getattr(delta, lww_set), getattr(outside, lww_set)
+                        for vertex in [vertex for vertex in entries if not self.partition.contains(vertex)]:
+                            waiting[vertex] = entries.pop(vertex)
+                if self.merge_delta(delta) is None:
+                    return None
+            if outside is not None and self.merge_delta(outside) is None:
+                return None
+            return self
+        except TypeError as error:
+            self._error('load_stream', error)
+
+    def add_vertex(self, vertex, timestamp=None):
         """
         Add vertex in the LWW-graph with the given timestamp.
+        Without clock, the timestamp is moved up to the current time.
         :param vertex: integer
-        :param timestamp: string
+        :param timestamp: timestamp of adding the vertex, issued by the clock of the graph when None.
         :return: True if success else False
         """
         try:
-            current_timestamp = time.time()
+            timestamp = self._timestamp(timestamp)
+            current_timestamp = time.time() if self.clock is None else timestamp
             if self.check_vertex_exists(vertex):
-                logging.info("vertex already exists")
+                if self.listeners:
+                    self._emit('vertex_exists', vertex, timestamp)
                 return False
             else:
                 if vertex in self.remove_vertex_set:
                     if self.remove_vertex_set[vertex] <= timestamp:
                         if timestamp < current_timestamp:
                             timestamp = current_timestamp
-                        self.add_vertex_set[vertex] = timestamp
-                        self.adjacency_list[vertex] = []
+                        self._store('add_vertex_set', vertex, timestamp)
+                        self._refresh_vertex(vertex)
+                        if self.listeners:
+                            self._emit('vertex_added', vertex, timestamp)
                         return True
                 else:
                     if timestamp < current_timestamp:
                         timestamp = current_timestamp
-                    self.add_vertex_set[vertex] = timestamp
-                    self.adjacency_list[vertex] = []
+                    self._store('add_vertex_set', vertex, timestamp)
+                    self._refresh_vertex(vertex)
+                    if self.listeners:
+                        self._emit('vertex_added', vertex, timestamp)
                     return True
         except TypeError as error:
-            logging.error(str(error))
+            self._error('add_vertex', error)
 
-    def add_edge(self, pair_tuple, timestamp):
+    def add_edge(self, pair_tuple, timestamp=None):
         """
         Add edge in the graph with the given timestamp.
-        :param pair_tuple: tuple of vertex in between new edge will be added
-        :param timestamp: timestamp of adding new edge
+        :param pair_tuple: tuple of vertex in between new edge will be added, (first, second, label) in a
+                           multi-edge graph.
+        :param timestamp: timestamp of adding new edge, issued by the clock of the graph when None.
         :return: True if success else False
         """
         try:
+            if self.edge_key is not None:
+                pair_tuple = self.edge_key(pair_tuple)
+            timestamp = self._timestamp(timestamp)
             if self.check_vertex_exists(pair_tuple[0]) and self.check_vertex_exists(pair_tuple[1]):
-                if not self.check_edge_exists(pair_tuple):
-                    if pair_tuple in self.add_edge_set:
-                        self.add_edge_set[pair_tuple] = timestamp
-                        self.adjacency_list[pair_tuple[0]].append(pair_tuple[1])
-                        self.adjacency_list[pair_tuple[1]].append(pair_tuple[0])
-                        logging.info("edge added successfully.")
-                        return True
-                    else:
-                        self.add_edge_set[pair_tuple] = timestamp
-                        self.adjacency_list[pair_tuple[0]].append(pair_tuple[1])
-                        self.adjacency_list[pair_tuple[1]].append(pair_tuple[0])
-                        logging.info("edge added successfully.")
-                        return True
+                if pair_tuple not in self.live_edge_set:
+                    self._store('add_edge_set', pair_tuple, timestamp)
+                    self._refresh_edge(pair_tuple)
+                    if self.listeners:
+                        self._emit('edge_added', pair_tuple, timestamp)
+                    return True
                 else:
-                    logging.info("edge already exists.")
+                    if self.listeners:
+                        self._emit('edge_exists', pair_tuple, timestamp)
                     return False
             else:
-                logging.info("invalid vertices.")
+                if self.listeners:
+                    self._emit('invalid_vertices', pair_tuple, timestamp)
                 return False
         except TypeError as error:
-            logging.error(str(error))
+            self._error('add_edge', error)
 
-    def remove_vertex(self, vertex, timestamp):
+    def remove_vertex(self, vertex, timestamp=None):
         """
         Removes vertex from the graph by following LWW methodology.
         This function is biased towards add operation.
         :param vertex: integer value of vertex.
-        :param timestamp: timestamp of vertex removal from the graph.
+        :param timestamp: timestamp of vertex removal from the graph, issued by the clock of the graph when None.
         :return: True if success else False.
         """
         try:
+            timestamp = self._timestamp(timestamp)
             if self.check_vertex_exists(vertex):
                 if vertex in self.remove_vertex_set:
                     if self.remove_vertex_set[vertex] < timestamp:
-                        self.remove_vertex_set[vertex] = timestamp
+                        self._store('remove_vertex_set', vertex, timestamp)
                 else:
-                    self.remove_vertex_set[vertex] = timestamp
+                    self._store('remove_vertex_set', vertex, timestamp)
                 if self.remove_vertex_set[vertex] > self.add_vertex_set[vertex]:
-                    for j in self.adjacency_list:
-                        if vertex in self.adjacency_list[j]:
-                            self.adjacency_list[j].remove(vertex)
-                    self.adjacency_list.pop(vertex)
-                    logging.info("vertex removed successfully.")
+                    self._refresh_vertex(vertex)
+                    if self.listeners:
+                        self._emit('vertex_removed', vertex, timestamp)
                     return True
                 else:
-                    self.remove_vertex_set[vertex] = timestamp
-                    logging.info("biased towards add.")
+                    if self.listeners:
+                        self._emit('biased_towards_add', vertex, timestamp)
                     return False
             else:
                 if vertex in self.remove_vertex_set:
                     if self.remove_vertex_set[vertex] < timestamp:
-                        self.remove_vertex_set[vertex] = timestamp
+                        self._store('remove_vertex_set', vertex, timestamp)
                 else:
-                    self.remove_vertex_set[vertex] = timestamp
-                logging.info("vertex does not exists.")
+                    self._store('remove_vertex_set', vertex, timestamp)
+                if self.listeners:
+                    self._emit('vertex_missing', vertex, timestamp)
                 return False
         except TypeError as error:
-            logging.error(str(error))
+            self._error('remove_vertex', error)
 
-    def remove_edge(self, edge, timestamp):
+    def remove_edge(self, edge, timestamp=None):
         """
         Removes edge from the graph by following LWW methodology.
         This function is biased towards add operation.
-        :param edge:
-        :param timestamp: timestamp of edge removal from the graph.
+        :param edge: tuple of vertices, (first, second, label) in a multi-edge graph.
+        :param timestamp: timestamp of edge removal from the graph, issued by the clock of the graph when None.
         :return: True if success else False.
         """
         try:
-            if self.check_edge_exists(edge):
+            if self.edge_key is not None:
+                edge = self.edge_key(edge)
+            timestamp = self._timestamp(timestamp)
+            # the edge is keyed already, check_edge_exists would key it again
+            if edge in self.live_edge_set:
                 if edge in self.remove_edge_set:
                     if self.remove_edge_set[edge] < timestamp:
-                        self.remove_edge_set[edge] = timestamp
+                        self._store('remove_edge_set', edge, timestamp)
                 else:
-                    self.remove_edge_set[edge] = timestamp
+                    self._store('remove_edge_set', edge, timestamp)
                 if self.remove_edge_set[edge] > self.add_edge_set[edge]:
-                    self.adjacency_list[edge[0]].remove(edge[1])
-                    self.adjacency_list[edge[1]].remove(edge[0])
-                    logging.info("edge removed successfully.")
+                    self._refresh_edge(edge)
+                    if self.listeners:
+                        self._emit('edge_removed', edge, timestamp)
                     return True
                 else:
-                    logging.info('biased towards add.')
+                    if self.listeners:
+                        self._emit('biased_towards_add', edge, timestamp)
                     return False
             else:
                 if edge in self.remove_edge_set:
                     if self.remove_edge_set[edge] < timestamp:
-                        self.remove_edge_set[edge] = timestamp
+                        self._store('remove_edge_set', edge, timestamp)
                 else:
-                    self.remove_edge_set[edge] = timestamp
-                logging.info("edge doesnt exist")
+                    self._store('remove_edge_set', edge, timestamp)
+                if self.listeners:
+                    self._emit('edge_missing', edge, timestamp)
                 return False
         except TypeError as error:
-            logging.error(str(error))
+            self._error('remove_edge', error)
 
     def get_vertices(self) -> list:
         """
@@ -216,79 +668,697 @@ class LWW_Element_Graph:
         Biased towards add operation
         :return: list of vertices.
         """
-        try:
-            vertices = []
-            for vertex in self.add_vertex_set:
-                if (vertex not in self.remove_vertex_set) or \
-                        (self.add_vertex_set[vertex] >= self.remove_vertex_set[vertex]):
-                    vertices.append(vertex)
-            return vertices
-        except TypeError as error:
-            logging.error(str(error))
+        return list(self.adjacency_list)
 
     def query_vertices(self, vertex):
         """
-        This method queries the graph and return all vertices of the given vertex.
+        This method queries the graph and return all vertices of the given vertex, its successors in a directed graph.
         :param vertex: integer value of vertex.
         :return: all the vertices of the vertex if valid vertex is passed else None.
         """
         try:
+            cache = self.cache
+            if cache is not None:
+                key = ('query_vertices', vertex)
+                neighbours = cache.get(key)
+                if neighbours is MISS:
+                    neighbours = tuple(self.adjacency_list[vertex]) if self.check_vertex_exists(vertex) else None
+                    cache.put(key, neighbours, (vertex,))
+                return None if neighbours is None else list(neighbours)
             if self.check_vertex_exists(vertex):
-                return self.adjacency_list[vertex]
+                return list(self.adjacency_list[vertex])
             return None
         except TypeError as error:
-            logging.error(str(error))
+            self._error('query_vertices', error)
+
+    def query_predecessors(self, vertex):
+        """
+        This method returns the vertices with an edge to the given vertex in a directed graph, all the vertices
+        of the vertex otherwise, like query_vertices.
+        :param vertex: integer value of vertex.
+        :return: list of vertices if valid vertex is passed else None.
+        """
+        try:
+            if self.check_vertex_exists(vertex):
+                return list(self.predecessors[vertex])
+            return None
+        except TypeError as error:
+            self._error('query_predecessors', error)
 
     def find_path(self, start, end, path=None):
         """
-        This method finds the path between two vertexes of the graph.
+        This method finds the shortest path between two vertexes of the graph.
         :param start: start vertex.
         :param end: end vertex.
-        :param path: path list.
+        :param path: path list, its vertices are not visited again and it is prepended to the found path.
         :return: path between two vertices if it is found else None.
         """
         try:
-            if path is None:
-                path = []
+            path = path or []
+            cache = self.cache
+            if cache is not None:
+                key = ('find_path', start, end, tuple(path))
+                found = cache.get(key)
+                if found is MISS:
+                    found = None
+                    if self.check_vertex_exists(start) and self.check_vertex_exists(end):
+                        found = bidirectional_path(self.adjacency_list, self.predecessors, start, end, set(path))
+                    found = None if found is None else tuple(found)
+                    cache.put(key, found, found or (), link_sensitive=True)
+                return None if found is None else path + list(found)
             if self.check_vertex_exists(start) and self.check_vertex_exists(end):
-                path = path + [start]
-                if start == end:
-                    return path
-                if start not in self.adjacency_list:
-                    return None
-                for node in self.adjacency_list[start]:
-                    if node not in path:
-                        new_path = self.find_path(node, end, path)
-                        if new_path:
-                            return new_path
-                return None
+                found = bidirectional_path(self.adjacency_list, self.predecessors, start, end, set(path))
+                if found is not None:
+                    return path + found
             return None
         except TypeError as error:
-            logging.error(str(error))
+            self._error('find_path', error)
+
+    def shortest_path(self, start, end):
+        """
+        This method finds the shortest path between two vertexes of the graph with a breadth first search.
+        :param start: start vertex.
+        :param end: end vertex.
+        :return: list of vertices from start to end if a path is found else None.
+        """
+        return self.find_path(start, end)
+
+    def is_reachable(self, start, end) -> bool:
+        """
+        This method checks if there is a path between two vertexes of the graph.
+        :param start: start vertex.
+        :param end: end vertex.
+        :return: boolean
+        """
+        return self.find_path(start, end) is not None
+
+    def distances(self, start, max_depth=None) -> dict:
+        """
+        This method returns the number of hops from the start vertex to every vertex reachable from it,
+        following the direction of the edges in a directed graph.
+        :param start: start vertex.
+        :param max_depth: stop after this many hops, None to visit the whole component.
+        :return: dict of vertex to number of hops, empty if start is not in the graph.
+        """
+        try:
+            if self.check_vertex_exists(start):
+                return breadth_first_levels(self.adjacency_list, start, max_depth)
+            return {}
+        except TypeError as error:
+            self._error('distances', error)
+
+    def connected_component(self, vertex) -> set:
+        """
+        This method returns the vertices connected to the given vertex, including itself, whatever the direction
+        of the edges.
+        :param vertex: vertex of the component.
+        :return: set of vertices, empty if the vertex is not in the graph.
+        """
+        try:
+            if self.check_vertex_exists(vertex):
+                return set(breadth_first_levels(self._undirected(), vertex))
+        except TypeError as error:
+            self._error('connected_component', error)
+        return set()
+
+    def connected_components(self) -> list:
+        """
+        This method returns the connected components of the graph, weakly connected in a directed graph.
+        :return: list of sets of vertices.
+        """
+        return connected_components(self._undirected())
+
+    def _undirected(self):
+        """
+        :return: dict of vertex to its neighbours whatever the direction of the edges.
+        """
+        return UndirectedView(self.adjacency_list, self.predecessors) if self.directed else self.adjacency_list
 
     def merge(self, lww_element_graph):
         """
         This method merges the given graph with current graph.
-        For merging within a (add/remove) set, preference is given to latest timestamp
+        For merging within a (add/remove) set, preference is given to latest timestamp,
+        the adjacency list is then updated for the vertices and edges whose timestamps changed.
+        When both graphs have a digest of the same shape (see enable_digest), only the entries of the buckets
+        where the digests differ are merged, so the cost follows the divergence rather than the graph size;
+        past DIGEST_MERGE_LIMIT of the buckets the whole graph is merged, which is cheaper then.
         :param lww_element_graph {LWWElementGraph} -- set to merge with current graph.
         :return: merged [LWWElementGraph]
         """
         try:
-            self.merge_sets(self.add_vertex_set, lww_element_graph.add_vertex_set)
-            self.merge_sets(self.remove_vertex_set, lww_element_graph.remove_vertex_set)
-            self.merge_sets(self.add_edge_set, lww_element_graph.add_edge_set)
-            self.merge_sets(self.remove_edge_set, lww_element_graph.remove_edge_set)
-            self.merge_sets(self.adjacency_list, lww_element_graph.adjacency_list)
+            digest, other = self.digest, getattr(lww_element_graph, 'digest', None)
+            if digest is not None and other is not None and (digest.arity, digest.depth) == (other.arity, other.depth):
+                buckets = digest.diverging_buckets(other)
+                if not buckets:
+                    return self
+                if len(buckets) <= len(other.members) * DIGEST_MERGE_LIMIT:
+                    return self.merge_delta(other.delta(buckets))
+            return self.merge_delta(lww_element_graph)
+        except TypeError as error:
+            self._error('merge', error)
+
+    def merge_all(self, replicas, workers=None):
+        """
+        This method merges many graphs with current graph, the replicas being reduced in a process pool
+        before a single merge (see lww_element_graph_parallel).
+        :param replicas: sequence of LWWElementGraph, Delta or any object holding the four timestamp sets.
+        :param workers: number of processes, os.cpu_count() by default, 1 to reduce in the current process.
+        :return: merged [LWWElementGraph]
+        """
+        from lww_element_graph_parallel import merge_all
+        return merge_all(self, replicas, workers)
+
+    def enable_digest(self, arity=16, depth=3):
+        """
+        This method computes the hash-range digest of the timestamp sets, then keeps it up to date on every write,
+        so two replicas can compare their digests to find the elements they disagree on
+        (see lww_element_graph_digest). Replicas must use the same arity and depth.
+        :param arity: number of children of a node of the digest.
+        :param depth: number of levels below the root, the digest has arity ** depth buckets.
+        :return: RangeDigest
+        """
+        from lww_element_graph_digest import RangeDigest
+        self.digest = RangeDigest(self, arity, depth)
+        return self.digest
+
+    def enable_cache(self, max_bytes=64 << 20):
+        """
+        This method starts caching the results of query_vertices and find_path in a bounded LRU cache,
+        a write only invalidating the results it may change (see lww_element_graph_cache).
+        :param max_bytes: memory budget of the cached results.
+        :return: QueryCache, with its hit, miss and eviction stats().
+        """
+        from lww_element_graph_cache import QueryCache
+        self.cache = QueryCache(self, max_bytes)
+        return self.cache
+
+    def disable_cache(self):
+        """
+        This method drops the cache enabled by enable_cache.
+        """
+        self.cache = None
+
+    def snapshot(self):
+        """
+        This method returns an immutable view of the vertices and edges of the graph, taken in O(1): the graph
+        copies the containers it shares with the snapshots on its next writes (see lww_element_graph_cow).
+        Snapshots can be read from other threads while the graph is written, they must be taken between writes.
+        :return: ReadSnapshot answering the read operations at the current version.
+        """
+        from lww_element_graph_cow import CopyOnWrite
+        if self.cow is None or not self.cow.frozen:
+            self.cow = CopyOnWrite(self)
+        return self.cow.snapshot()
+
+    def enable_metrics(self, operations=None):
+        """
+        This method starts timing the operations of the graph and counting the entries merged
+        (see lww_element_graph_metrics). The instrumented methods are shadowed by wrappers on this graph only,
+        a graph without metrics runs the methods of the class.
+        :param operations: names of the methods to time, all of lww_element_graph_metrics.INSTRUMENTED by default.
+        :return: GraphMetrics, with snapshot() and prometheus() exports.
+        """
+        from lww_element_graph_metrics import INSTRUMENTED, GraphMetrics
+        self.disable_metrics()
+        self.metrics = GraphMetrics(self, INSTRUMENTED if operations is None else operations)
+        self.metrics.install()
+        return self.metrics
+
+    def disable_metrics(self):
+        """
+        This method removes the wrappers installed by enable_metrics.
+        """
+        if self.metrics is not None:
+            self.metrics.uninstall()
+            self.metrics = None
+
+    def save(self, path):
+        """
+        This method writes the graph in a compact binary snapshot, only integer vertex ids are supported.
+        :param path: path of the snapshot file, replaced atomically.
+        """
+        from lww_element_graph_snapshot import save_snapshot
+        save_snapshot(self, path)
+
+    @classmethod
+    def load(cls, path, mmap=False, **kwargs):
+        """
+        This method reads a binary snapshot written by save.
+        :param path: path of the snapshot file.
+        :param mmap: if True the file is mapped in memory and a read-only MappedGraph answering
+                     check_vertex_exists, check_edge_exists, query_vertices and get_vertices is returned.
+        :param kwargs: arguments of the new graph.
+        :return: LWWElementGraph, or MappedGraph with mmap.
+        """
+        from lww_element_graph_snapshot import MappedGraph, load_snapshot
+        if mmap:
+            return MappedGraph(path)
+        return load_snapshot(cls({}, **kwargs), path)
+
+    def deltas_since(self, version) -> Delta:
+        """
+        This method returns the delta of all the writes made after the given version.
+        A peer keeps the version of the last delta it applied and pulls only what changed since then.
+        If the delta buffer does not reach back to the given version (delta mode is off, or the buffer
+        was truncated past it) the whole state is returned instead, which is always a valid delta.
+        So is it for a version newer than the graph, which this graph never issued (e.g. the peer synced with
+        it before it restarted from an older state).
+        :param version: version of the last delta the peer has applied, 0 for a new peer.
+        :return: Delta holding the current timestamps of the elements written after version.
+        """
+        if self.delta_buffer is None or version < self.delta_base or version > self.version:
+            return Delta(self.version, *(dict(getattr(self, lww_set)) for lww_set in LWW_SETS))
+        delta = Delta(self.version, {}, {}, {}, {})
+        for lww_set, element in self.delta_buffer[max(version - self.delta_base, 0):]:
+            timestamps = getattr(self, lww_set)
+            if element in timestamps:
+                getattr(delta, lww_set)[element] = timestamps[element]
+        return delta
+
+    def truncate_deltas(self, version):
+        """
+        This method drops the delta buffer up to the given version, once every peer has pulled it.
+        :param version: lowest version acknowledged by all the peers.
+        """
+        if self.delta_buffer is not None and version > self.delta_base:
+            version = min(version, self.version)
+            del self.delta_buffer[:version - self.delta_base]
+            self.delta_base = version
+
+    def merge_delta(self, delta):
+        """
+        This method merges a delta (or any object holding the four timestamp sets) with current graph.
+        The cost is proportional to the size of the delta and the adjacency list is only updated
+        for the vertices and edges present in the delta.
+        :param delta: Delta returned by deltas_since of another replica.
+        :return: merged [LWWElementGraph]
+        """
+        try:
+            if self.partition is not None:
+                delta = self.partition.filter(delta, self)
+            self._fold(delta)
             return self
         except TypeError as error:
-            logging.error(str(error))
+            self._error('merge_delta', error)
+
+    def partition_state(self, partition, version=0) -> Delta:
+        """
+        This method returns the entries of the four timestamp sets a replica restricted to the partition needs,
+        including the edges crossing the partition boundary and the vertices at their other end
+        (see lww_element_graph_partition).
+        :param partition: Partition of the vertices.
+        :param version: version of the last partition state the peer has applied, see deltas_since,
+                        0 for the whole sub-state.
+        :return: Delta of the sub-state of the partition written after version.
+        """
+        return partition.filter(self.deltas_since(version) if version else self, self)
+
+    def restrict(self, partition):
+        """
+        This method restricts the graph to a partition of the vertices: the entries outside of its sub-state are
+        dropped, and every merge only keeps the sub-state of the partition. Local writes are not restricted.
+        :param partition: Partition of lww_element_graph_partition, None to merge everything again.
+        :return: the graph.
+        """
+        self.partition = partition
+        if partition is not None:
+            self.replace_state(partition.filter(self, self))
+        return self
+
+    def apply_batch(self, ops) -> BatchResult:
+        """
+        This method applies many operations in a single pass.
+        The operations are first reduced to the latest timestamp of every (set, element), then each
+        timestamp set and the adjacency list are updated once per element, as merge does.
+        Unlike the single operation methods, the timestamps are stored as given and an edge whose
+        vertices are not in the graph (yet) is kept, it shows up as soon as both vertices are added.
+        :param ops: iterable of (operation, element, timestamp) with operation one of
+                    'add_vertex', 'remove_vertex', 'add_edge' or 'remove_edge'. Operations which are not such
+                    triples, or whose timestamp is None or does not compare with the stored one, are rejected.
+        :return: BatchResult with the number of operations, of changed vertices and edges and of rejected operations.
+        """
+        winners = Delta(None, {}, {}, {}, {})
+        targets = {operation: getattr(winners, lww_set) for operation, lww_set in BATCH_OPERATIONS.items()}
+        operations = rejected = 0
+        for op in ops:
+            operations += 1
+            try:
+                operation, element, timestamp = op
+                entries = targets[operation]
+                if timestamp is None:
+                    raise TypeError('missing timestamp')
+                if operation in EDGE_OPERATIONS:
+                    if len(element) < 2:
+                        raise ValueError('an edge needs two vertices')
+                    if self.edge_key is not None:
+                        element = self.edge_key(element)
+                # comparing with the stored timestamp rejects a timestamp of another type before it is stored,
+                # an older one would not be merged anyway
+                stored = getattr(self, BATCH_OPERATIONS[operation]).get(element)
+                if stored is not None and timestamp <= stored:
+                    continue
+                if element not in entries or timestamp > entries[element]:
+                    entries[element] = timestamp
+            except (KeyError, TypeError, ValueError) as error:
+                rejected += 1
+                logger.error('invalid operation %r: %s', op, error)
+        changed_vertices, changed_edges = self._fold(winners)
+        logger.info('batch of %d operations applied.', operations)
+        return BatchResult(operations, len(changed_vertices), len(changed_edges), rejected)
+
+    def add_vertices(self, vertices, timestamp=None) -> BatchResult:
+        """
+        Add all the vertices in the graph with the given timestamp, see apply_batch.
+        :param vertices: iterable of vertices.
+        :param timestamp: timestamp of adding the vertices, issued by the clock of the graph when None.
+        :return: BatchResult
+        """
+        timestamp = self._timestamp(timestamp)
+        return self.apply_batch(('add_vertex', vertex, timestamp) for vertex in vertices)
+
+    def add_edges(self, edges, timestamp=None) -> BatchResult:
+        """
+        Add all the edges in the graph with the given timestamp, see apply_batch.
+        :param edges: iterable of tuples of vertices.
+        :param timestamp: timestamp of adding the edges, issued by the clock of the graph when None.
+        :return: BatchResult
+        """
+        timestamp = self._timestamp(timestamp)
+        return self.apply_batch(('add_edge', edge, timestamp) for edge in edges)
+
+    def _fold(self, state):
+        """
+        Merges the four timestamp sets of the given state and updates the adjacency list for the changed elements.
+        :param state: Delta, LWW_Element_Graph or any object holding the four timestamp sets.
+        :return: tuple of the sets of changed vertices and changed edges.
+        """
+        # every timestamp is compared and observed before any is stored: a TypeError leaves the graph unchanged
+        changes = [(lww_set, getattr(state, lww_set)) for lww_set in LWW_SETS]
+        changes = [(lww_set, entries, self._newer_entries(lww_set, entries)) for lww_set, entries in changes]
+        for lww_set, entries, changed in changes:
+            self._merge_entries(lww_set, entries, changed)
+        changed_vertices = set(changes[0][2]).union(changes[1][2])
+        changed_edges = set(changes[2][2]).union(changes[3][2])
+        refreshed_vertices = changed_vertices
+        if vectorized.enabled(changed_vertices):
+            # refreshing a vertex whose liveness did not flip is a no-op
+            refreshed_vertices = vectorized.liveness_flips(self.add_vertex_set, self.remove_vertex_set,
+                                                           self.adjacency_list, changed_vertices)
+        for vertex in refreshed_vertices:
+            self._refresh_vertex(vertex)
+        for edge in changed_edges:
+            self._refresh_edge(edge)
+        return changed_vertices, changed_edges
+
+    @staticmethod
+    def stable_watermark(watermarks):
+        """
+        This method combines the watermarks reported by every replica into the causal-stability watermark:
+        each replica promises it will never issue nor receive a write older than its own watermark.
+        :param watermarks: iterable of the watermarks of all the replicas.
+        :return: the lowest watermark, below which no write can show up anywhere any more.
+        """
+        return min(watermarks)
+
+    def collect_garbage(self, watermark) -> GarbageCollection:
+        """
+        This method purges the timestamps which can never change the state of the graph again, given a
+        causal-stability watermark (see stable_watermark) agreed on by all the replicas:
+        - elements removed before the watermark and after their last add lose both entries, since any add
+          still to come is newer than the removal,
+        - tombstones older than the watermark and dominated by an add of the same element are dropped.
+        The timestamp sets are then copied to give their memory back.
+        :param watermark: timestamp below which no write can be issued or received any more.
+        :return: GarbageCollection with the number of purged vertices, edges and dominated tombstones,
+                 and an estimate of the reclaimed bytes.
+        """
+        size_before = self._timestamp_sets_size()
+        reclaimed = 0
+        purged = {'add_vertex_set': [], 'add_edge_set': []}
+        tombstones = 0
+        for add_name, remove_name in (('add_vertex_set', 'remove_vertex_set'), ('add_edge_set', 'remove_edge_set')):
+            add_set, remove_set = getattr(self, add_name), getattr(self, remove_name)
+            expired = [(element, removed) for element, removed in remove_set.items() if removed < watermark]
+            for element, removed in expired:
+                del remove_set[element]
+                if self.digest is not None:
+                    self.digest.update(remove_name, element, removed, None)
+                reclaimed += sys.getsizeof(removed)
+                added = add_set.get(element)
+                if added is not None and removed <= added:
+                    tombstones += 1
+                    continue
+                if added is not None:
+                    del add_set[element]
+                    if self.digest is not None:
+                        self.digest.update(add_name, element, added, None)
+                    reclaimed += sys.getsizeof(added)
+                purged[add_name].append(element)
+        for edge in purged['add_edge_set'] if type(self.incident_edges) is dict else ():
+            for vertex in (edge[0], edge[1]):
+                if vertex in self.incident_edges:
+                    self.incident_edges[vertex].discard(edge)
+                    if not self.incident_edges[vertex]:
+                        del self.incident_edges[vertex]
+        for lww_set in LWW_SETS:
+            if type(getattr(self, lww_set)) is dict:
+                setattr(self, lww_set, dict(getattr(self, lww_set)))
+        reclaimed += max(size_before - self._timestamp_sets_size(), 0)
+        logger.info('garbage collected %d vertices, %d edges and %d tombstones.',
+                     len(purged['add_vertex_set']), len(purged['add_edge_set']), tombstones)
+        return GarbageCollection(len(purged['add_vertex_set']), len(purged['add_edge_set']), tombstones, reclaimed)
+
+    def _timestamp_sets_size(self) -> int:
+        """
+        :return: size in bytes of the containers of the four timestamp sets, without their items.
+        """
+        return sum(sys.getsizeof(getattr(self, lww_set)) for lww_set in LWW_SETS)
+
+    def replace_state(self, state):
+        """
+        This method replaces the four timestamp sets of the graph with the ones of the given state
+        and rebuilds the adjacency list in a single pass over the elements.
+        :param state: Delta, LWW_Element_Graph or any object holding the four timestamp sets, the sets are not copied
+                      unless the graph uses compact storage.
+        :return: the graph.
+        """
+        for lww_set in LWW_SETS:
+            timestamps = getattr(self, lww_set)
+            if type(timestamps) is dict:
+                setattr(self, lww_set, getattr(state, lww_set))
+            else:
+                timestamps.clear()
+                timestamps.update(getattr(state, lww_set))
+        self.version += sum(len(getattr(self, lww_set)) for lww_set in LWW_SETS)
+        if self.clock is not None:
+            for lww_set in LWW_SETS:
+                if getattr(self, lww_set):
+                    self.clock.observe(max(getattr(self, lww_set).values()))
+        if self.delta_buffer is not None:
+            self.delta_buffer = []
+            self.delta_base = self.version
+        if self.operation_log is not None:
+            for lww_set in LWW_SETS:
+                for element, timestamp in getattr(self, lww_set).items():
+                    self.operation_log.append(lww_set, element, timestamp)
+        if self.digest is not None:
+            self.digest.rebuild()
+        self._rebuild()
+        return self
+
+    def _rebuild(self):
+        """
+        Rebuilds the adjacency list and the incident edges from the four timestamp sets.
+        """
+        add_vertex_set, remove_vertex_set = self.add_vertex_set, self.remove_vertex_set
+        if self.cow is not None:
+            # the snapshots keep the containers, the graph starts new ones
+            self.adjacency_list = {}
+            self.predecessors = {} if self.directed else self.adjacency_list
+            self.cow = None
+        adjacency_list, predecessors = self.adjacency_list, self.predecessors
+        adjacency_list.clear()
+        if self.directed:
+            predecessors.clear()
+        if self.cache is not None:
+            self.cache.clear()
+        for vertex, added in add_vertex_set.items():
+            removed = remove_vertex_set.get(vertex)
+            if removed is None or removed <= added:
+                adjacency_list[vertex] = set()
+                if self.directed:
+                    predecessors[vertex] = set()
+        index_edges = type(self.incident_edges) is dict
+        incident_edges = self.incident_edges = {} if index_edges else self.incident_edges
+        live_edge_set = self.live_edge_set = set()
+        for edge in self.add_edge_set:
+            first, second = edge[0], edge[1]
+            for vertex in (first, second) if index_edges else ():
+                if vertex in incident_edges:
+                    incident_edges[vertex].add(edge)
+                else:
+                    incident_edges[vertex] = {edge}
+            if first in adjacency_list and second in adjacency_list and self._edge_alive(edge):
+                adjacency_list[first].add(second)
+                predecessors[second].add(first)
+                live_edge_set.add(edge)
+
+    def _newer_entries(self, lww_set, entries) -> list:
+        """
+        Selects the given entries newer than the ones of a timestamp set, preference is given to latest timestamp,
+        and moves the clock of the graph past them. Nothing is stored.
+        :param lww_set: name of the timestamp set, one of LWW_SETS.
+        :param entries: dict of element to timestamp.
+        :return: list of elements whose timestamp would change.
+        """
+        timestamps = getattr(self, lww_set)
+        if vectorized.enabled(entries):
+            changed = vectorized.newer_entries(timestamps, entries)
+        else:
+            changed = [element for element, timestamp in entries.items()
+                       if element not in timestamps or timestamp > timestamps[element]]
+        if self.clock is not None and changed:
+            self.clock.observe(max(entries[element] for element in changed))
+        return changed
+
+    def _merge_entries(self, lww_set, entries, changed):
+        """
+        Stores the entries selected by _newer_entries in one of the four timestamp sets.
+        :param lww_set: name of the timestamp set, one of LWW_SETS.
+        :param entries: dict of element to timestamp.
+        :param changed: list of the elements of the entries to store.
+        """
+        timestamps = getattr(self, lww_set)
+        if self.operation_log is not None:
+            for element in changed:
+                self.operation_log.append(lww_set, element, entries[element])
+        if self.digest is not None:
+            for element in changed:
+                self.digest.update(lww_set, element, timestamps.get(element), entries[element])
+        for element in changed:
+            timestamps[element] = entries[element]
+        self.version += len(changed)
+        if self.delta_buffer is not None:
+            self.delta_buffer.extend((lww_set, element) for element in changed)
+
+    def _edge_alive(self, edge) -> bool:
+        """
+        Checks the timestamps of the edge only, its vertices are not checked.
+        :param edge: tuple of vertices.
+        :return: boolean
+        """
+        added = self.add_edge_set.get(edge)
+        if added is None:
+            return False
+        removed = self.remove_edge_set.get(edge)
+        return removed is None or removed <= added
+
+    def _refresh_vertex(self, vertex):
+        """
+        Brings the adjacency list in line with the current state of the vertex.
+        Only the edges incident to the vertex are visited, O(deg(vertex)).
+        :param vertex: vertex whose timestamps changed.
+        """
+        if self._vertex_alive(vertex):
+            if vertex not in self.adjacency_list:
+                adjacency_list, predecessors = self._writable()
+                adjacency_list[vertex] = set()
+                if self.directed:
+                    predecessors[vertex] = set()
+                for edge in self.incident_edges.get(vertex, ()):
+                    # the other vertex may be waiting for its own refresh, it links the edge then
+                    if edge[0] in adjacency_list and edge[1] in adjacency_list and self._edge_alive(edge):
+                        adjacency_list[edge[0]].add(edge[1])
+                        predecessors[edge[1]].add(edge[0])
+                        self.live_edge_set.add(edge)
+                if self.cache is not None:
+                    self.cache.changed((vertex,) + tuple(adjacency_list[vertex]) + tuple(predecessors[vertex]), True)
+        elif vertex in self.adjacency_list:
+            adjacency_list, predecessors = self._writable()
+            live_edge_set = self.live_edge_set
+            neighbours = adjacency_list.pop(vertex)
+            if self.multi:
+                live_edge_set.difference_update(self.incident_edges.get(vertex, ()))
+                for neighbour in neighbours:
+                    if neighbour != vertex:
+                        predecessors[neighbour].discard(vertex)
+            else:
+                for neighbour in neighbours:
+                    live_edge_set.discard((vertex, neighbour))
+                    live_edge_set.discard((neighbour, vertex))
+                    if neighbour != vertex:
+                        predecessors[neighbour].discard(vertex)
+            linked_from = predecessors.pop(vertex) if self.directed else ()
+            for neighbour in linked_from:
+                live_edge_set.discard((neighbour, vertex))
+                if neighbour != vertex:
+                    adjacency_list[neighbour].discard(vertex)
+            if self.cache is not None:
+                self.cache.changed((vertex,) + tuple(neighbours) + tuple(linked_from), False)
+
+    def _refresh_edge(self, edge):
+        """
+        Brings the adjacency list in line with the current state of the edge.
+        The vertices must be refreshed first, a vertex is in the adjacency list only when it is in the graph.
+        :param edge: edge whose timestamps changed.
+        """
+        first, second = edge[0], edge[1]
+        incident_edges = self.incident_edges
+        for vertex in (first, second) if type(incident_edges) is dict else ():
+            if vertex in incident_edges:
+                incident_edges[vertex].add(edge)
+            else:
+                incident_edges[vertex] = {edge}
+        if first in self.adjacency_list and second in self.adjacency_list:
+            linked = second in self.adjacency_list[first]
+            adjacency_list, predecessors = self._writable()
+            if self._edge_alive(edge):
+                if self.cache is not None and edge not in self.live_edge_set:
+                    self.cache.changed((first, second), True)
+                if not linked:
+                    adjacency_list[first].add(second)
+                    predecessors[second].add(first)
+                self.live_edge_set.add(edge)
+            else:
+                self.live_edge_set.discard(edge)
+                if linked and not self._still_linked(edge):
+                    if self.cache is not None:
+                        self.cache.changed((first, second), False)
+                    adjacency_list[first].discard(second)
+                    predecessors[second].discard(first)
+
+    def _writable(self) -> tuple:
+        """
+        :return: tuple of the adjacency list and the predecessors, copied on write while snapshots share them.
+        """
+        if self.cow is None:
+            return self.adjacency_list, self.predecessors
+        return self.cow.writable()
+
+    def _still_linked(self, edge) -> bool:
+        """
+        Checks if another live edge links the vertices of a dead edge, they stay neighbours then.
+        :param edge: dead edge between two live vertices.
+        :return: boolean
+        """
+        first, second = edge[0], edge[1]
+        if not self.multi:
+            # only an edge keyed as given has a distinct reverse edge linking the same vertices
+            return self.directed is None and self._edge_alive((second, first))
+        for other in self.incident_edges.get(first, ()):
+            if other != edge and (other[0] == first and other[1] == second or
+                                  self.directed is None and other[0] == second and other[1] == first) \
+                    and self._edge_alive(other):
+                return True
+        return False
 
     @staticmethod
-    def merge_sets(first, second):
+    def merge_sets(first, second, clock=None):
         """
         This method merges two sets.
         :param first:
         :param second:
+        :param clock: clock observing the timestamps taken from second, e.g. the clock of the graph owning first.
         :return: merged set.
         """
         try:
@@ -298,6 +1368,10 @@ class LWW_Element_Graph:
                 else:
                     if second[key] > first[key]:
                         first[key] = second[key]
+                    else:
+                        continue
+                if clock is not None:
+                    clock.observe(second[key])
         except TypeError as error:
-            logging.error(str(error))
+            logger.error(str(error))
 
@@ -0,0 +1,1180 @@
+"""
+This module contains the benchmarks of the (Last-Write-Wins)LWW-element-graph.
+Run `python lww_element_graph_benchmark.py [benchmark ...]`, all the benchmarks are run when none is given.
+`--json PATH` writes the results recorded by the operations benchmark, `--compare BASELINE CURRENT` flags the
+regressions between two such files.
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import pickle
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+
+from lww_element_graph import LWW_Element_Graph, LWW_SETS
+
+BENCHMARKS = {}
+# operations of the operations benchmark, see operation_case
+OPERATIONS = {}
+# results recorded by the benchmarks, written by --json
+RESULTS = []
+# metrics compared by --compare, and whether a higher value is better
+REGRESSION_METRICS = {'ops_per_second': True, 'p50_us': False, 'p99_us': False, 'peak_kib': False}
+
+
+def benchmark(name):
+    """
+    Registers the decorated function as a benchmark under the given name.
+    :param name: name used to select the benchmark from the command line.
+    :return: decorator.
+    """
+    def register(function):
+        BENCHMARKS[name] = function
+        return function
+    return register
+
+
+def timed(function, *args):
+    """
+    Calls the function with the given arguments.
+    :return: tuple of elapsed seconds and the value returned by the function.
+    """
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def random_graph(vertices, edges, seed=0, **kwargs) -> LWW_Element_Graph:
+    """
+    Builds a graph with the given number of vertices and random edges between them.
+    :param vertices: number of vertices.
+    :param edges: number of edges.
+    :param seed: seed of the random generator.
+    :return: LWW_Element_Graph.
+    """
+    rng = random.Random(seed)
+    timestamp = time.time()
+    graph = LWW_Element_Graph({}, **kwargs)
+    for vertex in range(vertices):
+        graph.add_vertex(vertex, timestamp)
+    for _ in range(edges):
+        graph.add_edge((rng.randrange(vertices), rng.randrange(vertices)), timestamp)
+    return graph
+
+
+def state_size(state) -> int:
+    """
+    :return: number of bytes needed to ship the four timestamp sets of the state.
+    """
+    return len(pickle.dumps([getattr(state, lww_set) for lww_set in LWW_SETS], pickle.HIGHEST_PROTOCOL))
+
+
+def power_law_edges(vertices, degree=4, seed=0) -> list:
+    """
+    Draws the edges of a scale-free graph by preferential attachment (Barabasi-Albert): every new vertex is linked
+    to degree // 2 existing vertices picked with a probability proportional to their degree.
+    :param vertices: number of vertices.
+    :param degree: average degree.
+    :param seed: seed of the random generator.
+    :return: list of edges.
+    """
+    rng = random.Random(seed)
+    links = max(1, degree // 2)
+    # every vertex appears once per incident edge, so a uniform pick favours the hubs
+    endpoints = list(range(links))
+    edges = []
+    for vertex in range(links, vertices):
+        targets = set()
+        while len(targets) < links:
+            targets.add(rng.choice(endpoints))
+        for target in targets:
+            edges.append((vertex, target))
+        endpoints.extend(targets)
+        endpoints.extend([vertex] * links)
+    return edges
+
+
+def power_law_graph(vertices, degree=4, seed=0, edges=None, timestamp=None, **kwargs) -> LWW_Element_Graph:
+    """
+    Builds a scale-free graph, see power_law_edges.
+    :param edges: edges of the graph, drawn by power_law_edges when None.
+    :param timestamp: timestamp of all the elements, the current time when None.
+    :return: LWW_Element_Graph.
+    """
+    graph = LWW_Element_Graph({}, **kwargs)
+    timestamp = time.time() if timestamp is None else timestamp
+    graph.add_vertices(range(vertices), timestamp)
+    graph.add_edges(power_law_edges(vertices, degree, seed) if edges is None else edges, timestamp)
+    return graph
+
+
+def churn_operations(vertices, edges, count, seed=0, remove_ratio=0.5) -> list:
+    """
+    Draws a churn-heavy mix of operations over the vertices 0 to vertices - 1: vertices and edges are added and
+    removed again, removals making remove_ratio of the operations. Timestamps increase from now on, so every
+    operation wins over the state of a graph built before.
+    :param edges: edges of the graph, the edge removals pick among them and the edges added so far.
+    :return: list of (operation, element, timestamp), the apply_batch format.
+    """
+    rng = random.Random(seed)
+    edges = list(edges)
+    start = time.time() + 1
+    operations = []
+    for index in range(count):
+        timestamp = start + index * 1e-6
+        pick = rng.random()
+        if pick < remove_ratio / 2:
+            operations.append(('remove_vertex', rng.randrange(vertices), timestamp))
+        elif pick < remove_ratio:
+            operations.append(('remove_edge', edges[rng.randrange(len(edges))], timestamp))
+        elif pick < (1 + remove_ratio) / 2:
+            operations.append(('add_vertex', rng.randrange(vertices), timestamp))
+        else:
+            edge = (rng.randrange(vertices), rng.randrange(vertices))
+            edges.append(edge)
+            operations.append(('add_edge', edge, timestamp))
+    return operations
+
+
+def divergent_replicas(vertices, divergence=0.1, replicas=2, degree=4, seed=0) -> list:
+    """
+    Builds replicas of the same scale-free graph which then diverged, each through its own churn.
+    :param divergence: number of churn operations applied to every replica, as a fraction of the vertices.
+    :param replicas: number of replicas.
+    :return: list of LWW_Element_Graph.
+    """
+    edges = power_law_edges(vertices, degree, seed)
+    timestamp = time.time()
+    graphs = []
+    for index in range(replicas):
+        graph = power_law_graph(vertices, edges=edges, timestamp=timestamp)
+        graph.apply_batch(churn_operations(vertices, edges, int(vertices * divergence), seed + 1 + index))
+        graphs.append(graph)
+    return graphs
+
+
+@benchmark('delta_sync')
+def bench_delta_sync(vertices=20000, edges=40000, mutation_counts=(10, 100, 1000, 10000)):
+    """
+    Compares one anti-entropy round shipping the whole graph (merge) with one shipping a delta
+    (deltas_since + merge_delta) for a growing number of mutations since the last sync.
+    """
+    print('delta_sync: %d vertices, %d edges' % (vertices, edges))
+    print('%10s %14s %14s %14s %14s' % ('mutations', 'merge (s)', 'delta (s)', 'state (B)', 'delta (B)'))
+    rng = random.Random(1)
+    for mutations in mutation_counts:
+        source = random_graph(vertices, edges, delta_mode=True)
+        full_replica = random_graph(vertices, edges)
+        delta_replica = random_graph(vertices, edges)
+        synced_version = source.version
+        timestamp = time.time()
+        for _ in range(mutations):
+            operation = rng.random()
+            if operation < 0.4:
+                source.add_vertex(vertices + rng.randrange(vertices), timestamp)
+            elif operation < 0.8:
+                source.add_edge((rng.randrange(vertices), rng.randrange(vertices)), timestamp)
+            else:
+                source.remove_vertex(rng.randrange(vertices), timestamp + 1)
+        merge_time, _ = timed(full_replica.merge, source)
+        delta_time, _ = timed(lambda: delta_replica.merge_delta(source.deltas_since(synced_version)))
+        delta = source.deltas_since(synced_version)
+        print('%10d %14.4f %14.4f %14d %14d' % (mutations, merge_time, delta_time,
+                                              state_size(source), state_size(delta)))
+
+
+def legacy_remove_vertex(adjacency_list, vertex):
+    """
+    Vertex removal of the list-based adjacency list, scanning every neighbour list of the graph.
+    """
+    for j in adjacency_list:
+        if vertex in adjacency_list[j]:
+            adjacency_list[j].remove(vertex)
+    adjacency_list.pop(vertex)
+
+
+@benchmark('remove_vertex')
+def bench_remove_vertex(sizes=(10 ** 4, 10 ** 5, 10 ** 6), degree=4, removals=20):
+    """
+    Compares remove_vertex with the set-based adjacency list against the former full scan of list-based
+    adjacency lists, on graphs of growing size and constant average degree.
+    """
+    print('remove_vertex: average degree %d, %d removals' % (degree, removals))
+    print('%10s %16s %16s' % ('vertices', 'before (ms/op)', 'after (ms/op)'))
+    for vertices in sizes:
+        graph = random_graph(vertices, vertices * degree // 2)
+        legacy = {vertex: list(neighbours) for vertex, neighbours in graph.adjacency_list.items()}
+        victims = random.Random(2).sample(range(vertices), removals)
+        timestamp = time.time() + 100
+        before, _ = timed(lambda: [legacy_remove_vertex(legacy, vertex) for vertex in victims])
+        after, _ = timed(lambda: [graph.remove_vertex(vertex, timestamp) for vertex in victims])
+        print('%10d %16.4f %16.4f' % (vertices, before * 1000 / removals, after * 1000 / removals))
+
+
+@benchmark('batch_import')
+def bench_batch_import(vertices=100000, edges=500000):
+    """
+    Compares importing a graph with one add_vertex/add_edge call per element against add_vertices/add_edges.
+    """
+    rng = random.Random(3)
+    edge_list = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(edges)]
+    timestamp = time.time()
+
+    def single():
+        graph = LWW_Element_Graph({})
+        for vertex in range(vertices):
+            graph.add_vertex(vertex, timestamp)
+        for edge in edge_list:
+            graph.add_edge(edge, timestamp)
+        return graph
+
+    def batch():
+        graph = LWW_Element_Graph({})
+        graph.add_vertices(range(vertices), timestamp)
+        graph.add_edges(edge_list, timestamp)
+        return graph
+
+    print('batch_import: %d vertices, %d edges' % (vertices, edges))
+    print('%10s %14s %14s' % ('', 'seconds', 'ops/s'))
+    single_time, single_graph = timed(single)
+    batch_time, batch_graph = timed(batch)
+    assert single_graph.adjacency_list == batch_graph.adjacency_list
+    for name, seconds in (('single', single_time), ('batch', batch_time)):
+        print('%10s %14.3f %14.0f' % (name, seconds, (vertices + edges) / seconds))
+
+
+@benchmark('events')
+def bench_events(vertices=100000, edges=200000):
+    """
+    Measures the import time of the module, then the per operation cost of add_vertex/add_edge without listener,
+    with an EventCounter and with log_event writing every event to os.devnull, which is what every operation
+    used to cost when the module configured the root logger at DEBUG level on import.
+    """
+    from lww_element_graph import EventCounter, log_event, logger
+    output = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import lww_element_graph'],
+                            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))).stderr
+    cumulative = [line.split('|')[1] for line in output.splitlines() if line.endswith('| lww_element_graph')]
+    print('events: import lww_element_graph in %s us (cumulative)' % cumulative[0].strip())
+    rng = random.Random(8)
+    edge_list = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(edges)]
+    timestamp = time.time()
+
+    def operations(listener):
+        graph = LWW_Element_Graph({})
+        if listener is not None:
+            graph.subscribe(listener)
+        for vertex in range(vertices):
+            graph.add_vertex(vertex, timestamp)
+        for edge in edge_list:
+            graph.add_edge(edge, timestamp)
+
+    print('%12s %14s' % ('listener', 'us/op'))
+    with open(os.devnull, 'w') as devnull:
+        handler = logging.StreamHandler(devnull)
+        handler.setFormatter(logging.Formatter('%(filename)s - %(levelname)s - %(asctime)s %(message)s'))
+        for name, listener in (('none', None), ('counter', EventCounter()), ('log_event', log_event)):
+            if listener is log_event:
+                logging.disable(logging.NOTSET)
+                logger.setLevel(logging.DEBUG)
+                logger.addHandler(handler)
+            seconds, _ = timed(operations, listener)
+            logger.removeHandler(handler)
+            logger.setLevel(logging.NOTSET)
+            logging.disable(logging.INFO)
+            print('%12s %14.3f' % (name, seconds * 10 ** 6 / (vertices + edges)))
+
+
+@benchmark('snapshot')
+def bench_snapshot(vertices=200000, edges=400000, queries=10000):
+    """
+    Compares the binary snapshot with pickling the four timestamp sets and the adjacency list:
+    file size, save and load time, and time to first answers of a memory-mapped snapshot.
+    """
+    rng = random.Random(4)
+    timestamp = time.time()
+    graph = LWW_Element_Graph({})
+    graph.apply_batch([('add_vertex', vertex, timestamp + rng.random()) for vertex in range(vertices)] +
+                      [('add_edge', (rng.randrange(vertices), rng.randrange(vertices)), timestamp + rng.random())
+                       for _ in range(edges)] +
+                      [('remove_vertex', vertex, timestamp + 1 + rng.random()) for vertex in range(0, vertices, 10)])
+    directory = tempfile.mkdtemp()
+    pickle_path = os.path.join(directory, 'graph.pickle')
+    snapshot_path = os.path.join(directory, 'graph.lwwg')
+    state = [getattr(graph, lww_set) for lww_set in LWW_SETS] + [graph.adjacency_list]
+
+    def pickle_save():
+        with open(pickle_path, 'wb') as file:
+            pickle.dump(state, file, pickle.HIGHEST_PROTOCOL)
+
+    def pickle_load():
+        with open(pickle_path, 'rb') as file:
+            return pickle.load(file)
+
+    def mapped_queries():
+        with LWW_Element_Graph.load(snapshot_path, mmap=True) as mapped:
+            for vertex in range(queries):
+                mapped.check_vertex_exists(vertex)
+                mapped.query_vertices(vertex)
+
+    print('snapshot: %d vertices, %d edges, %d queries on the mapped snapshot' % (vertices, edges, queries))
+    print('%10s %12s %10s %10s' % ('', 'bytes', 'save (s)', 'load (s)'))
+    pickle_save_time, _ = timed(pickle_save)
+    pickle_load_time, _ = timed(pickle_load)
+    snapshot_save_time, _ = timed(graph.save, snapshot_path)
+    snapshot_load_time, _ = timed(LWW_Element_Graph.load, snapshot_path)
+    mapped_time, _ = timed(mapped_queries)
+    print('%10s %12d %10.3f %10.3f' % ('pickle', os.path.getsize(pickle_path), pickle_save_time, pickle_load_time))
+    print('%10s %12d %10.3f %10.3f' % ('snapshot', os.path.getsize(snapshot_path), snapshot_save_time,
+                                       snapshot_load_time))
+    print('%10s %12s %10s %10.3f' % ('mmap', '', '', mapped_time))
+    shutil.rmtree(directory)
+
+
+@benchmark('operation_log')
+def bench_operation_log(operations=200000, group_sizes=(1, 64, 1024)):
+    """
+    Measures the write throughput of the operation log for every fsync policy and group size,
+    then the recovery time from the log alone and from a compacted snapshot.
+    """
+    from lww_element_graph_wal import FSYNC_POLICIES, OperationLog
+    directory = tempfile.mkdtemp()
+    timestamp = time.time()
+    rng = random.Random(5)
+    vertices = operations // 4
+    print('operation_log: %d operations' % operations)
+    print('%10s %10s %14s' % ('fsync', 'group', 'ops/s'))
+    for policy in FSYNC_POLICIES:
+        for group_size in group_sizes:
+            count = operations if policy != 'always' or group_size > 1 else operations // 100
+            path = os.path.join(directory, '%s-%d.log' % (policy, group_size))
+            graph = LWW_Element_Graph({})
+            log = OperationLog(path, fsync=policy, group_size=group_size)
+            log.recover(graph)
+
+            def write():
+                for vertex in range(count):
+                    graph.add_vertex(vertex, timestamp)
+                log.sync()
+            seconds, _ = timed(write)
+            log.close()
+            print('%10s %10d %14.0f' % (policy, group_size, count / seconds))
+
+    path = os.path.join(directory, 'recovery.log')
+    graph = LWW_Element_Graph({})
+    log = OperationLog(path, fsync='never', group_size=1024)
+    log.recover(graph)
+    graph.add_vertices(range(vertices), timestamp)
+    graph.add_edges([(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(operations - vertices)],
+                    timestamp)
+    print('%24s %10s' % ('recovery', 'seconds'))
+    for source in ('log', 'snapshot'):
+        if source == 'snapshot':
+            log.compact(graph)
+        log.close()
+        log = OperationLog(path)
+        seconds, _ = timed(log.recover, LWW_Element_Graph({}))
+        print('%24s %10.3f' % (source, seconds))
+    log.close()
+    shutil.rmtree(directory)
+
+
+@benchmark('garbage_collection')
+def bench_garbage_collection(live=20000, churn_ratio=20):
+    """
+    Builds a graph where removed vertices outnumber live ones churn_ratio to 1, then measures
+    get_vertices and merge before and after collect_garbage.
+    """
+    timestamp = time.time()
+    operations = [('add_vertex', vertex, timestamp) for vertex in range(live * (churn_ratio + 1))]
+    operations += [('remove_vertex', vertex, timestamp + 1) for vertex in range(live, live * (churn_ratio + 1))]
+    graph = LWW_Element_Graph({})
+    graph.apply_batch(operations)
+    replica = LWW_Element_Graph({})
+    replica.apply_batch(operations)
+    print('garbage_collection: %d live vertices, %d removed' % (live, live * churn_ratio))
+    print('%10s %16s %12s' % ('', 'get_vertices (s)', 'merge (s)'))
+    for name in ('before', 'after'):
+        if name == 'after':
+            result = graph.collect_garbage(timestamp + 2)
+            replica.collect_garbage(timestamp + 2)
+        vertices_time, _ = timed(graph.get_vertices)
+        merge_time, _ = timed(graph.merge, replica)
+        print('%10s %16.4f %12.4f' % (name, vertices_time, merge_time))
+    print('purged %d vertices, reclaimed ~%d bytes' % (result.vertices, result.bytes_reclaimed))
+
+
+@benchmark('reads')
+def bench_reads(vertices=100000, edges=200000, lookups=200000):
+    """
+    Compares the read path answered from the live vertices and edges with the former recomputation
+    of the LWW state from the timestamp sets.
+    """
+    rng = random.Random(6)
+    graph = random_graph(vertices, edges)
+    timestamp = time.time() + 100
+    for vertex in range(0, vertices, 10):
+        graph.remove_vertex(vertex, timestamp)
+    edge_list = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(lookups)]
+    print('reads: %d vertices, %d edges, %d lookups' % (vertices, edges, lookups))
+    print('%16s %14s %14s' % ('', 'before (s)', 'after (s)'))
+    before, _ = timed(lambda: [vertex for vertex in graph.add_vertex_set if graph._vertex_alive(vertex)])
+    after, _ = timed(graph.get_vertices)
+    print('%16s %14.4f %14.4f' % ('get_vertices', before, after))
+    before, _ = timed(lambda: [graph._vertex_alive(first) and graph._vertex_alive(second) and
+                               graph._edge_alive((first, second)) for first, second in edge_list])
+    after, _ = timed(lambda: [graph.check_edge_exists(edge) for edge in edge_list])
+    print('%16s %14.4f %14.4f' % ('check_edge', before, after))
+    before, _ = timed(lambda: sum(1 for vertex in graph.add_vertex_set if graph._vertex_alive(vertex)))
+    after, _ = timed(len, graph)
+    print('%16s %14.4f %14.4f' % ('len', before, after))
+
+
+@benchmark('numpy_merge')
+def bench_numpy_merge(sizes=(10 ** 5, 10 ** 6), divergence=0.01):
+    """
+    Compares merge through the dict path and the vectorized NumPy path on two replicas holding the same
+    elements, divergence of which have a newer timestamp on the other replica.
+    """
+    import lww_element_graph_numpy as vectorized
+    if not vectorized.AVAILABLE:
+        print('numpy_merge: NumPy is not installed')
+        return
+    rng = random.Random(7)
+    timestamp = time.time()
+    print('numpy_merge: edges twice the vertices, %.0f%% divergence' % (divergence * 100))
+    print('%10s %12s %12s' % ('vertices', 'dict (s)', 'numpy (s)'))
+    threshold = vectorized.THRESHOLD
+    for vertices in sizes:
+        operations = [('add_vertex', vertex, timestamp) for vertex in range(vertices)]
+        operations += [('add_edge', (rng.randrange(vertices), rng.randrange(vertices)), timestamp)
+                       for _ in range(vertices * 2)]
+        # the other replica received the same writes in another order, as fresh objects off the wire
+        shuffled = [(operation, (element[0], element[1]) if operation == 'add_edge' else element, added)
+                    for operation, element, added in operations]
+        rng.shuffle(shuffled)
+        other = LWW_Element_Graph({})
+        other.apply_batch(shuffled)
+        other.apply_batch([('remove_vertex', vertex, timestamp + 1)
+                           for vertex in rng.sample(range(vertices), int(vertices * divergence))])
+        times = []
+        for vectorize in (False, True):
+            vectorized.THRESHOLD = 0 if vectorize else None
+            graph = LWW_Element_Graph({})
+            graph.apply_batch(operations)
+            seconds, _ = timed(graph.merge, other)
+            times.append(seconds)
+        vectorized.THRESHOLD = threshold
+        print('%10d %12.3f %12.3f' % (vertices, times[0], times[1]))
+
+
+@benchmark('memory')
+def bench_memory(edges=500000, degrees=(5, 25), removed_ratio=0.1):
+    """
+    Compares the memory held by a graph with the dict storage and with the compact storage, for graphs of the
+    same number of edges and a growing average degree, a tenth of the edges being removed.
+    """
+    rng = random.Random(9)
+    timestamp = time.time()
+    print('memory: %d edges, %.0f%% removed' % (edges, removed_ratio * 100))
+    print('%8s %10s %12s %12s' % ('degree', 'storage', 'MB', 'build (s)'))
+    for degree in degrees:
+        vertices = edges // degree
+        edge_list = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(edges)]
+        removed = edge_list[::int(1 / removed_ratio)]
+        for compact in (False, True):
+            gc.collect()
+            tracemalloc.start()
+
+            def build():
+                graph = LWW_Element_Graph({}, compact=compact)
+                graph.add_vertices(range(vertices), timestamp)
+                # fresh tuples, as received from another replica
+                graph.add_edges([(first, second) for first, second in edge_list], timestamp)
+                graph.apply_batch([('remove_edge', edge, timestamp + 1) for edge in removed])
+                return graph
+            seconds, graph = timed(build)
+            gc.collect()
+            size = tracemalloc.get_traced_memory()[0]
+            tracemalloc.stop()
+            del graph
+            print('%8d %10s %12.1f %12.3f' % (degree, 'compact' if compact else 'dict', size / 10 ** 6, seconds))
+
+
+@benchmark('sharded_writers')
+def bench_sharded_writers(writer_counts=(1, 2, 4, 8), operations=200000, vertices=50000):
+    """
+    Compares the throughput of writer threads sharing a graph behind one lock and sharing a ShardedGraph.
+    """
+    from lww_element_graph_sharded import ShardedGraph
+    rng = random.Random(11)
+    timestamp = time.time()
+    writes = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(operations)]
+
+    class LockedGraph(LWW_Element_Graph):
+        def __init__(self):
+            super().__init__({})
+            self.lock = threading.Lock()
+
+        def add_vertex(self, vertex, timestamp):
+            with self.lock:
+                return super().add_vertex(vertex, timestamp)
+
+        def add_edge(self, pair_tuple, timestamp):
+            with self.lock:
+                return super().add_edge(pair_tuple, timestamp)
+
+    def write(graph, part):
+        for first, second in part:
+            graph.add_vertex(first, timestamp)
+            graph.add_vertex(second, timestamp)
+            graph.add_edge((first, second), timestamp)
+
+    print('sharded_writers: %d edge writes, %d vertices, python %d.%d' %
+          ((operations, vertices) + sys.version_info[:2]))
+    print('%8s %16s %16s' % ('writers', 'locked (ops/s)', 'sharded (ops/s)'))
+    for writers in writer_counts:
+        rates = []
+        for graph in (LockedGraph(), ShardedGraph()):
+            threads = [threading.Thread(target=write, args=(graph, writes[index::writers])) for index in range(writers)]
+            start = time.perf_counter()
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            rates.append(operations / (time.perf_counter() - start))
+        print('%8d %16.0f %16.0f' % (writers, rates[0], rates[1]))
+
+
+@benchmark('parallel_merge')
+def bench_parallel_merge(replica_count=64, vertices=20000, edges=40000, worker_counts=(1, 2, 4)):
+    """
+    Compares merging many replicas one after the other with merge_all, replicas holding most of the
+    same elements with diverging timestamps.
+    """
+    rng = random.Random(13)
+    timestamp = time.time()
+    operations = [('add_vertex', vertex, timestamp) for vertex in range(vertices)]
+    operations += [('add_edge', (rng.randrange(vertices), rng.randrange(vertices)), timestamp) for _ in range(edges)]
+    replicas = []
+    for _ in range(replica_count):
+        replica = LWW_Element_Graph({})
+        replica.apply_batch([(operation, element, added + rng.random())
+                             for operation, element, added in operations if rng.random() < 0.9])
+        replica.apply_batch([('remove_vertex', rng.randrange(vertices), timestamp + rng.random())
+                             for _ in range(vertices // 100)])
+        replicas.append(replica)
+    print('parallel_merge: %d replicas of %d vertices, %d edges, %d cpus' %
+          (replica_count, vertices, edges, os.cpu_count()))
+    print('%10s %12s %10s' % ('workers', 'seconds', 'speedup'))
+
+    def merge_loop():
+        graph = LWW_Element_Graph({})
+        for replica in replicas:
+            graph.merge(replica)
+    sequential, _ = timed(merge_loop)
+    print('%10s %12.3f %10.2f' % ('loop', sequential, 1))
+    for workers in worker_counts:
+        seconds, _ = timed(LWW_Element_Graph({}).merge_all, replicas, workers)
+        print('%10d %12.3f %10.2f' % (workers, seconds, sequential / seconds))
+
+
+@benchmark('replication')
+def bench_replication(replica_counts=(2, 4, 8, 16), vertices=2000, edges=4000, fanout=2):
+    """
+    Measures the time and anti-entropy rounds until replicas writing disjoint parts of the graph converge, every
+    replica pulling from fanout random peers per round over local TCP connections.
+    """
+    import asyncio
+    from lww_element_graph_replication import ReplicationClient, ReplicationServer
+
+    async def converge(count):
+        rng = random.Random(count)
+        timestamp = time.time()
+        graphs = []
+        for index in range(count):
+            graph = LWW_Element_Graph({}, delta_mode=True)
+            first = index * vertices
+            graph.add_vertices(range(first, first + vertices), timestamp)
+            graph.add_edges([(first + rng.randrange(vertices), first + rng.randrange(vertices))
+                             for _ in range(edges)], timestamp)
+            graphs.append(graph)
+        servers = [ReplicationServer(graph) for graph in graphs]
+        peers = [await server.start() for server in servers]
+        clients = [ReplicationClient(graph) for graph in graphs]
+        total = count * vertices
+        start = time.perf_counter()
+        rounds = 0
+        while any(len(graph) < total for graph in graphs):
+            rounds += 1
+            await asyncio.gather(*(client.sync(rng.sample([other for other in peers if other != peer],
+                                                          min(fanout, count - 1)))
+                                   for client, peer in zip(clients, peers)))
+        seconds = time.perf_counter() - start
+        for client in clients:
+            await client.close()
+        for server in servers:
+            await server.close()
+        return seconds, rounds
+
+    print('replication: %d vertices and %d edges written per replica, fanout %d' % (vertices, edges, fanout))
+    print('%10s %10s %12s' % ('replicas', 'rounds', 'seconds'))
+    for count in replica_counts:
+        seconds, rounds = asyncio.run(converge(count))
+        print('%10d %10d %12.3f' % (count, rounds, seconds))
+
+
+@benchmark('digest_sync')
+def bench_digest_sync(vertices=50000, edges=100000, divergences=(0, 10, 100, 1000)):
+    """
+    Compares the bytes and time of a full pull with a digest reconcile between two replicas which only disagree
+    on a few elements, and the cost of keeping the digest up to date on writes.
+    """
+    import asyncio
+    from lww_element_graph_replication import ReplicationClient, ReplicationServer
+    rng = random.Random(17)
+    timestamp = time.time()
+    operations = [('add_vertex', vertex, timestamp) for vertex in range(vertices)]
+    operations += [('add_edge', (rng.randrange(vertices), rng.randrange(vertices)), timestamp) for _ in range(edges)]
+    print('digest_sync: %d vertices, %d edges' % (vertices, edges))
+    plain, _ = timed(LWW_Element_Graph({}).apply_batch, operations)
+    with_digest = LWW_Element_Graph({})
+    with_digest.enable_digest()
+    digested, _ = timed(with_digest.apply_batch, operations)
+    print('apply_batch: %.3f s, %.3f s with the digest' % (plain, digested))
+    print('%12s %14s %10s %14s %10s' % ('divergence', 'pull (B)', 'pull (s)', 'reconcile (B)', 'reconcile (s)'))
+
+    async def sync(divergence):
+        results = []
+        for reconcile in (False, True):
+            local, remote = LWW_Element_Graph({}), LWW_Element_Graph({})
+            local.apply_batch(operations)
+            remote.apply_batch(operations)
+            remote.apply_batch([('remove_vertex', vertex, timestamp + 1)
+                                for vertex in rng.sample(range(vertices), divergence)])
+            if reconcile:
+                local.enable_digest()
+                remote.enable_digest()
+            async with ReplicationServer(remote) as server:
+                peer = await server.start()
+                async with ReplicationClient(local) as client:
+                    start = time.perf_counter()
+                    await (client.reconcile(peer) if reconcile else client.pull(peer))
+                    seconds = time.perf_counter() - start
+                    connection = client.connections[peer]
+                    results += [connection.sent + connection.received, seconds]
+        return results
+
+    for divergence in divergences:
+        print('%12d %14d %10.3f %14d %10.3f' % ((divergence,) + tuple(asyncio.run(sync(divergence)))))
+
+
+@benchmark('clock')
+def bench_clock(operations=1000000, vertices=200000):
+    """
+    Compares the cost of issuing timestamps with time.time() and with the hybrid logical clock, and of
+    add_vertex with the timestamps of the caller or of the clock.
+    """
+    from lww_element_graph_clock import HybridLogicalClock
+    clock = HybridLogicalClock(1)
+    print('clock: %d timestamps, %d add_vertex' % (operations, vertices))
+    print('%24s %10s' % ('', 'ns/op'))
+    for name, issue in (('time.time()', lambda: [time.time() for _ in range(operations)]),
+                        ('HLC now()', lambda: [clock.now() for _ in range(operations)]),
+                        ('HLC reserve()', lambda: list(clock.reserve(operations)))):
+        seconds, _ = timed(issue)
+        print('%24s %10.0f' % (name, seconds / operations * 10 ** 9))
+    timestamp = time.time()
+    for name, graph, stamp in (('add_vertex(v, t)', LWW_Element_Graph({}), timestamp),
+                               ('add_vertex(v) with HLC', LWW_Element_Graph({}, clock=HybridLogicalClock(1)), None)):
+        seconds, _ = timed(lambda: [graph.add_vertex(vertex, stamp) for vertex in range(vertices)])
+        print('%24s %10.0f' % (name, seconds / vertices * 10 ** 9))
+
+
+@benchmark('export')
+def bench_export(vertices=200000, edges=400000, chunk_size=10000):
+    """
+    Compares str() built by concatenation and by join, then the peak memory of exporting the state as one copy of
+    the timestamp sets and as a stream of chunks, and of loading it back.
+    """
+    graph = random_graph(vertices, edges)
+
+    def concatenated():
+        string = ''
+        for j in graph.adjacency_list:
+            string += str(j) + ':\t' + str(graph.adjacency_list[j]) + '\n'
+        return string
+
+    print('export: %d vertices, %d edges, chunks of %d rows' % (vertices, edges, chunk_size))
+    print('%24s %10s %12s' % ('', 'seconds', 'peak MiB'))
+
+    def copied():
+        return sum(len(dict(getattr(graph, lww_set))) for lww_set in LWW_SETS)
+
+    def streamed():
+        return sum(len(chunk.rows) for chunk in graph.iter_state(chunk_size))
+
+    for name, function in (('str() concatenation', concatenated), ('str() join', graph.__str__),
+                           ('copy of the sets', copied), ('iter_state', streamed),
+                           ('load_stream', lambda: LWW_Element_Graph({}).load_stream(graph.iter_state(chunk_size)))):
+        gc.collect()
+        tracemalloc.start()
+        seconds, _ = timed(function)
+        peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        print('%24s %10.3f %12.1f' % (name, seconds, peak / 2 ** 20))
+
+
+@benchmark('metrics')
+def bench_metrics(vertices=100000, edges=200000, queries=100000):
+    """
+    Compares the per operation cost of add_vertex, add_edge and query_vertices on a graph which never had metrics,
+    one with metrics enabled and one where they were enabled then disabled.
+    """
+    rng = random.Random(9)
+    edge_list = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(edges)]
+    lookups = [rng.randrange(vertices) for _ in range(queries)]
+    timestamp = time.time()
+
+    def operations(mode):
+        graph = LWW_Element_Graph({})
+        if mode != 'never':
+            graph.enable_metrics()
+        if mode == 'disabled':
+            graph.disable_metrics()
+        add_vertex, add_edge, query_vertices = graph.add_vertex, graph.add_edge, graph.query_vertices
+        write_time, _ = timed(lambda: ([add_vertex(vertex, timestamp) for vertex in range(vertices)],
+                                       [add_edge(edge, timestamp) for edge in edge_list]))
+        read_time, _ = timed(lambda: [query_vertices(vertex) for vertex in lookups])
+        export = None
+        if graph.metrics is not None:
+            export = timed(graph.metrics.prometheus)
+            graph.disable_metrics()
+        return write_time, read_time, export
+
+    print('metrics: %d vertices, %d edges, %d queries' % (vertices, edges, queries))
+    print('%10s %16s %16s' % ('metrics', 'writes (us/op)', 'reads (us/op)'))
+    exports = []
+    for mode in ('never', 'enabled', 'disabled'):
+        gc.collect()
+        write_time, read_time, export = operations(mode)
+        print('%10s %16.3f %16.3f' % (mode, write_time * 10 ** 6 / (vertices + edges), read_time * 10 ** 6 / queries))
+        if export is not None:
+            exports.append(export)
+    export_time, text = exports[0]
+    print('prometheus export: %d lines in %.1f ms' % (text.count('\n'), export_time * 1000))
+
+
+@benchmark('edge_modes')
+def bench_edge_modes(vertices=100000, edges=300000, queries=100000):
+    """
+    Compares add_edge, remove_edge and the neighbour queries of the edge modes: edges keyed as given, canonical
+    undirected keys, directed edges and labeled multi-edges.
+    """
+    rng = random.Random(10)
+    edge_list = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(edges)]
+    lookups = [rng.randrange(vertices) for _ in range(queries)]
+    timestamp = time.time()
+    print('edge_modes: %d vertices, %d edges, %d queries' % (vertices, edges, queries))
+    print('%22s %14s %14s %14s %14s' % ('', 'add (us/op)', 'remove (us/op)', 'succ (us/op)', 'pred (us/op)'))
+    for name, kwargs, keys in (('keyed as given', {}, edge_list),
+                               ('directed=False', {'directed': False}, edge_list),
+                               ('directed=True', {'directed': True}, edge_list),
+                               ('multi=True', {'directed': False, 'multi': True},
+                                [edge + (index % 3,) for index, edge in enumerate(edge_list)])):
+        graph = LWW_Element_Graph({}, **kwargs)
+        graph.add_vertices(range(vertices), timestamp)
+        add_time, _ = timed(lambda: [graph.add_edge(edge, timestamp) for edge in keys])
+        successors_time, _ = timed(lambda: [graph.query_vertices(vertex) for vertex in lookups])
+        predecessors_time, _ = timed(lambda: [graph.query_predecessors(vertex) for vertex in lookups])
+        remove_time, _ = timed(lambda: [graph.remove_edge(edge, timestamp + 1) for edge in keys[:queries]])
+        print('%22s %14.3f %14.3f %14.3f %14.3f' % (name, add_time * 10 ** 6 / edges, remove_time * 10 ** 6 / queries,
+                                                    successors_time * 10 ** 6 / queries,
+                                                    predecessors_time * 10 ** 6 / queries))
+
+
+@benchmark('merge_divergence')
+def bench_merge_divergence(vertices=100000, degree=4, divergences=(10, 100, 1000, 10000)):
+    """
+    Merges a replica diverged by a growing number of operations from a scale-free graph: full merge, merge guided
+    by the digests of both graphs, and the former merge followed by a rebuild of the adjacency list.
+    """
+    edges = power_law_edges(vertices, degree)
+    timestamp = time.time()
+    print('merge_divergence: %d vertices, %d edges' % (vertices, len(edges)))
+    print('%10s %12s %12s %12s %12s' % ('operations', 'rebuild (s)', 'merge (s)', 'digest (s)', 'keys'))
+    for divergence in divergences:
+        replica = power_law_graph(vertices, edges=edges, timestamp=timestamp)
+        replica.apply_batch(churn_operations(vertices, edges, divergence, seed=divergence))
+        graphs = [power_law_graph(vertices, edges=edges, timestamp=timestamp) for _ in range(3)]
+        rebuild_time, _ = timed(lambda: graphs[0].merge_delta(replica)._rebuild())
+        merge_time, _ = timed(graphs[1].merge, replica)
+        graphs[2].enable_digest()
+        replica.enable_digest()
+        metrics = graphs[2].enable_metrics(['merge_delta'])
+        digest_time, _ = timed(graphs[2].merge, replica)
+        replica.digest = None
+        assert graphs[0].adjacency_list == graphs[1].adjacency_list == graphs[2].adjacency_list
+        print('%10d %12.4f %12.4f %12.4f %12d' % (divergence, rebuild_time, merge_time, digest_time,
+                                                 metrics.keys_compared))
+
+
+@benchmark('query_cache')
+def bench_query_cache(vertices=100000, queries=50000, hot_queries=1000, writes_every=(10, 100, 1000)):
+    """
+    Replays the same hot set of query_vertices and find_path requests between writes on a scale-free graph,
+    without cache and with the query cache, for a growing number of reads per write. Half of the writes remove an
+    edge, the other half add a new one, which invalidates every cached path.
+    """
+    edges = power_law_edges(vertices)
+    timestamp = time.time()
+    rng = random.Random(11)
+    hot = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(hot_queries)]
+    workload = [hot[min(int(rng.paretovariate(1.2)) - 1, hot_queries - 1)] for _ in range(queries)]
+    print('query_cache: %d vertices, %d queries over %d hot pairs' % (vertices, queries, hot_queries))
+    print('%12s %12s %12s %10s %10s' % ('reads/write', 'plain (s)', 'cached (s)', 'hit ratio', 'evictions'))
+    for every in writes_every:
+        results = []
+        for cached in (False, True):
+            graph = power_law_graph(vertices, edges=edges, timestamp=timestamp)
+            if cached:
+                graph.enable_cache()
+            writes = random.Random(every)
+
+            def replay():
+                for index, (start, end) in enumerate(workload):
+                    if index % every == 0:
+                        if writes.random() < 0.5:
+                            graph.remove_edge(edges[writes.randrange(len(edges))], timestamp + index + 1)
+                        else:
+                            graph.add_edge((writes.randrange(vertices), writes.randrange(vertices)),
+                                           timestamp + index + 1)
+                    graph.query_vertices(start)
+                    graph.find_path(start, end)
+            results.append((timed(replay)[0], graph.cache))
+        (plain_time, _), (cached_time, cache) = results
+        stats = cache.stats()
+        print('%12d %12.3f %12.3f %10.2f %10d' % (every, plain_time, cached_time,
+                                                  stats['hits'] / (stats['hits'] + stats['misses']),
+                                                  stats['evictions']))
+
+
+@benchmark('cow_snapshot')
+def bench_cow_snapshot(vertices=100000, operations=20000, reader_counts=(1, 2, 4), publish_every=1000):
+    """
+    Measures the cost of a copy-on-write snapshot: taking it, the first write after it which copies the containers
+    of the graph, the writes after, then the reads and writes per second of reader threads querying snapshots
+    republished by a writer thread, against readers sharing one lock with the writer on the graph itself.
+    """
+    edges = power_law_edges(vertices)
+    timestamp = time.time()
+    rng = random.Random(13)
+    writes = [(rng.randrange(vertices), rng.randrange(vertices)) for _ in range(operations)]
+    print('cow_snapshot: %d vertices, %d edges, %d writes' % (vertices, len(edges), operations))
+    graph = power_law_graph(vertices, edges=edges, timestamp=timestamp)
+    snapshot_time = min(timed(graph.snapshot)[0] for _ in range(100))
+    copy_time = timed(lambda: {vertex: set(neighbours) for vertex, neighbours in graph.adjacency_list.items()})[0]
+    print('snapshot %.2f us, deep copy of the adjacency list %.1f ms' % (snapshot_time * 1e6, copy_time * 1e3))
+    for snapshots in (False, True):
+        graph = power_law_graph(vertices, edges=edges, timestamp=timestamp)
+        kept = graph.snapshot() if snapshots else None
+        first_time = timed(graph.add_edge, writes[0], timestamp + 1)[0]
+
+        def write():
+            for edge in writes[1:]:
+                graph.add_edge(edge, timestamp + 1)
+        print('%-15s first write %8.2f ms, next writes %.2f us/op' %
+              ('snapshot alive' if snapshots else 'no snapshot', first_time * 1e3,
+               timed(write)[0] / (operations - 1) * 1e6))
+        del kept
+        gc.collect()
+
+    print('%8s %20s %20s %20s %20s' % ('readers', 'locked reads/s', 'locked writes/s', 'snapshot reads/s',
+                                       'snapshot writes/s'))
+    for readers in reader_counts:
+        rates = []
+        for use_snapshots in (False, True):
+            graph = power_law_graph(vertices, edges=edges, timestamp=timestamp)
+            lock = threading.Lock()
+            published = [graph.snapshot() if use_snapshots else graph]
+            done = threading.Event()
+            reads = [0] * readers
+
+            def read(index):
+                queries = random.Random(index)
+                count = 0
+                while not done.is_set():
+                    start, end = queries.randrange(vertices), queries.randrange(vertices)
+                    if use_snapshots:
+                        published[-1].find_path(start, end)
+                    else:
+                        with lock:
+                            graph.find_path(start, end)
+                    count += 1
+                reads[index] = count
+
+            def write():
+                for index, edge in enumerate(writes):
+                    if use_snapshots:
+                        graph.add_edge(edge, timestamp + 1)
+                        if index % publish_every == 0:
+                            published[-1] = graph.snapshot()
+                    else:
+                        with lock:
+                            graph.add_edge(edge, timestamp + 1)
+
+            threads = [threading.Thread(target=read, args=(index,)) for index in range(readers)]
+            for thread in threads:
+                thread.start()
+            elapsed = timed(write)[0]
+            done.set()
+            for thread in threads:
+                thread.join()
+            rates += [sum(reads) / elapsed, operations / elapsed]
+        print('%8d %20.0f %20.0f %20.0f %20.0f' % ((readers,) + tuple(rates)))
+
+
+@benchmark('partial_replication')
+def bench_partial_replication(vertices=100000, degree=4, partition_counts=(1, 2, 4, 8, 16), churn=10000):
+    """
+    Measures the replicas restricted to one hash partition of a scale-free graph: the entries and encoded bytes of
+    the partition state against the whole state, the memory of the replica, then the bytes of an incremental sync
+    after a churn of writes.
+    """
+    from lww_element_graph_codec import encode_delta
+    from lww_element_graph_partition import Partition, state_size
+    timestamp = time.time()
+    full = power_law_graph(vertices, degree, timestamp=timestamp, delta_mode=True)
+    version = full.version
+    source = power_law_graph(vertices, degree, timestamp=timestamp, delta_mode=True)
+    source.apply_batch(churn_operations(vertices, power_law_edges(vertices, degree), churn, seed=3, remove_ratio=0.3))
+    full_sync = bytearray()
+    encode_delta(source.deltas_since(version), full_sync)
+    print('partial_replication: %d vertices, %d edges, %d entries, churn of %d writes' %
+          (vertices, full.edge_count(), state_size(full), churn))
+    print('%10s %10s %12s %10s %12s %14s %14s' % ('partitions', 'entries', 'state (MB)', 'MB', 'extract (s)',
+                                                   'sync (KB)', 'full sync (KB)'))
+    for partitions in partition_counts:
+        partition = Partition.hashed(0, partitions)
+        seconds, state = timed(full.partition_state, partition)
+        encoded = bytearray()
+        encode_delta(state, encoded)
+        gc.collect()
+        tracemalloc.start()
+        replica = LWW_Element_Graph({}).restrict(partition).merge_delta(state)
+        gc.collect()
+        size = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        sync = bytearray()
+        encode_delta(source.partition_state(partition, version), sync)
+        print('%10d %10d %12.2f %10.1f %12.3f %14.1f %14.1f' % (partitions, state_size(state), len(encoded) / 10 ** 6,
+                                                              size / 10 ** 6, seconds, len(sync) / 1000,
+                                                              len(full_sync) / 1000))
+        del replica
+
+
+def operation_case(name, samples):
+    """
+    Registers the decorated function as the workload of an operation of the operations benchmark.
+    The function is called with the number of vertices, the number of samples and a random generator and
+    returns the operation to call and the list of its argument tuples, one per sample.
+    :param samples: number of calls measured per graph size.
+    :return: decorator.
+    """
+    def register(function):
+        OPERATIONS[name] = (function, samples)
+        return function
+    return register
+
+
+@operation_case('add_vertex', 2000)
+def case_add_vertex(vertices, samples, rng):
+    timestamp = time.time()
+    return power_law_graph(vertices).add_vertex, [(vertices + index, timestamp) for index in range(samples)]
+
+
+@operation_case('add_edge', 2000)
+def case_add_edge(vertices, samples, rng):
+    timestamp = time.time()
+    return power_law_graph(vertices).add_edge, [((rng.randrange(vertices), rng.randrange(vertices)), timestamp)
+                                                for _ in range(samples)]
+
+
+@operation_case('remove_vertex', 2000)
+def case_remove_vertex(vertices, samples, rng):
+    timestamp = time.time() + 1
+    return power_law_graph(vertices).remove_vertex, [(vertex, timestamp)
+                                                     for vertex in rng.sample(range(vertices), samples)]
+
+
+@operation_case('remove_edge', 2000)
+def case_remove_edge(vertices, samples, rng):
+    edges = power_law_edges(vertices)
+    timestamp = time.time() + 1
+    graph = power_law_graph(vertices, edges=edges)
+    return graph.remove_edge, [(edge, timestamp) for edge in rng.sample(edges, samples)]
+
+
+@operation_case('churn', 2000)
+def case_churn(vertices, samples, rng):
+    edges = power_law_edges(vertices)
+    graph = power_law_graph(vertices, edges=edges)
+    return (lambda operation, element, timestamp: getattr(graph, operation)(element, timestamp),
+            churn_operations(vertices, edges, samples, rng.randrange(1 << 30)))
+
+
+@operation_case('query_vertices', 2000)
+def case_query_vertices(vertices, samples, rng):
+    return power_law_graph(vertices).query_vertices, [(rng.randrange(vertices),) for _ in range(samples)]
+
+
+@operation_case('get_vertices', 20)
+def case_get_vertices(vertices, samples, rng):
+    return power_law_graph(vertices).get_vertices, [()] * samples
+
+
+@operation_case('find_path', 200)
+def case_find_path(vertices, samples, rng):
+    return power_law_graph(vertices).find_path, [(rng.randrange(vertices), rng.randrange(vertices))
+                                                 for _ in range(samples)]
+
+
+@operation_case('merge', 3)
+def case_merge(vertices, samples, rng):
+    replicas = divergent_replicas(vertices, replicas=samples + 1, seed=rng.randrange(1 << 30))
+    return replicas[0].merge, [(replica,) for replica in replicas[1:]]
+
+
+def percentile(ordered, fraction):
+    """
+    :param ordered: sorted list of values.
+    :return: value below which the given fraction of the values lie.
+    """
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(name, vertices, seed=0) -> dict:
+    """
+    Times every call of an operation of the operations benchmark on a graph of the given size, then runs the
+    same calls on a new graph under tracemalloc for the peak memory, which would otherwise skew the latencies.
+    :return: dict of the results.
+    """
+    setup, samples = OPERATIONS[name]
+    samples = min(samples, vertices)
+    function, arguments = setup(vertices, samples, random.Random(seed))
+    clock = time.perf_counter_ns
+    latencies = []
+    gc.collect()
+    for args in arguments:
+        start = clock()
+        function(*args)
+        latencies.append(clock() - start)
+    function, arguments = setup(vertices, samples, random.Random(seed))
+    gc.collect()
+    tracemalloc.start()
+    for args in arguments:
+        function(*args)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    latencies.sort()
+    return {'benchmark': 'operations', 'operation': name, 'vertices': vertices, 'samples': samples,
+            'ops_per_second': samples * 10 ** 9 / max(sum(latencies), 1),
+            'p50_us': percentile(latencies, 0.5) / 1000, 'p99_us': percentile(latencies, 0.99) / 1000,
+            'peak_kib': peak / 1024}
+
+
+@benchmark('operations')
+def bench_operations(sizes=(1000, 10000, 100000), seed=0):
+    """
+    Measures every public operation on scale-free graphs of growing size: throughput, median and 99th percentile
+    latency of single calls, and peak memory allocated by all the calls. The results are recorded for --json.
+    """
+    print('operations: scale-free graphs of average degree 4, seed %d' % seed)
+    print('%16s %10s %8s %14s %12s %12s %12s' % ('operation', 'vertices', 'samples', 'ops/s', 'p50 (us)',
+                                                 'p99 (us)', 'peak (KiB)'))
+    for name in OPERATIONS:
+        for vertices in sizes:
+            result = measure(name, vertices, seed)
+            RESULTS.append(result)
+            print('%16s %10d %8d %14.0f %12.1f %12.1f %12.1f' % (
+                name, vertices, result['samples'], result['ops_per_second'], result['p50_us'], result['p99_us'],
+                result['peak_kib']))
+
+
+def compare(baseline, current, threshold=0.2) -> list:
+    """
+    Compares two runs recorded with --json.
+    :param baseline: results of the reference run.
+    :param current: results of the run to check.
+    :param threshold: relative change of a metric considered a regression.
+    :return: list of (benchmark, operation, vertices, metric, baseline value, current value) of the regressions.
+    """
+    reference = {(result['benchmark'], result['operation'], result['vertices']): result for result in baseline}
+    regressions = []
+    for result in current:
+        key = (result['benchmark'], result['operation'], result['vertices'])
+        before = reference.get(key)
+        if before is None:
+            continue
+        for metric, higher_is_better in REGRESSION_METRICS.items():
+            old, new = before[metric], result[metric]
+            if old <= 0:
+                continue
+            change = (old - new) / old if higher_is_better else (new - old) / old
+            if change > threshold:
+                regressions.append(key + (metric, old, new))
+    return regressions
+
+
+def compare_files(baseline_path, current_path, threshold) -> int:
+    """
+    Prints the regressions between two runs recorded with --json.
+    :return: exit status, 1 if there is a regression.
+    """
+    runs = []
+    for path in (baseline_path, current_path):
+        with open(path) as file:
+            runs.append(json.load(file)['results'])
+    regressions = compare(*runs, threshold=threshold)
+    print('%d regressions over %d%% between %s and %s' % (len(regressions), threshold * 100, baseline_path,
+                                                          current_path))
+    if regressions:
+        print('%12s %16s %10s %16s %14s %14s' % ('benchmark', 'operation', 'vertices', 'metric', 'baseline',
+                                                 'current'))
+    for regression in regressions:
+        print('%12s %16s %10d %16s %14.1f %14.1f' % regression)
+    return 1 if regressions else 0
+
+
+def main(argv):
+    parser = argparse.ArgumentParser(description='Benchmarks of the LWW-element-graph.')
+    parser.add_argument('names', nargs='*', help='benchmarks to run, all when none is given: %s' %
+                        ', '.join(BENCHMARKS))
+    parser.add_argument('--json', metavar='PATH', help='write the recorded results to PATH')
+    parser.add_argument('--compare', nargs=2, metavar=('BASELINE', 'CURRENT'),
+                        help='flag the regressions between two --json files instead of running benchmarks')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative change flagged as a regression (default: %(default)s)')
+    arguments = parser.parse_args(argv)
+    if arguments.compare:
+        return compare_files(*arguments.compare, arguments.threshold)
+    logging.disable(logging.INFO)
+    for name in arguments.names or BENCHMARKS:
+        BENCHMARKS[name]()
+    if arguments.json:
+        with open(arguments.json, 'w') as file:
+            json.dump({'python': platform.python_version(), 'platform': platform.platform(),
+                       'created': time.time(), 'results': RESULTS}, file, indent=1)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,152 @@
+"""
+This module contains the opt-in query cache of the (Last-Write-Wins)LWW-element-graph.
+
+Once enabled with LWW_Element_Graph.enable_cache, query_vertices and find_path (and shortest_path and is_reachable,
+which call it) keep their results in a bounded LRU cache. Every entry is stamped with the version of the graph it
+was computed at, and the graph stamps a vertex with its current version whenever the neighbours of the vertex change.
+An entry is stale, and dropped when looked up, when
+- query_vertices: its vertex changed after the entry was computed,
+- find_path: a link was added anywhere in the graph since, which may open a shorter path, or, for a found path,
+  one of the vertices along the path changed. A removal elsewhere can not shorten a shortest path nor open one.
+The version stamps of the vertices count in the memory budget. A stamp no older than every cached entry can not
+make one stale, such stamps are dropped once their number doubled since the last pruning, or when the stamps alone
+exceed the budget.
+"""
+import sys
+from collections import OrderedDict
+
+# returned by QueryCache.get when the query has no valid entry, None being a valid result
+MISS = object()
+# estimated size in bytes of an entry besides its key and result: the entry tuple and the ordered dict node
+ENTRY_OVERHEAD = 160
+# estimated size in bytes of the version stamp of a vertex: its slot in the dict and the int of the version
+STAMP_SIZE = 100
+# number of stamps below which they are not pruned
+PRUNE_MIN = 1024
+
+
+class QueryCache:
+    """
+    Bounded LRU cache of the results of the queries of one graph, see the module documentation.
+    """
+
+    def __init__(self, graph, max_bytes=64 << 20):
+        """
+        :param graph: LWW_Element_Graph whose queries are cached.
+        :param max_bytes: memory budget of the entries, least recently used entries are evicted past it.
+        """
+        self.graph = graph
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        # version of the graph at the last change of the neighbours of every vertex, and at the last link added
+        self.versions = {}
+        self.last_link = graph.version
+        # number of stamps at which they are pruned next
+        self.prune_at = PRUNE_MIN
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key):
+        """
+        :param key: tuple of the query name and its arguments.
+        :return: the cached result, MISS if there is none or it is stale.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            result, version, vertices, link_sensitive, _ = entry
+            versions = self.versions
+            if (link_sensitive and self.last_link > version) or \
+                    any(versions.get(vertex, 0) > version for vertex in vertices):
+                self._drop(key)
+                self.invalidations += 1
+            else:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return result
+        self.misses += 1
+        return MISS
+
+    def put(self, key, result, vertices, link_sensitive=False):
+        """
+        Caches the result of a query computed at the current version of the graph.
+        :param key: tuple of the query name and its arguments.
+        :param result: tuple or None.
+        :param vertices: vertices whose changes make the result stale.
+        :param link_sensitive: if True any link added to the graph makes the result stale.
+        """
+        size = sys.getsizeof(key) + sys.getsizeof(result) + ENTRY_OVERHEAD
+        if size > self.max_bytes:
+            return
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (result, self.graph.version, vertices, link_sensitive, size)
+        self.bytes += size
+        self._evict()
+
+    def _evict(self):
+        """
+        Evicts the least recently used entries, and prunes the stamps, until the cache fits in its budget.
+        """
+        while self.bytes > self.max_bytes:
+            if not self.entries or len(self.versions) >= self.prune_at:
+                self._prune()
+                if self.bytes <= self.max_bytes or not self.entries:
+                    return
+            _, entry = self.entries.popitem(last=False)
+            self.bytes -= entry[4]
+            self.evictions += 1
+
+    def _prune(self):
+        """
+        Drops the stamps which can not make any cached entry stale, see the module documentation.
+        """
+        oldest = min((entry[1] for entry in self.entries.values()), default=self.graph.version)
+        stale = [vertex for vertex, version in self.versions.items() if version <= oldest]
+        for vertex in stale:
+            del self.versions[vertex]
+        self.bytes -= len(stale) * STAMP_SIZE
+        self.prune_at = max(2 * len(self.versions), PRUNE_MIN)
+
+    def _drop(self, key):
+        self.bytes -= self.entries.pop(key)[4]
+
+    def changed(self, vertices, linked):
+        """
+        Stamps the vertices whose neighbours changed with the current version of the graph, the graph calls it
+        on every change of the adjacency list.
+        :param vertices: iterable of vertices.
+        :param linked: True if a link was added, False if links were only removed.
+        """
+        version = self.graph.version
+        versions = self.versions
+        stamps = len(versions)
+        for vertex in vertices:
+            versions[vertex] = version
+        self.bytes += (len(versions) - stamps) * STAMP_SIZE
+        if linked:
+            self.last_link = version
+        if len(versions) >= self.prune_at:
+            self._prune()
+        self._evict()
+
+    def clear(self):
+        """
+        Drops all the entries, the graph calls it when its adjacency list is rebuilt.
+        """
+        self.entries.clear()
+        self.bytes = 0
+        self.versions.clear()
+        self.last_link = self.graph.version
+        self.prune_at = PRUNE_MIN
+
+    def stats(self) -> dict:
+        """
+        :return: dict of the number of entries and of version stamps, their estimated bytes, hits, misses, evictions
+                 and invalidations.
+        """
+        return {'entries': len(self.entries), 'stamps': len(self.versions), 'bytes': self.bytes,
+                'max_bytes': self.max_bytes, 'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions,
+                'invalidations': self.invalidations}
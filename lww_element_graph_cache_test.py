@@ -0,0 +1,129 @@
+import random
+import time
+import unittest
+
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_cache import STAMP_SIZE
+
+
+def chain(count, **kwargs) -> LWW_Element_Graph:
+    """
+    :return: graph holding a path over count vertices.
+    """
+    graph = LWW_Element_Graph({}, **kwargs)
+    timestamp = time.time()
+    for vertex in range(count):
+        graph.add_vertex(vertex, timestamp)
+        if vertex:
+            graph.add_edge((vertex - 1, vertex), timestamp)
+    return graph
+
+
+class Test_Query_Cache(unittest.TestCase):
+
+    def test_invalidation(self):
+        """
+        This method tests that a write only invalidates the cached results it may change.
+        """
+        graph = chain(10)
+        graph.add_vertex(20, time.time())
+        cache = graph.enable_cache()
+        self.assertEqual(graph.find_path(0, 4), [0, 1, 2, 3, 4])
+        self.assertEqual(graph.find_path(0, 4), [0, 1, 2, 3, 4])
+        self.assertIsNone(graph.find_path(0, 20))
+        self.assertEqual(sorted(graph.query_vertices(5)), [4, 6])
+        self.assertEqual(sorted(graph.query_vertices(8)), [7, 9])
+        self.assertEqual((cache.hits, cache.misses), (1, 4))
+
+        graph.remove_edge((6, 7), time.time() + 1)
+        self.assertEqual(graph.find_path(0, 4), [0, 1, 2, 3, 4])
+        self.assertIsNone(graph.find_path(0, 20))
+        self.assertEqual(sorted(graph.query_vertices(5)), [4, 6])
+        self.assertEqual(graph.query_vertices(7), [8])
+        self.assertEqual((cache.hits, cache.invalidations), (4, 0))
+
+        graph.remove_vertex(2, time.time() + 1)
+        self.assertIsNone(graph.find_path(0, 4))
+        self.assertEqual(cache.invalidations, 1)
+        graph.add_edge((0, 20), time.time() + 2)
+        self.assertEqual(graph.find_path(0, 20), [0, 20])
+        self.assertEqual(sorted(graph.query_vertices(8)), [7, 9])
+        self.assertEqual(cache.invalidations, 2)
+
+    def test_memory_budget(self):
+        """
+        This method tests that the least recently used results are evicted past the memory budget.
+        """
+        graph = chain(100)
+        cache = graph.enable_cache(max_bytes=2000)
+        for vertex in range(100):
+            graph.query_vertices(vertex)
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 2000)
+        self.assertEqual(stats['entries'] + stats['evictions'], 100)
+        graph.query_vertices(99)
+        graph.query_vertices(0)
+        self.assertEqual(cache.stats()['hits'], 1)
+        graph.disable_cache()
+        self.assertEqual(graph.query_vertices(0), [1])
+
+    def test_stamps_bounded(self):
+        """
+        This method tests that the version stamps of a long-running cache stay within its memory budget
+        and that pruning them keeps the cached results valid.
+        """
+        graph = chain(10)
+        cache = graph.enable_cache(max_bytes=50000)
+        timestamp = time.time() + 1
+        for vertex in range(10, 5000):
+            graph.add_vertex(vertex, timestamp)
+            graph.add_edge((vertex, vertex - 1), timestamp)
+            graph.query_vertices(vertex - 5)
+            self.assertEqual(graph.find_path(0, 3), [0, 1, 2, 3])
+            self.assertEqual(sorted(graph.query_vertices(vertex - 5)), [vertex - 6, vertex - 4])
+        stats = cache.stats()
+        self.assertLessEqual(stats['bytes'], 50000)
+        self.assertLessEqual(stats['stamps'] * STAMP_SIZE, 50000)
+        self.assertGreater(stats['hits'], 0)
+        graph.remove_edge((4, 5), timestamp + 1)
+        self.assertEqual(graph.query_vertices(4), [3])
+        self.assertEqual(graph.query_vertices(4999), [4998])
+
+    def test_matches_uncached_graph(self):
+        """
+        This method tests that the cached results are the results of a graph without cache after random writes.
+        """
+        for mode in ({}, {'directed': True}):
+            rng = random.Random(1)
+            cached, plain = chain(30, **mode), chain(30, **mode)
+            cached.enable_cache()
+            timestamp = time.time() + 1
+            for step in range(600):
+                operation = rng.choice(('add_vertex', 'remove_vertex', 'add_edge', 'remove_edge', 'merge'))
+                timestamp += 1
+                if operation == 'merge':
+                    replica = chain(30, **mode)
+                    replica.remove_vertex(rng.randrange(30), timestamp)
+                    cached.merge(replica)
+                    plain.merge(replica)
+                    continue
+                element = rng.randrange(30) if operation.endswith('vertex') else \
+                    (rng.randrange(30), rng.randrange(30))
+                for graph in (cached, plain):
+                    getattr(graph, operation)(element, timestamp)
+                for _ in range(3):
+                    start, end = rng.randrange(30), rng.randrange(30)
+                    path, expected = cached.find_path(start, end), plain.find_path(start, end)
+                    # equally short paths may differ, the cached one must still be a path of the graph
+                    self.assertEqual(path is None, expected is None, (mode, step))
+                    if path is not None:
+                        self.assertEqual(len(path), len(expected), (mode, step))
+                        self.assertTrue(all(second in plain.adjacency_list[first]
+                                            for first, second in zip(path, path[1:])), (mode, step))
+                    self.assertEqual(sorted(cached.query_vertices(start) or ()),
+                                     sorted(plain.query_vertices(start) or ()), (mode, step))
+            self.assertGreater(cached.cache.hits, 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,103 @@
+"""
+This module contains the clocks issuing the timestamps of the (Last-Write-Wins)LWW-element-graph.
+
+A graph without a clock takes the timestamps of the callers, and add_vertex moves them up to time.time().
+A graph with a clock (LWW_Element_Graph(..., clock=HybridLogicalClock(replica_id))) issues the timestamps of the
+operations called without one and observes every timestamp it receives, so its next timestamps are newer.
+
+A hybrid logical clock timestamp is a packed 63 bits integer:
+    43 bits of milliseconds since the epoch, 12 bits of logical counter, 8 bits of replica id
+The milliseconds and counter follow the wall clock but never go back, they move past every timestamp observed
+from the other replicas, and two replicas can not issue the same timestamp, the replica id breaks the ties.
+Comparing two timestamps is an int comparison.
+"""
+import time
+
+PHYSICAL_BITS = 43
+COUNTER_BITS = 12
+REPLICA_BITS = 8
+MAX_REPLICA_ID = (1 << REPLICA_BITS) - 1
+
+
+def pack(milliseconds, counter, replica_id) -> int:
+    """
+    :return: hybrid logical clock timestamp.
+    """
+    return (milliseconds << COUNTER_BITS | counter) << REPLICA_BITS | replica_id
+
+
+def unpack(timestamp) -> tuple:
+    """
+    :return: tuple of the milliseconds, counter and replica id of a hybrid logical clock timestamp.
+    """
+    return (timestamp >> (COUNTER_BITS + REPLICA_BITS), timestamp >> REPLICA_BITS & (1 << COUNTER_BITS) - 1,
+            timestamp & MAX_REPLICA_ID)
+
+
+class WallClock:
+    """
+    Clock issuing time.time() float timestamps, the timestamps of the other replicas are trusted as-is.
+    """
+    # array typecode of the timestamps, see lww_element_graph_compact
+    typecode = 'd'
+
+    @staticmethod
+    def now() -> float:
+        """
+        :return: timestamp of a new operation.
+        """
+        return time.time()
+
+    def observe(self, timestamp):
+        """
+        Takes a timestamp received from another replica into account.
+        """
+
+
+class HybridLogicalClock:
+    """
+    Hybrid logical clock of one replica, see the module documentation.
+    """
+    typecode = 'q'
+
+    def __init__(self, replica_id, wall_clock=time.time_ns):
+        """
+        :param replica_id: id of the replica, unique among the replicas, 0 to MAX_REPLICA_ID.
+        :param wall_clock: function returning the wall clock time in nanoseconds.
+        """
+        if not 0 <= replica_id <= MAX_REPLICA_ID:
+            raise ValueError('replica id must be between 0 and %d' % MAX_REPLICA_ID)
+        self.replica_id = replica_id
+        self.wall_clock = wall_clock
+        # milliseconds and counter of the last timestamp issued or observed, packed: a counter overflow carries
+        # over in the milliseconds
+        self.logical = 0
+
+    def now(self) -> int:
+        """
+        :return: timestamp of a new operation, newer than every timestamp issued or observed so far.
+        """
+        logical = self.wall_clock() // 1000000 << COUNTER_BITS
+        if logical <= self.logical:
+            logical = self.logical + 1
+        self.logical = logical
+        return logical << REPLICA_BITS | self.replica_id
+
+    def reserve(self, count) -> range:
+        """
+        Issues count timestamps reading the wall clock once, e.g. to timestamp a batch of operations.
+        :return: range of the timestamps, in increasing order.
+        """
+        first = max(self.logical + 1, self.wall_clock() // 1000000 << COUNTER_BITS)
+        self.logical = first + count - 1
+        step = 1 << REPLICA_BITS
+        return range(first << REPLICA_BITS | self.replica_id, (first + count) << REPLICA_BITS, step)
+
+    def observe(self, timestamp):
+        """
+        Moves the clock past a timestamp received from another replica.
+        :param timestamp: hybrid logical clock timestamp.
+        """
+        logical = timestamp >> REPLICA_BITS
+        if logical > self.logical:
+            self.logical = logical
@@ -0,0 +1,145 @@
+import os
+import tempfile
+import unittest
+
+import lww_element_graph_numpy as vectorized
+from lww_element_graph import LWW_Element_Graph, Delta
+from lww_element_graph_clock import HybridLogicalClock, pack, unpack
+from lww_element_graph_codec import decode_delta, encode_delta
+from lww_element_graph_testing import StateAssertions
+from lww_element_graph_wal import OperationLog
+
+
+class FrozenWallClock:
+    """
+    Wall clock in nanoseconds which only moves when told to.
+    """
+
+    def __init__(self, milliseconds):
+        self.nanoseconds = milliseconds * 1000000
+
+    def __call__(self):
+        return self.nanoseconds
+
+
+class Test_Hybrid_Logical_Clock(StateAssertions, unittest.TestCase):
+
+    def test_timestamps(self):
+        """
+        This method tests that the clock follows the wall clock, never goes back and moves past observed timestamps.
+        """
+        wall_clock = FrozenWallClock(1000)
+        clock = HybridLogicalClock(3, wall_clock)
+        self.assertEqual(unpack(clock.now()), (1000, 0, 3))
+        self.assertEqual(unpack(clock.now()), (1000, 1, 3))
+        wall_clock.nanoseconds = 999 * 1000000
+        self.assertEqual(unpack(clock.now()), (1000, 2, 3))
+        clock.observe(pack(5000, 7, 1))
+        self.assertEqual(unpack(clock.now()), (5000, 8, 3))
+        clock.observe(pack(10, 0, 9))
+        self.assertEqual(unpack(clock.now()), (5000, 9, 3))
+        wall_clock.nanoseconds = 6000 * 1000000
+        self.assertEqual(unpack(clock.now()), (6000, 0, 3))
+
+        reserved = clock.reserve(5000)
+        self.assertEqual(len(reserved), 5000)
+        self.assertEqual(unpack(reserved[0]), (6000, 1, 3))
+        self.assertEqual(unpack(reserved[-1]), (6001, 904, 3))
+        self.assertGreater(clock.now(), reserved[-1])
+        self.assertRaises(ValueError, HybridLogicalClock, 256)
+
+    def test_replica_tiebreak(self):
+        """
+        This method tests that replicas issuing timestamps at the same time converge on the highest replica id.
+        """
+        first = LWW_Element_Graph({}, clock=HybridLogicalClock(1, FrozenWallClock(1000)))
+        second = LWW_Element_Graph({}, clock=HybridLogicalClock(2, FrozenWallClock(1000)))
+        first.add_vertex(1)
+        second.add_vertex(1)
+        second.remove_vertex(1)
+        first.merge(second)
+        second.merge(first)
+        self.assertEqual(first.get_vertices(), [])
+        self.assertEqual(second.get_vertices(), [])
+        self.assertEqual(first.remove_vertex_set, second.remove_vertex_set)
+
+    def test_graph_with_clock(self):
+        """
+        This method tests the operations of a graph issuing its timestamps, merged with a replica ahead of it.
+        """
+        graph = LWW_Element_Graph({}, clock=HybridLogicalClock(1, FrozenWallClock(1000)))
+        other = LWW_Element_Graph({}, clock=HybridLogicalClock(2, FrozenWallClock(9000)))
+        self.assertTrue(graph.add_vertex(1))
+        self.assertTrue(graph.add_vertex(2))
+        self.assertTrue(graph.add_edge((1, 2)))
+        other.merge(graph)
+        self.assertTrue(other.remove_edge((1, 2)))
+        graph.merge(other)
+        self.assertFalse(graph.check_edge_exists((1, 2)))
+        # the clock moved past the removal made at 9000 ms, the edge comes back
+        self.assertTrue(graph.add_edge((1, 2)))
+        self.assertEqual(unpack(graph.add_edge_set[(1, 2)])[0], 9000)
+        self.assertTrue(all(type(timestamp) is int for timestamp in graph.add_vertex_set.values()))
+        graph.add_vertices(range(3, 10))
+        self.assertEqual(len(graph), 9)
+
+    def test_rejected_merge(self):
+        """
+        This method tests that a merge whose timestamps the clock can not observe leaves the graph unchanged.
+        """
+        graph = LWW_Element_Graph({}, clock=HybridLogicalClock(1, FrozenWallClock(1000)))
+        graph.add_vertices([1, 2])
+        graph.add_edge((1, 2))
+        version = graph.version
+        delta = Delta(None, {3: pack(2000, 0, 2)}, {}, {}, {(1, 2): 1.5})
+        self.assertIsNone(graph.merge_delta(delta))
+        self.assertNotIn(3, graph.add_vertex_set)
+        self.assertEqual(graph.version, version)
+        self.assertEqual(sorted(graph.get_vertices()), [1, 2])
+        self.assertTrue(graph.check_edge_exists((1, 2)))
+
+    def test_storage(self):
+        """
+        This method tests that the int timestamps of the clock go through every storage without rounding.
+        """
+        graph = LWW_Element_Graph({}, clock=HybridLogicalClock(5))
+        graph.add_vertices(range(20))
+        graph.add_edges((vertex, vertex + 1) for vertex in range(19))
+        for vertex in range(0, 20, 3):
+            graph.remove_vertex(vertex)
+        graph.add_vertex(0)
+        graph.remove_edge((1, 2))
+
+        buffer = bytearray()
+        encode_delta(graph.deltas_since(0), buffer)
+        self.assertEqual(decode_delta(buffer)[0], graph.deltas_since(0))
+
+        copies = [LWW_Element_Graph({}, compact=True, clock=HybridLogicalClock(6)).merge(graph)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'graph.snapshot')
+            graph.save(path)
+            copies.append(LWW_Element_Graph.load(path))
+            with LWW_Element_Graph.load(path, mmap=True) as mapped:
+                self.assertEqual(sorted(mapped.get_vertices()), sorted(graph.get_vertices()))
+                self.assertFalse(mapped.check_edge_exists((1, 2)))
+                self.assertTrue(mapped.check_edge_exists((0, 1)))
+            log_path = os.path.join(directory, 'graph.log')
+            with OperationLog(log_path) as log:
+                logged = LWW_Element_Graph({}, clock=HybridLogicalClock(7))
+                log.recover(logged)
+                logged.merge(graph)
+            with OperationLog(log_path) as log:
+                copies.append(LWW_Element_Graph({}))
+                log.recover(copies[-1])
+        threshold = vectorized.THRESHOLD
+        vectorized.THRESHOLD = 1
+        try:
+            copies.append(LWW_Element_Graph({}).merge(graph))
+        finally:
+            vectorized.THRESHOLD = threshold
+        for copy in copies:
+            self.assertSameState(copy, graph)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,212 @@
+"""
+This module contains the binary encoding of the elements and timestamps of the (Last-Write-Wins)LWW-element-graph,
+shared by the operation log and the replication protocol.
+
+An element is a type tag followed by its value:
+    b'i' int64, b'f' float64, b's' uint32 length and UTF-8 bytes, b't' uint8 length and the encoded items.
+A timestamp is b'f' float64, or b'i' int64 for the timestamps of a hybrid logical clock.
+A delta is its int64 version followed by the four timestamp sets in LWW_SETS order, each as a uint8 layout, a
+uint32 count and either the columns of the int64 vertex ids (or first and second vertex ids of the edges) and of
+the float64 timestamps (int64 when the layout has the INT_TIMESTAMPS flag), or the timestamp and element of every
+entry when the set holds anything else.
+"""
+import struct
+import sys
+from array import array
+
+from lww_element_graph import LWW_SETS, Delta
+
+INT = struct.Struct('<q')
+FLOAT = struct.Struct('<d')
+LENGTH = struct.Struct('<I')
+VERSION = INT
+# layouts of a timestamp set in a delta, and the flag of the layouts with int64 timestamp columns
+ENTRIES, INT_VERTICES, INT_EDGES = range(3)
+INT_TIMESTAMPS = 0x80
+
+
+def encode_element(element, out):
+    """
+    Appends the encoding of the element to out.
+    :param element: int, float, str or tuple of those.
+    :param out: bytearray.
+    """
+    kind = type(element)
+    if kind is int:
+        out += b'i'
+        out += INT.pack(element)
+    elif kind is tuple:
+        if len(element) > 255:
+            raise TypeError('tuples of more than 255 items can not be encoded')
+        out += b't'
+        out.append(len(element))
+        for item in element:
+            encode_element(item, out)
+    elif kind is str:
+        data = element.encode('utf-8')
+        out += b's'
+        out += LENGTH.pack(len(data))
+        out += data
+    elif kind is float:
+        out += b'f'
+        out += FLOAT.pack(element)
+    else:
+        raise TypeError('elements of type %s can not be encoded' % kind.__name__)
+
+
+def decode_element(buffer, offset):
+    """
+    Decodes the element encoded at offset.
+    :param buffer: bytes-like object.
+    :param offset: position of the element in buffer.
+    :return: tuple of the element and the position following it.
+    """
+    tag = buffer[offset:offset + 1]
+    offset += 1
+    if tag == b'i':
+        return INT.unpack_from(buffer, offset)[0], offset + INT.size
+    if tag == b't':
+        length = buffer[offset]
+        offset += 1
+        items = []
+        for _ in range(length):
+            item, offset = decode_element(buffer, offset)
+            items.append(item)
+        return tuple(items), offset
+    if tag == b's':
+        length = LENGTH.unpack_from(buffer, offset)[0]
+        offset += LENGTH.size
+        end = offset + length
+        if end > len(buffer):
+            raise ValueError('truncated string')
+        return bytes(buffer[offset:end]).decode('utf-8'), end
+    if tag == b'f':
+        return FLOAT.unpack_from(buffer, offset)[0], offset + FLOAT.size
+    raise ValueError('unknown element tag %r' % tag)
+
+
+def encode_timestamp(timestamp, out):
+    """
+    Appends the encoding of the timestamp to out.
+    :param timestamp: float, or int for the timestamps of a hybrid logical clock.
+    :param out: bytearray.
+    """
+    if type(timestamp) is int:
+        out += b'i'
+        out += INT.pack(timestamp)
+    else:
+        out += b'f'
+        out += FLOAT.pack(timestamp)
+
+
+def decode_timestamp(buffer, offset):
+    """
+    Decodes the timestamp encoded at offset.
+    :return: tuple of the timestamp and the position following it.
+    """
+    tag = buffer[offset:offset + 1]
+    if tag == b'i':
+        return INT.unpack_from(buffer, offset + 1)[0], offset + 1 + INT.size
+    if tag == b'f':
+        return FLOAT.unpack_from(buffer, offset + 1)[0], offset + 1 + FLOAT.size
+    raise ValueError('unknown timestamp tag %r' % tag)
+
+
+def _layout(entries) -> int:
+    """
+    :return: layout of the timestamp set in a delta.
+    """
+    if all(type(element) is int for element in entries):
+        return INT_VERTICES
+    if all(type(element) is tuple and len(element) == 2 and type(element[0]) is int and type(element[1]) is int
+           for element in entries):
+        return INT_EDGES
+    return ENTRIES
+
+
+def pack_column(typecode, values) -> bytes:
+    """
+    :param typecode: array typecode of the values.
+    :return: little-endian bytes of the column.
+    """
+    column = array(typecode, values)
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tobytes()
+
+
+def unpack_column(typecode, buffer, offset, count) -> tuple:
+    """
+    :return: tuple of the list of values of the column at offset and the position following it.
+    """
+    column = array(typecode)
+    end = offset + count * column.itemsize
+    if end > len(buffer):
+        raise ValueError('truncated column')
+    column.frombytes(buffer[offset:end])
+    if sys.byteorder == 'big':
+        column.byteswap()
+    return column.tolist(), end
+
+
+def encode_delta(delta, out):
+    """
+    Appends the encoding of the delta to out.
+    :param delta: Delta, LWW_Element_Graph or any object holding the four timestamp sets, and a version.
+    :param out: bytearray.
+    """
+    out += VERSION.pack(delta.version or 0)
+    for lww_set in LWW_SETS:
+        entries = getattr(delta, lww_set)
+        layout = _layout(entries)
+        try:
+            if layout != ENTRIES:
+                vertices = entries if layout == INT_VERTICES else (vertex for edge in entries for vertex in edge)
+                if all(type(timestamp) is int for timestamp in entries.values()):
+                    layout |= INT_TIMESTAMPS
+                columns = (pack_column('q', vertices),
+                           pack_column('q' if layout & INT_TIMESTAMPS else 'd', entries.values()))
+        except (OverflowError, TypeError):
+            layout = ENTRIES
+        out.append(layout)
+        out += LENGTH.pack(len(entries))
+        if layout == ENTRIES:
+            for element, timestamp in entries.items():
+                encode_timestamp(timestamp, out)
+                encode_element(element, out)
+        else:
+            for column in columns:
+                out += column
+
+
+def decode_delta(buffer, offset=0):
+    """
+    Decodes the delta encoded at offset.
+    :return: tuple of the Delta and the position following it.
+    """
+    version = VERSION.unpack_from(buffer, offset)[0]
+    offset += VERSION.size
+    sets = []
+    for _ in LWW_SETS:
+        layout = buffer[offset] & ~INT_TIMESTAMPS
+        timestamp_typecode = 'q' if buffer[offset] & INT_TIMESTAMPS else 'd'
+        count = LENGTH.unpack_from(buffer, offset + 1)[0]
+        offset += 1 + LENGTH.size
+        if layout == INT_VERTICES:
+            elements, offset = unpack_column('q', buffer, offset, count)
+        elif layout == INT_EDGES:
+            vertices, offset = unpack_column('q', buffer, offset, 2 * count)
+            elements = zip(vertices[0::2], vertices[1::2])
+        elif layout == ENTRIES:
+            entries = {}
+            for _ in range(count):
+                timestamp, offset = decode_timestamp(buffer, offset)
+                element, offset = decode_element(buffer, offset)
+                entries[element] = timestamp
+            sets.append(entries)
+            continue
+        else:
+            raise ValueError('unknown timestamp set layout %d' % layout)
+        timestamps, offset = unpack_column(timestamp_typecode, buffer, offset, count)
+        sets.append(dict(zip(elements, timestamps)))
+    return Delta(version, *sets), offset
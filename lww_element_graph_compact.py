@@ -0,0 +1,327 @@
+"""
+This module contains the compact storage of the four timestamp sets of the (Last-Write-Wins)LWW-element-graph.
+
+Vertices are interned to dense integer ids, an edge is stored as the id of its second vertex in an array('q') of
+its first vertex (and the other way round for the incident edges of the second vertex), and the add and remove
+timestamps of every vertex / edge are stored side by side in array('d') columns (array('q') for the integer
+timestamps of a hybrid logical clock), ABSENT[typecode] standing for an absent timestamp. There is no Python object
+per stored timestamp or edge.
+Each timestamp set is a MutableMapping view over the add or remove timestamps, so the graph uses them exactly
+like its dicts.
+Timestamps are stored as float64 (or int64) and edges must be tuples of two vertices.
+"""
+from array import array
+from collections.abc import ItemsView, MutableMapping
+
+# lowest value of each timestamp typecode, stands for an absent timestamp
+ABSENT = {'d': float('-inf'), 'q': -2 ** 63}
+# vertices with more edges than this get a dict index of their edges
+HUB_DEGREE = 32
+
+
+class VertexColumns:
+    """
+    Interned vertices and their add / remove timestamp columns, indexed by vertex id.
+    Ids are never given back, a purged vertex keeps its row for a later add.
+    """
+    __slots__ = ('ids', 'vertices', 'columns', 'typecode', 'absent')
+
+    def __init__(self, typecode='d'):
+        self.ids = {}
+        self.vertices = []
+        self.columns = (array(typecode), array(typecode))
+        self.typecode = typecode
+        self.absent = ABSENT[typecode]
+
+    def intern(self, vertex) -> int:
+        """
+        :return: id of the vertex, allocated on first use.
+        """
+        vertex_id = self.ids.get(vertex)
+        if vertex_id is None:
+            vertex_id = self.ids[vertex] = len(self.vertices)
+            self.vertices.append(vertex)
+            for column in self.columns:
+                column.append(self.absent)
+        return vertex_id
+
+    def get(self, vertex, position) -> float:
+        """
+        :return: add (position 0) or remove (position 1) timestamp of the vertex, absent value if absent.
+        """
+        vertex_id = self.ids.get(vertex)
+        return self.absent if vertex_id is None else self.columns[position][vertex_id]
+
+    def set(self, vertex, position, timestamp) -> bool:
+        """
+        Stores a timestamp of the vertex.
+        :return: True if the timestamp was absent.
+        """
+        column = self.columns[position]
+        vertex_id = self.intern(vertex)
+        absent = column[vertex_id] == self.absent
+        column[vertex_id] = timestamp
+        return absent
+
+    def discard(self, vertex, position) -> bool:
+        """
+        Drops a timestamp of the vertex.
+        :return: True if the timestamp was present.
+        """
+        vertex_id = self.ids.get(vertex)
+        if vertex_id is None:
+            return False
+        column = self.columns[position]
+        if column[vertex_id] == self.absent:
+            return False
+        column[vertex_id] = self.absent
+        return True
+
+    def items(self, position):
+        """
+        :return: iterator of the (vertex, timestamp) present at position.
+        """
+        vertices, absent = self.vertices, self.absent
+        for vertex_id, timestamp in enumerate(self.columns[position]):
+            if timestamp != absent:
+                yield vertices[vertex_id], timestamp
+
+
+class EdgeColumns:
+    """
+    Edges grouped by their first vertex: for every first vertex id, an array('q') of the ids of the second
+    vertices and an array('d') of the add and remove timestamps of the edges side by side, plus for every
+    second vertex id an array('q') of the ids of the first vertices.
+    An edge is found by scanning the edges of its first vertex, vertices with more than HUB_DEGREE edges
+    get a dict of second vertex id to position instead. An edge whose timestamps are both absent is dropped.
+    """
+    __slots__ = ('vertex_columns', 'targets', 'timestamps', 'sources', 'hubs', 'typecode', 'absent')
+
+    def __init__(self, vertex_columns):
+        self.vertex_columns = vertex_columns
+        self.typecode = vertex_columns.typecode
+        self.absent = vertex_columns.absent
+        self.targets = {}
+        self.timestamps = {}
+        self.sources = {}
+        self.hubs = {}
+
+    def _find(self, edge):
+        """
+        :return: tuple of the id of the first vertex and the position of the edge among its edges,
+                 None if the edge is not stored.
+        """
+        if type(edge) is not tuple or len(edge) != 2:
+            return None
+        ids = self.vertex_columns.ids
+        first, second = ids.get(edge[0]), ids.get(edge[1])
+        if first is None or second is None:
+            return None
+        hub = self.hubs.get(first)
+        if hub is not None:
+            index = hub.get(second)
+            return None if index is None else (first, index)
+        targets = self.targets.get(first)
+        if targets is None:
+            return None
+        try:
+            return first, targets.index(second)
+        except ValueError:
+            return None
+
+    def get(self, edge, position) -> float:
+        """
+        :return: add (position 0) or remove (position 1) timestamp of the edge, absent value if absent.
+        """
+        found = self._find(edge)
+        if found is None:
+            return self.absent
+        first, index = found
+        return self.timestamps[first][2 * index + position]
+
+    def set(self, edge, position, timestamp) -> bool:
+        """
+        Stores a timestamp of the edge.
+        :return: True if the timestamp was absent.
+        """
+        found = self._find(edge)
+        if found is not None:
+            first, index = found
+            stamps = self.timestamps[first]
+            absent = stamps[2 * index + position] == self.absent
+            stamps[2 * index + position] = timestamp
+            return absent
+        if type(edge) is not tuple or len(edge) != 2:
+            raise TypeError('compact storage only holds edges between two vertices, got %r' % (edge,))
+        pair = array(self.typecode, (self.absent, self.absent))
+        pair[position] = timestamp
+        first = self.vertex_columns.intern(edge[0])
+        second = self.vertex_columns.intern(edge[1])
+        if first not in self.targets:
+            self.targets[first] = array('q')
+            self.timestamps[first] = array(self.typecode)
+        if second not in self.sources:
+            self.sources[second] = array('q')
+        targets = self.targets[first]
+        targets.append(second)
+        self.timestamps[first].extend(pair)
+        self.sources[second].append(first)
+        hub = self.hubs.get(first)
+        if hub is not None:
+            hub[second] = len(targets) - 1
+        elif len(targets) > HUB_DEGREE:
+            self.hubs[first] = {target: index for index, target in enumerate(targets)}
+        return True
+
+    def discard(self, edge, position) -> bool:
+        """
+        Drops a timestamp of the edge, and the edge itself once both of its timestamps are absent.
+        :return: True if the timestamp was present.
+        """
+        found = self._find(edge)
+        if found is None:
+            return False
+        first, index = found
+        stamps = self.timestamps[first]
+        if stamps[2 * index + position] == self.absent:
+            return False
+        stamps[2 * index + position] = self.absent
+        if stamps[2 * index + 1 - position] != self.absent:
+            return True
+        # move the last edge of the first vertex in the place of the dropped one
+        targets = self.targets[first]
+        second = targets[index]
+        hub = self.hubs.get(first)
+        last = len(targets) - 1
+        if hub is not None:
+            del hub[second]
+            if index != last:
+                hub[targets[last]] = index
+        targets[index] = targets[last]
+        stamps[2 * index:2 * index + 2] = stamps[2 * last:2 * last + 2]
+        del targets[last]
+        del stamps[2 * last:]
+        if not targets:
+            del self.targets[first], self.timestamps[first]
+            self.hubs.pop(first, None)
+        sources = self.sources[second]
+        sources.remove(first)
+        if not sources:
+            del self.sources[second]
+        return True
+
+    def items(self, position):
+        """
+        :return: iterator of the (edge, timestamp) present at position.
+        """
+        vertices, absent = self.vertex_columns.vertices, self.absent
+        for first, targets in self.targets.items():
+            stamps = self.timestamps[first]
+            vertex = vertices[first]
+            for index, second in enumerate(targets):
+                timestamp = stamps[2 * index + position]
+                if timestamp != absent:
+                    yield (vertex, vertices[second]), timestamp
+
+    def incident(self, vertex) -> list:
+        """
+        :return: list of the stored edges the vertex belongs to.
+        """
+        vertex_id = self.vertex_columns.ids.get(vertex)
+        if vertex_id is None:
+            return []
+        vertices = self.vertex_columns.vertices
+        edges = [(vertex, vertices[second]) for second in self.targets.get(vertex_id, ())]
+        edges.extend((vertices[first], vertex) for first in self.sources.get(vertex_id, ()))
+        return edges
+
+
+class TimestampSet(MutableMapping):
+    """
+    Dict-like view of element to timestamp over the add (position 0) or remove (position 1) timestamps
+    of a VertexColumns or EdgeColumns.
+    """
+    __slots__ = ('storage', 'position', 'size')
+
+    def __init__(self, storage, position):
+        self.storage = storage
+        self.position = position
+        self.size = 0
+
+    def __getitem__(self, element):
+        timestamp = self.storage.get(element, self.position)
+        if timestamp == self.storage.absent:
+            raise KeyError(element)
+        return timestamp
+
+    def get(self, element, default=None):
+        timestamp = self.storage.get(element, self.position)
+        return default if timestamp == self.storage.absent else timestamp
+
+    def __contains__(self, element):
+        return self.storage.get(element, self.position) != self.storage.absent
+
+    def __setitem__(self, element, timestamp):
+        if self.storage.set(element, self.position, timestamp):
+            self.size += 1
+
+    def __delitem__(self, element):
+        if not self.storage.discard(element, self.position):
+            raise KeyError(element)
+        self.size -= 1
+
+    def __iter__(self):
+        return (element for element, _ in self.storage.items(self.position))
+
+    def __len__(self):
+        return self.size
+
+    def __repr__(self):
+        return '%s(%r)' % (type(self).__name__, dict(self.items()))
+
+    def items(self):
+        return TimestampItems(self)
+
+    def values(self):
+        return (timestamp for _, timestamp in self.storage.items(self.position))
+
+    def clear(self):
+        for element in list(self):
+            del self[element]
+
+
+class TimestampItems(ItemsView):
+    """
+    Items of a TimestampSet, read in one pass over the columns.
+    """
+
+    def __iter__(self):
+        return self._mapping.storage.items(self._mapping.position)
+
+
+class IncidentEdges:
+    """
+    Read-only stand-in for the incident_edges index of the graph, answered from the edge columns.
+    """
+    __slots__ = ('edge_columns',)
+
+    def __init__(self, edge_columns):
+        self.edge_columns = edge_columns
+
+    def get(self, vertex, default=None):
+        return self.edge_columns.incident(vertex) or default
+
+    def __contains__(self, vertex):
+        return bool(self.edge_columns.incident(vertex))
+
+
+def compact_storage(typecode='d') -> tuple:
+    """
+    :param typecode: array typecode of the timestamps, 'd' for float64 or 'q' for int64.
+    :return: tuple of the add_vertex_set, remove_vertex_set, add_edge_set and remove_edge_set views
+             of a new compact storage, and its incident edges index.
+    """
+    vertex_columns = VertexColumns(typecode)
+    edge_columns = EdgeColumns(vertex_columns)
+    return (TimestampSet(vertex_columns, 0), TimestampSet(vertex_columns, 1),
+            TimestampSet(edge_columns, 0), TimestampSet(edge_columns, 1), IncidentEdges(edge_columns))
@@ -0,0 +1,56 @@
+import time
+import unittest
+
+import lww_element_graph_compact as compact
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_testing import StateAssertions, random_operations
+
+
+class Test_Compact_Storage(StateAssertions, unittest.TestCase):
+
+    def test_timestamp_sets(self):
+        """
+        This method tests that the compact timestamp sets behave like dicts, hub vertices included.
+        """
+        add_vertex_set, remove_vertex_set, add_edge_set, remove_edge_set, incident_edges = compact.compact_storage()
+        edges = {(1, second): float(second) for second in range(compact.HUB_DEGREE * 2)}
+        edges[(2, 1)] = 5.0
+        for edge, timestamp in edges.items():
+            add_edge_set[edge] = timestamp
+        remove_edge_set[(1, 3)] = 7.0
+        add_vertex_set['a'] = 1.0
+        self.assertEqual(dict(add_edge_set.items()), edges)
+        self.assertEqual((len(add_edge_set), len(remove_edge_set), len(add_vertex_set), len(remove_vertex_set)),
+                         (len(edges), 1, 1, 0))
+        self.assertEqual(add_edge_set[(1, 10)], 10.0)
+        self.assertNotIn((1, 'a'), add_edge_set)
+        self.assertIsNone(add_edge_set.get([1, 2]))
+        del add_edge_set[(1, 0)]
+        del add_edge_set[(1, 3)]
+        del edges[(1, 0)], edges[(1, 3)]
+        self.assertEqual(dict(add_edge_set.items()), edges)
+        self.assertEqual(remove_edge_set[(1, 3)], 7.0)
+        self.assertNotIn((1, 0), incident_edges.get(0, ()))
+        self.assertEqual(set(incident_edges.get(1)), set(edges) | {(1, 3)})
+        with self.assertRaises(KeyError):
+            del add_edge_set[(1, 0)]
+        with self.assertRaises(TypeError):
+            add_edge_set[(1, 2, 3)] = 1.0
+
+    def test_same_state_as_dict_storage(self):
+        """
+        This method tests that a graph with compact storage ends up in the state of a graph with dicts.
+        """
+        # ahead of the current time, which the additions would move their timestamps up to
+        start = time.time() + 10
+        graphs = [LWW_Element_Graph({}), LWW_Element_Graph({}, compact=True)]
+        for operation, element, timestamp in random_operations(1, vertices=60, timestamp=start):
+            for graph in graphs:
+                getattr(graph, operation)(element, timestamp)
+        for graph in graphs:
+            graph.collect_garbage(start + 50)
+        self.assertSameState(graphs[1], graphs[0])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
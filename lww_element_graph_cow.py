@@ -0,0 +1,203 @@
+"""
+This module contains the copy-on-write read snapshots of the (Last-Write-Wins)LWW-element-graph.
+
+LWW_Element_Graph.snapshot() returns a ReadSnapshot sharing the adjacency list, the predecessors and the live edges
+of the graph, so taking it costs O(1). The graph never changes a container it shares with a snapshot:
+- its first change after a snapshot gives it its own copy of the containers themselves, O(vertices + live edges),
+  the neighbour sets being still shared,
+- every neighbour set is then copied the first time the graph changes it.
+Once all the snapshots of the graph are garbage collected, the graph changes its containers in place again.
+A snapshot is therefore immutable and can be read from any number of threads while the graph keeps being written
+and merged. Snapshots must be taken between two writes, i.e. from the thread writing the graph or while holding the
+lock serializing its writes.
+"""
+import weakref
+
+from lww_element_graph import UndirectedView, bidirectional_path, breadth_first_levels, connected_components
+
+
+class OwnedIndex:
+    """
+    Neighbour index of a graph (adjacency list or predecessors) whose sets may be shared with snapshots:
+    a set is copied the first time the graph takes it to change it.
+    """
+    __slots__ = ('index', 'owned')
+
+    def __init__(self, index):
+        """
+        :param index: dict of vertex to the set of its neighbours.
+        """
+        self.index = index
+        # vertices whose set belongs to the graph only
+        self.owned = set()
+
+    def __contains__(self, vertex) -> bool:
+        return vertex in self.index
+
+    def __getitem__(self, vertex) -> set:
+        if vertex in self.owned:
+            return self.index[vertex]
+        neighbours = self.index[vertex] = set(self.index[vertex])
+        self.owned.add(vertex)
+        return neighbours
+
+    def __setitem__(self, vertex, neighbours):
+        self.index[vertex] = neighbours
+        self.owned.add(vertex)
+
+    def pop(self, vertex) -> set:
+        self.owned.discard(vertex)
+        return self.index.pop(vertex)
+
+
+class CopyOnWrite:
+    """
+    Containers of a graph shared with the snapshots taken since its last change, see LWW_Element_Graph.snapshot.
+    """
+
+    def __init__(self, graph):
+        self.graph = graph
+        # True until the graph copies the containers it shares with the snapshots
+        self.frozen = True
+        self.snapshots = weakref.WeakSet()
+        self.successors = self.predecessors = None
+
+    def snapshot(self):
+        """
+        :return: ReadSnapshot of the current state of the graph.
+        """
+        graph = self.graph
+        snapshot = ReadSnapshot(graph.adjacency_list, graph.predecessors, graph.live_edge_set, graph.version,
+                                graph.directed, graph.edge_key)
+        self.snapshots.add(snapshot)
+        return snapshot
+
+    def writable(self) -> tuple:
+        """
+        The graph calls it before changing its adjacency list.
+        :return: tuple of the adjacency list and the predecessors the graph may change.
+        """
+        graph = self.graph
+        if not self.snapshots:
+            graph.cow = None
+            return graph.adjacency_list, graph.predecessors
+        if self.frozen:
+            graph.adjacency_list = dict(graph.adjacency_list)
+            graph.predecessors = dict(graph.predecessors) if graph.directed else graph.adjacency_list
+            graph.live_edge_set = set(graph.live_edge_set)
+            self.successors = OwnedIndex(graph.adjacency_list)
+            self.predecessors = OwnedIndex(graph.predecessors) if graph.directed else self.successors
+            self.frozen = False
+        return self.successors, self.predecessors
+
+
+class ReadSnapshot:
+    """
+    Immutable view of a graph at one version, answering the read operations of LWW_Element_Graph.
+    """
+
+    def __init__(self, adjacency_list, predecessors, live_edge_set, version, directed=None, edge_key=None):
+        self.adjacency_list = adjacency_list
+        self.predecessors = predecessors
+        self.live_edge_set = live_edge_set
+        self.version = version
+        self.directed = directed
+        self.edge_key = edge_key
+
+    def __len__(self) -> int:
+        return len(self.adjacency_list)
+
+    def __contains__(self, vertex) -> bool:
+        return vertex in self.adjacency_list
+
+    def check_vertex_exists(self, vertex) -> bool:
+        """
+        :return: True if the vertex was in the graph.
+        """
+        return vertex in self.adjacency_list
+
+    def check_edge_exists(self, edge) -> bool:
+        """
+        :return: True if the edge was in the graph.
+        """
+        if self.edge_key is not None:
+            edge = self.edge_key(edge)
+        return edge in self.live_edge_set
+
+    def vertex_count(self) -> int:
+        return len(self.adjacency_list)
+
+    def edge_count(self) -> int:
+        return len(self.live_edge_set)
+
+    def get_vertices(self) -> list:
+        """
+        :return: list of the vertices.
+        """
+        return list(self.adjacency_list)
+
+    def iter_vertices(self):
+        """
+        :return: generator of the vertices.
+        """
+        yield from self.adjacency_list
+
+    def iter_edges(self):
+        """
+        :return: generator of the edges.
+        """
+        yield from self.live_edge_set
+
+    def query_vertices(self, vertex):
+        """
+        :return: list of the neighbours of the vertex, its successors in a directed graph,
+                 None if it was not in the graph.
+        """
+        neighbours = self.adjacency_list.get(vertex)
+        return None if neighbours is None else list(neighbours)
+
+    def query_predecessors(self, vertex):
+        """
+        :return: list of the vertices with an edge to the vertex, None if it was not in the graph.
+        """
+        neighbours = self.predecessors.get(vertex)
+        return None if neighbours is None else list(neighbours)
+
+    def find_path(self, start, end):
+        """
+        :return: shortest path between two vertices as a list if it is found else None.
+        """
+        if start in self.adjacency_list and end in self.adjacency_list:
+            return bidirectional_path(self.adjacency_list, self.predecessors, start, end)
+        return None
+
+    def shortest_path(self, start, end):
+        return self.find_path(start, end)
+
+    def is_reachable(self, start, end) -> bool:
+        return self.find_path(start, end) is not None
+
+    def distances(self, start, max_depth=None) -> dict:
+        """
+        :return: dict of vertex to number of hops from start, empty if start was not in the graph.
+        """
+        if start in self.adjacency_list:
+            return breadth_first_levels(self.adjacency_list, start, max_depth)
+        return {}
+
+    def connected_component(self, vertex) -> set:
+        """
+        :return: set of the vertices connected to the vertex whatever the direction of the edges.
+        """
+        if vertex in self.adjacency_list:
+            return set(breadth_first_levels(self._undirected(), vertex))
+        return set()
+
+    def connected_components(self) -> list:
+        """
+        :return: list of sets of vertices, weakly connected in a directed graph.
+        """
+        return connected_components(self._undirected())
+
+    def _undirected(self):
+        return UndirectedView(self.adjacency_list, self.predecessors) if self.directed else self.adjacency_list
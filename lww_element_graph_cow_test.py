@@ -0,0 +1,120 @@
+import gc
+import random
+import threading
+import time
+import unittest
+
+from lww_element_graph_testing import live_state, random_graph, random_operations
+
+
+def added_graph(seed, **kwargs):
+    """
+    :return: graph over 60 vertices and random edges, all added at the same timestamp.
+    """
+    return random_graph(seed, count=150, vertices=60, spread=1, operations=('add_edge',), **kwargs)
+
+
+class Test_Copy_On_Write(unittest.TestCase):
+
+    def test_snapshot_isolation(self):
+        """
+        This method tests that a snapshot keeps the state it was taken at while the graph is written and merged,
+        and that the graph stays in line with a rebuild of its timestamp sets.
+        """
+        for kwargs in ({}, {'directed': True}, {'directed': False}, {'directed': True, 'multi': True}):
+            graph = added_graph(1, **kwargs)
+            # the random operations without the additions of the vertices
+            operations = random_operations(7, count=200, vertices=70)[70:]
+            snapshots = []
+            for round_number in range(20):
+                snapshot = graph.snapshot()
+                snapshots.append((snapshot, live_state(snapshot), snapshot.version))
+                timestamp = time.time() + 2 + round_number
+                for operation, element, _ in operations[round_number * 10:round_number * 10 + 10]:
+                    getattr(graph, operation)(element, timestamp)
+                if round_number % 5 == 4:
+                    graph.merge(added_graph(round_number, **kwargs))
+            for snapshot, expected, version in snapshots:
+                self.assertEqual(live_state(snapshot), expected)
+                self.assertEqual(snapshot.version, version)
+            current = live_state(graph)
+            graph._rebuild()
+            self.assertEqual(current, live_state(graph))
+
+    def test_snapshot_reads(self):
+        """
+        This method tests the read operations of a snapshot against the graph it was taken from.
+        """
+        graph = added_graph(3, directed=True)
+        expected = added_graph(3, directed=True)
+        snapshot = graph.snapshot()
+        graph.remove_vertex(0, time.time() + 2)
+        graph.add_edge((1, 2), time.time() + 2)
+        self.assertEqual(len(snapshot), expected.vertex_count())
+        self.assertEqual(snapshot.edge_count(), expected.edge_count())
+        self.assertTrue(snapshot.check_vertex_exists(0))
+        self.assertEqual(snapshot.check_edge_exists((1, 2)), expected.check_edge_exists((1, 2)))
+        for vertex in range(10):
+            self.assertEqual(sorted(snapshot.query_vertices(vertex)), sorted(expected.query_vertices(vertex)))
+            self.assertEqual(sorted(snapshot.query_predecessors(vertex)), sorted(expected.query_predecessors(vertex)))
+            self.assertEqual(snapshot.distances(vertex), expected.distances(vertex))
+            path = snapshot.find_path(0, vertex)
+            self.assertEqual(path is None, expected.find_path(0, vertex) is None)
+        self.assertEqual(sorted(map(sorted, snapshot.connected_components())),
+                         sorted(map(sorted, expected.connected_components())))
+        self.assertIsNone(snapshot.query_vertices(100))
+
+    def test_release(self):
+        """
+        This method tests that the graph writes in place again once its snapshots are garbage collected.
+        """
+        graph = added_graph(5)
+        adjacency_list = graph.adjacency_list
+        snapshot = graph.snapshot()
+        graph.add_vertex(100, time.time() + 2)
+        self.assertIsNot(graph.adjacency_list, adjacency_list)
+        self.assertNotIn(100, snapshot)
+        del snapshot
+        gc.collect()
+        adjacency_list = graph.adjacency_list
+        graph.add_vertex(101, time.time() + 2)
+        self.assertIs(graph.adjacency_list, adjacency_list)
+        self.assertIsNone(graph.cow)
+
+    def test_concurrent_readers(self):
+        """
+        This method tests readers iterating snapshots while a writer changes the graph.
+        """
+        graph = added_graph(9)
+        published = [graph.snapshot()]
+        errors = []
+        done = threading.Event()
+
+        def read():
+            try:
+                while not done.is_set():
+                    snapshot = published[-1]
+                    edges = sum(len(neighbours) for neighbours in snapshot.adjacency_list.values())
+                    if edges != sum(len(neighbours) for neighbours in snapshot.adjacency_list.values()):
+                        errors.append('snapshot changed')
+            except RuntimeError as error:
+                errors.append(str(error))
+
+        readers = [threading.Thread(target=read) for _ in range(2)]
+        for reader in readers:
+            reader.start()
+        rng = random.Random(2)
+        for step in range(3000):
+            timestamp = time.time() + 2 + step
+            graph.add_edge((rng.randrange(60), rng.randrange(60)), timestamp)
+            graph.remove_edge((rng.randrange(60), rng.randrange(60)), timestamp)
+            if step % 50 == 0:
+                published.append(graph.snapshot())
+        done.set()
+        for reader in readers:
+            reader.join()
+        self.assertEqual(errors, [])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,169 @@
+"""
+This module contains the hash-range digest of the (Last-Write-Wins)LWW-element-graph, to find where two replicas
+differ without shipping their state.
+
+Every entry of the four timestamp sets is hashed with BLAKE2b into 64 bits, from its set, its element and its
+timestamp, and belongs to one of arity ** depth buckets picked by the hash of its element alone, so an element is
+in the same bucket on every replica. A bucket is the XOR of the hashes of its entries and every node of the tree,
+arity children per node, is the XOR of the buckets below it: a write XORs the hash of the old entry out and the
+hash of the new one in along the depth + 1 nodes above its bucket.
+Replicas holding the same entries have the same root, otherwise they walk down the nodes which differ, level by
+level, and only exchange the entries of the buckets that differ.
+"""
+from array import array
+from hashlib import blake2b
+
+from lww_element_graph import LWW_SETS, Delta
+from lww_element_graph_codec import encode_element, encode_timestamp
+
+
+def _element_key(element) -> bytes:
+    """
+    :return: bytes identifying the element on every replica.
+    """
+    key = bytearray()
+    try:
+        encode_element(element, key)
+    except TypeError:
+        key = bytearray(b'r')
+        key += repr(element).encode('utf-8')
+    return bytes(key)
+
+
+def _entry_hash(set_index, key, timestamp) -> int:
+    """
+    :return: 64 bits hash of an entry of a timestamp set.
+    """
+    entry = bytearray(key)
+    entry.append(set_index)
+    encode_timestamp(timestamp, entry)
+    return int.from_bytes(blake2b(entry, digest_size=8).digest(), 'little')
+
+
+class RangeDigest:
+    """
+    Tree of XORed entry hashes over the four timestamp sets of a graph, kept up to date by the graph once
+    enabled with LWW_Element_Graph.enable_digest.
+    """
+
+    def __init__(self, graph, arity=16, depth=3):
+        """
+        :param graph: LWW_Element_Graph the digest is computed from.
+        :param arity: number of children of a node.
+        :param depth: number of levels below the root, the digest has arity ** depth buckets.
+        """
+        self.graph = graph
+        self.arity = arity
+        self.depth = depth
+        self.levels = []
+        self.members = []
+        self.rebuild()
+
+    def rebuild(self):
+        """
+        Computes the digest from all the entries of the graph.
+        """
+        self.levels = [array('Q', bytes(8 * self.arity ** level)) for level in range(self.depth + 1)]
+        # elements of every bucket, dropped lazily once they are in none of the timestamp sets, see delta
+        self.members = [set() for _ in range(self.arity ** self.depth)]
+        for lww_set in LWW_SETS:
+            for element, timestamp in getattr(self.graph, lww_set).items():
+                self.update(lww_set, element, None, timestamp)
+
+    def bucket(self, element) -> int:
+        """
+        :return: bucket of the element.
+        """
+        return self._bucket(_element_key(element))
+
+    def _bucket(self, key) -> int:
+        return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little') % len(self.members)
+
+    def update(self, lww_set, element, old, new):
+        """
+        Replaces the entry of the element in a timestamp set, the graph calls it before every write.
+        :param lww_set: name of the timestamp set, one of LWW_SETS.
+        :param element: vertex or edge.
+        :param old: timestamp of the element in the set, None if absent.
+        :param new: timestamp written, None if the entry is deleted.
+        """
+        key = _element_key(element)
+        set_index = LWW_SETS.index(lww_set)
+        change = 0
+        if old is not None:
+            change ^= _entry_hash(set_index, key, old)
+        if new is not None:
+            change ^= _entry_hash(set_index, key, new)
+        bucket = self._bucket(key)
+        if new is not None:
+            self.members[bucket].add(element)
+        for level, nodes in enumerate(self.levels):
+            nodes[bucket // self.arity ** (self.depth - level)] ^= change
+
+    def root(self) -> int:
+        """
+        :return: hash of all the entries.
+        """
+        return self.levels[0][0]
+
+    def nodes(self, level, indexes) -> list:
+        """
+        :param level: level of the nodes, 0 for the root and depth for the buckets.
+        :param indexes: indexes of the nodes within their level.
+        :return: list of the hashes of the nodes.
+        """
+        nodes = self.levels[level]
+        return [nodes[index] for index in indexes]
+
+    def descend(self):
+        """
+        Walks down the nodes which differ from the ones of another digest of the same shape.
+        The generator yields the (level, indexes) of the nodes to compare and must be sent the list of their
+        hashes in the other digest, see RangeDigest.nodes.
+        :return: list of the buckets which differ, as the value of the StopIteration.
+        """
+        level, indexes = 0, [0]
+        while True:
+            others = yield level, indexes
+            nodes = self.levels[level]
+            differing = [index for index, other in zip(indexes, others) if nodes[index] != other]
+            if level == self.depth or not differing:
+                return differing
+            level += 1
+            indexes = [child for index in differing for child in range(index * self.arity, (index + 1) * self.arity)]
+
+    def diverging_buckets(self, other) -> list:
+        """
+        :param other: RangeDigest of another replica, of the same shape.
+        :return: list of the buckets which differ.
+        """
+        walk = self.descend()
+        request = next(walk)
+        try:
+            while True:
+                request = walk.send(other.nodes(*request))
+        except StopIteration as stop:
+            return stop.value
+
+    def delta(self, buckets) -> Delta:
+        """
+        :param buckets: iterable of buckets.
+        :return: Delta of the entries of the graph in the buckets.
+        """
+        graph = self.graph
+        delta = Delta(graph.version, {}, {}, {}, {})
+        timestamp_sets = [(getattr(graph, lww_set), getattr(delta, lww_set)) for lww_set in LWW_SETS]
+        for bucket in buckets:
+            members = self.members[bucket]
+            gone = []
+            for element in members:
+                present = False
+                for timestamps, entries in timestamp_sets:
+                    timestamp = timestamps.get(element)
+                    if timestamp is not None:
+                        entries[element] = timestamp
+                        present = True
+                if not present:
+                    gone.append(element)
+            members.difference_update(gone)
+        return delta
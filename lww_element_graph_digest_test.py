@@ -0,0 +1,66 @@
+import unittest
+
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_testing import StateAssertions, random_graph, random_operations
+
+
+class Test_Range_Digest(StateAssertions, unittest.TestCase):
+
+    def test_incremental_digest(self):
+        """
+        This method tests that the digest kept up to date by the writes is the digest of the final state.
+        """
+        for compact in (False, True):
+            graph = LWW_Element_Graph({}, compact=compact)
+            digest = graph.enable_digest(arity=4, depth=3)
+            graph.apply_batch(random_operations(1)[:1000])
+            for operation, element, timestamp in random_operations(1)[1000:]:
+                getattr(graph, operation)(element, timestamp)
+            graph.merge(random_graph(2))
+            graph.collect_garbage(1050.0)
+            levels = [list(level) for level in digest.levels]
+            digest.rebuild()
+            self.assertEqual(levels, [list(level) for level in digest.levels])
+            copy = LWW_Element_Graph({}).merge(graph)
+            self.assertEqual(copy.enable_digest(arity=4, depth=3).root(), digest.root())
+
+    def test_diverging_buckets(self):
+        """
+        This method tests that replicas only exchange the buckets of the elements they disagree on.
+        """
+        first, second = random_graph(4), random_graph(4)
+        first_digest, second_digest = first.enable_digest(), second.enable_digest()
+        self.assertEqual(first_digest.root(), second_digest.root())
+        self.assertEqual(first_digest.diverging_buckets(second_digest), [])
+
+        first.add_vertex(500, 1000.0)
+        second.remove_edge((1, 2), 2000.0)
+        buckets = first_digest.diverging_buckets(second_digest)
+        self.assertEqual(sorted(buckets), sorted({first_digest.bucket(500), first_digest.bucket((1, 2))}))
+        second.merge_delta(first_digest.delta(buckets))
+        first.merge_delta(second_digest.delta(buckets))
+        self.assertEqual(first_digest.root(), second_digest.root())
+        self.assertEqual(first.add_vertex_set, second.add_vertex_set)
+        self.assertEqual(first.remove_edge_set, second.remove_edge_set)
+
+    def test_digest_guided_merge(self):
+        """
+        This method tests that a merge between graphs with digests only compares the diverging buckets
+        and gives the same state as a full merge.
+        """
+        local, remote, expected = random_graph(4), random_graph(4), random_graph(4)
+        remote.apply_batch(random_operations(5, count=20)[100:])
+        expected.merge(remote)
+        local.enable_digest()
+        remote.enable_digest()
+        metrics = local.enable_metrics(['merge_delta'])
+        local.merge(remote)
+        self.assertSameState(local, expected)
+        self.assertEqual(local.digest.root(), remote.digest.root())
+        self.assertLess(metrics.keys_compared, len(remote.add_edge_set) // 4)
+        local.merge(remote)
+        self.assertEqual(metrics.merges, 1)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
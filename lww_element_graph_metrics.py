@@ -0,0 +1,198 @@
+"""
+This module contains the opt-in metrics of the (Last-Write-Wins)LWW-element-graph.
+
+LWW_Element_Graph.enable_metrics() shadows the instrumented methods of one graph with instance attributes timing
+every call, disable_metrics() deletes them: a graph without metrics runs the methods of the class, untouched.
+Calls made by the graph itself go through the wrappers too, e.g. the check_vertex_exists calls of add_edge.
+The metrics are
+- the number of calls, errors and a latency histogram of every instrumented operation, the errors counting the
+  calls which raised and the ones which rejected their input (the operations log and swallow a TypeError),
+- the number of merges and of timestamp entries they compared and overwrote,
+- the number of live elements and of tombstones, computed when a snapshot is taken.
+GraphMetrics.snapshot() returns them as a dict, GraphMetrics.prometheus() in the Prometheus text format.
+"""
+import time
+from bisect import bisect_left
+
+from lww_element_graph import LWW_SETS
+
+INSTRUMENTED = ('add_vertex', 'add_edge', 'remove_vertex', 'remove_edge', 'check_vertex_exists', 'check_edge_exists',
+                'query_vertices', 'get_vertices', 'find_path', 'shortest_path', 'merge', 'merge_delta', 'apply_batch',
+                'collect_garbage')
+# upper bounds in seconds of the latency histogram buckets, the last bucket is unbounded
+LATENCY_BUCKETS = (1e-06, 2.5e-06, 5e-06, 1e-05, 2.5e-05, 5e-05, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+                   0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """
+    Latency histogram of one operation over LATENCY_BUCKETS.
+    """
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.errors = 0
+
+    def observe(self, seconds):
+        """
+        Adds a call which lasted the given number of seconds.
+        """
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.count += 1
+        self.sum += seconds
+
+    def cumulative(self) -> list:
+        """
+        :return: list of (upper bound, number of calls at most as long), the last bound being float('inf').
+        """
+        total = 0
+        buckets = []
+        for bound, count in zip(LATENCY_BUCKETS + (float('inf'),), self.counts):
+            total += count
+            buckets.append((bound, total))
+        return buckets
+
+
+class GraphMetrics:
+    """
+    Metrics of one graph, installed by LWW_Element_Graph.enable_metrics.
+    """
+
+    def __init__(self, graph, operations=INSTRUMENTED):
+        """
+        :param graph: LWW_Element_Graph to instrument.
+        :param operations: names of the methods to time.
+        """
+        self.graph = graph
+        self.operations = tuple(operations)
+        self.histograms = {name: Histogram() for name in self.operations}
+        self.merges = 0
+        self.keys_compared = 0
+        self.keys_overwritten = 0
+
+    def install(self):
+        """
+        Shadows the instrumented methods of the graph with timing wrappers.
+        """
+        for name in self.operations:
+            method = getattr(type(self.graph), name).__get__(self.graph)
+            if name == 'merge_delta':
+                wrapper = self._merge_wrapper(method, self.histograms[name])
+            else:
+                wrapper = self._wrapper(method, self.histograms[name])
+            setattr(self.graph, name, wrapper)
+
+    def uninstall(self):
+        """
+        Removes the wrappers, the graph runs the methods of its class again.
+        """
+        for name in self.operations:
+            self.graph.__dict__.pop(name, None)
+
+    @staticmethod
+    def _wrapper(method, histogram):
+        """
+        :return: function calling the method and recording its latency in the histogram.
+        """
+        clock = time.perf_counter
+
+        def timed(*args, **kwargs):
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            except BaseException:
+                histogram.errors += 1
+                raise
+            finally:
+                histogram.observe(clock() - start)
+        timed.__wrapped__ = method
+        return timed
+
+    def _merge_wrapper(self, method, histogram):
+        """
+        Wrapper of merge_delta, which every merge goes through, also counting the entries compared and overwritten.
+        """
+        timed = self._wrapper(method, histogram)
+        graph = self.graph
+
+        def merge_delta(delta):
+            version = graph.version
+            result = timed(delta)
+            self.merges += 1
+            self.keys_compared += sum(len(getattr(delta, lww_set)) for lww_set in LWW_SETS)
+            self.keys_overwritten += graph.version - version
+            return result
+        merge_delta.__wrapped__ = method
+        return merge_delta
+
+    def count_error(self, operation):
+        """
+        Counts an error an operation caught itself, see LWW_Element_Graph._error.
+        :param operation: name of the operation, ignored when it is not instrumented.
+        """
+        histogram = self.histograms.get(operation)
+        if histogram is not None:
+            histogram.errors += 1
+
+    def reset(self):
+        """
+        Sets all the counters back to zero.
+        """
+        for histogram in self.histograms.values():
+            histogram.__init__()
+        self.merges = self.keys_compared = self.keys_overwritten = 0
+
+    def snapshot(self) -> dict:
+        """
+        :return: dict of the current metrics, see the module documentation.
+        """
+        graph = self.graph
+        live_vertices, live_edges = len(graph.adjacency_list), len(graph.live_edge_set)
+        vertex_tombstones, edge_tombstones = len(graph.remove_vertex_set), len(graph.remove_edge_set)
+        return {
+            'operations': {name: {'count': histogram.count, 'errors': histogram.errors, 'seconds': histogram.sum,
+                                  'buckets': histogram.cumulative()}
+                           for name, histogram in self.histograms.items()},
+            'merge': {'merges': self.merges, 'keys_compared': self.keys_compared,
+                      'keys_overwritten': self.keys_overwritten},
+            'vertices': {'live': live_vertices, 'tombstones': vertex_tombstones,
+                         'tombstone_ratio': vertex_tombstones / live_vertices if live_vertices else 0.0},
+            'edges': {'live': live_edges, 'tombstones': edge_tombstones,
+                      'tombstone_ratio': edge_tombstones / live_edges if live_edges else 0.0},
+        }
+
+    def prometheus(self, prefix='lww_graph') -> str:
+        """
+        :param prefix: prefix of the metric names.
+        :return: the metrics in the Prometheus text exposition format.
+        """
+        snapshot = self.snapshot()
+        lines = ['# HELP %s_operation_seconds Latency of the graph operations.' % prefix,
+                 '# TYPE %s_operation_seconds histogram' % prefix]
+        for name, operation in snapshot['operations'].items():
+            for bound, count in operation['buckets']:
+                lines.append('%s_operation_seconds_bucket{operation="%s",le="%s"} %d' %
+                             (prefix, name, '+Inf' if bound == float('inf') else repr(bound), count))
+            lines.append('%s_operation_seconds_sum{operation="%s"} %r' % (prefix, name, operation['seconds']))
+            lines.append('%s_operation_seconds_count{operation="%s"} %d' % (prefix, name, operation['count']))
+        lines += ['# HELP %s_operation_errors_total Operations which rejected their input or raised.' % prefix,
+                  '# TYPE %s_operation_errors_total counter' % prefix]
+        lines += ['%s_operation_errors_total{operation="%s"} %d' % (prefix, name, operation['errors'])
+                  for name, operation in snapshot['operations'].items()]
+        for name, help_text in (('merges', 'Merges of a graph or a delta.'),
+                                ('keys_compared', 'Timestamp entries compared by the merges.'),
+                                ('keys_overwritten', 'Timestamp entries written by the merges.')):
+            lines += ['# HELP %s_merge_%s_total %s' % (prefix, name, help_text),
+                      '# TYPE %s_merge_%s_total counter' % (prefix, name),
+                      '%s_merge_%s_total %d' % (prefix, name, snapshot['merge'][name])]
+        lines += ['# HELP %s_elements Live elements and tombstones.' % prefix, '# TYPE %s_elements gauge' % prefix]
+        for kind in ('vertices', 'edges'):
+            for state in ('live', 'tombstones'):
+                lines.append('%s_elements{kind="%s",state="%s"} %d' % (prefix, kind, state, snapshot[kind][state]))
+        lines += ['# HELP %s_tombstone_ratio Tombstones per live element.' % prefix,
+                  '# TYPE %s_tombstone_ratio gauge' % prefix]
+        lines += ['%s_tombstone_ratio{kind="%s"} %r' % (prefix, kind, snapshot[kind]['tombstone_ratio'])
+                  for kind in ('vertices', 'edges')]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,71 @@
+import time
+import unittest
+
+from lww_element_graph import Delta, LWW_Element_Graph
+from lww_element_graph_metrics import GraphMetrics
+
+
+class Test_Metrics(unittest.TestCase):
+
+    def test_operation_metrics(self):
+        """
+        This method tests the counters and histograms of the operations and that disabling removes the wrappers.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        metrics = graph.enable_metrics()
+        self.assertIsInstance(metrics, GraphMetrics)
+        for vertex in range(4):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((0, 1), current_timestamp)
+        graph.remove_vertex(3, current_timestamp + 1)
+        graph.remove_vertex(10, current_timestamp + 1)
+        snapshot = metrics.snapshot()
+        self.assertEqual(snapshot['operations']['add_vertex']['count'], 4)
+        self.assertEqual(snapshot['operations']['remove_vertex']['count'], 2)
+        self.assertGreaterEqual(snapshot['operations']['check_vertex_exists']['count'], 8)
+        self.assertEqual(snapshot['operations']['add_edge']['buckets'][-1], (float('inf'), 1))
+        self.assertEqual(snapshot['vertices'], {'live': 3, 'tombstones': 2, 'tombstone_ratio': 2 / 3})
+        self.assertEqual(snapshot['edges']['live'], 1)
+        self.assertEqual(snapshot['operations']['add_vertex']['errors'], 0)
+
+        # invalid inputs are logged and swallowed by the operations, the metrics still count them
+        self.assertIsNone(graph.add_vertex(10, 'late'))
+        self.assertIsNone(graph.remove_edge([1, 2, 3], current_timestamp))
+        self.assertIsNone(graph.merge_delta(Delta(None, {1: 'late'}, {}, {}, {})))
+        operations = metrics.snapshot()['operations']
+        self.assertEqual([operations[name]['errors'] for name in ('add_vertex', 'remove_edge', 'merge_delta')],
+                         [1, 1, 1])
+        self.assertIn('lww_graph_operation_errors_total{operation="add_vertex"} 1\n', metrics.prometheus())
+
+        graph.disable_metrics()
+        self.assertNotIn('add_vertex', vars(graph))
+        graph.add_vertex(5, current_timestamp)
+        self.assertEqual(metrics.snapshot()['operations']['add_vertex']['count'], 5)
+        self.assertIsNone(graph.metrics)
+
+    def test_merge_metrics(self):
+        """
+        This method tests the entries compared and overwritten by the merges, and the Prometheus export.
+        """
+        current_timestamp = time.time()
+        graph, replica = LWW_Element_Graph({}), LWW_Element_Graph({})
+        graph.add_vertex(1, current_timestamp + 10)
+        replica.add_vertex(1, current_timestamp)
+        replica.add_vertex(2, current_timestamp)
+        replica.add_edge((1, 2), current_timestamp)
+        metrics = graph.enable_metrics(['merge', 'merge_delta'])
+        graph.merge(replica)
+        self.assertEqual(metrics.snapshot()['merge'], {'merges': 1, 'keys_compared': 3, 'keys_overwritten': 2})
+        self.assertEqual(graph.query_vertices(1), [2])
+        text = metrics.prometheus()
+        self.assertIn('lww_graph_merge_keys_overwritten_total 2\n', text)
+        self.assertIn('lww_graph_operation_seconds_count{operation="merge"} 1\n', text)
+        self.assertIn('lww_graph_operation_seconds_bucket{operation="merge",le="+Inf"} 1\n', text)
+        self.assertIn('lww_graph_elements{kind="vertices",state="live"} 2\n', text)
+        metrics.reset()
+        self.assertEqual(metrics.snapshot()['operations']['merge']['count'], 0)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,120 @@
+"""
+This module contains the vectorized merge of the (Last-Write-Wins)LWW-element-graph, backed by NumPy when installed.
+
+The elements to merge get dense integer ids (their position in the incoming entries), the timestamps of both sides
+are gathered with a single dict lookup per element and turned into arrays by numpy.array, which picks their dtype
+and fills them in one pass in C. The LWW comparisons and liveness masks are computed with array operations. Float
+timestamps are compared in float64 arrays, NaN standing for an absent element, the integer timestamps of a hybrid
+logical clock in int64 arrays, -2**63 standing for an absent element. Any other mix is compared by the dict path:
+a float64 array rounds the ints above 2**53 and an int64 array can not hold floats. Only the elements the masks
+select go back through the dicts.
+The vectorized path is opt-in: set THRESHOLD to the number of entries from which merges use it. Gathering the
+timestamps costs one dict lookup per element, which is all the dict path does to select the newer entries, so the
+arrays only pay off by skipping the refresh of the vertices whose liveness did not flip: the numpy_merge benchmark
+runs as fast on both paths at 100k vertices and 1.1s vectorized against 1.57s on the dict path at 500k.
+Without NumPy, or below THRESHOLD, the graph keeps its dict path; both paths produce the same state.
+"""
+from importlib.util import find_spec
+from itertools import repeat
+
+# NumPy is only imported by the first vectorized merge, importing the graph stays cheap
+AVAILABLE = find_spec('numpy') is not None
+
+NAN = float('nan')
+ABSENT_INT = -2 ** 63
+# float64 holds every int below 2**53 in magnitude exactly
+EXACT = 2.0 ** 53
+# number of entries from which merges take the vectorized path, None to always take the dict path
+THRESHOLD = None
+
+
+def enabled(entries) -> bool:
+    """
+    :param entries: sized collection about to be merged.
+    :return: True if the vectorized path should be used for it.
+    """
+    return AVAILABLE and THRESHOLD is not None and len(entries) >= THRESHOLD
+
+
+def _gather(timestamps, elements, absent):
+    """
+    :param timestamps: dict of element to timestamp.
+    :param elements: list of elements.
+    :param absent: value standing for the elements missing from the timestamps.
+    :return: array of the timestamps of the elements, of the dtype numpy.array picks for them.
+    """
+    import numpy
+    return numpy.array(list(map(timestamps.get, elements, repeat(absent))))
+
+
+def _exact(*arrays) -> bool:
+    """
+    :param arrays: arrays of timestamps.
+    :return: True if the arrays compare like their timestamps: all int64, or all float64 below 2**53 in magnitude,
+             which a mix of ints and floats turns into floats without rounding.
+    """
+    import numpy
+    if any(array.ndim != 1 for array in arrays):
+        return False
+    dtypes = {array.dtype for array in arrays}
+    if dtypes == {numpy.dtype(numpy.int64)}:
+        return True
+    # fmax skips the NaN of the absent elements
+    return dtypes == {numpy.dtype(numpy.float64)} and \
+        all(numpy.fmax.reduce(numpy.abs(array), initial=0.0) < EXACT for array in arrays)
+
+
+def newer_entries(timestamps, entries) -> list:
+    """
+    Selects the entries which win against the timestamp set, exactly like
+    `element not in timestamps or timestamp > timestamps[element]`.
+    :param timestamps: dict of element to timestamp.
+    :param entries: dict of element to timestamp to merge in.
+    :return: list of the winning elements.
+    """
+    import numpy
+    elements = list(entries)
+    try:
+        incoming = numpy.array(list(entries.values()))
+        integer = incoming.dtype == numpy.int64
+        current = _gather(timestamps, elements, ABSENT_INT if integer else NAN)
+        exact = _exact(incoming, current)
+    except ValueError:
+        exact = False
+    if not exact:
+        # timestamps which are not plain numbers of one type are compared by the dict path
+        return [element for element, timestamp in entries.items()
+                if element not in timestamps or timestamp > timestamps[element]]
+    absent = current == ABSENT_INT if integer else numpy.isnan(current)
+    winners = absent | (incoming > current)
+    return [elements[index] for index in numpy.flatnonzero(winners).tolist()]
+
+
+def liveness_flips(add_set, remove_set, live, elements) -> list:
+    """
+    Selects the elements whose liveness, biased towards add, differs from their membership in live.
+    :param add_set: dict of element to add timestamp.
+    :param remove_set: dict of element to remove timestamp.
+    :param live: container of the elements currently considered live.
+    :param elements: collection of the elements to check.
+    :return: list of the elements to refresh.
+    """
+    import numpy
+    elements = list(elements)
+    # the type of one add timestamp picks the absent value, _exact checks it fits all the others
+    integer = bool(elements) and type(add_set.get(elements[0])) is int
+    absent_value = ABSENT_INT if integer else NAN
+    try:
+        added = _gather(add_set, elements, absent_value)
+        removed = _gather(remove_set, elements, absent_value)
+        exact = _exact(added, removed)
+    except ValueError:
+        exact = False
+    if not exact:
+        # refreshing every element is always right
+        return elements
+    absent = added == ABSENT_INT if integer else numpy.isnan(added)
+    # an absent removal never wins: NaN compares False and -2**63 is below every timestamp
+    alive = ~absent & ~(removed > added)
+    was_alive = numpy.fromiter(map(live.__contains__, elements), numpy.bool_, len(elements))
+    return [elements[index] for index in numpy.flatnonzero(alive != was_alive).tolist()]
@@ -0,0 +1,91 @@
+import time
+import unittest
+
+import lww_element_graph_numpy as vectorized
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_testing import StateAssertions, random_graph
+
+
+@unittest.skipUnless(vectorized.AVAILABLE, 'NumPy is not installed')
+class Test_Vectorized_Merge(StateAssertions, unittest.TestCase):
+
+    def setUp(self):
+        self.threshold = vectorized.THRESHOLD
+
+    def tearDown(self):
+        vectorized.THRESHOLD = self.threshold
+
+    def merged(self, threshold):
+        vectorized.THRESHOLD = threshold
+        # timestamps spread over 4 values, the replicas tie on many of them
+        graph = random_graph(1, count=1200, vertices=300, spread=4)
+        graph.merge(random_graph(2, count=1200, vertices=300, spread=4))
+        return graph
+
+    def test_same_state_as_dict_merge(self):
+        """
+        This method tests that the vectorized merge gives the exact state of the dict merge, ties included.
+        """
+        expected = self.merged(None)
+        graph = self.merged(1)
+        self.assertSameState(graph, expected)
+        self.assertEqual(graph.version, expected.version)
+
+    def test_add_bias_on_ties(self):
+        """
+        This method tests that a removal with the timestamp of the add leaves the vertex in the graph.
+        """
+        vectorized.THRESHOLD = 1
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        graph.add_vertices([1, 2], current_timestamp)
+        other = LWW_Element_Graph({})
+        other.apply_batch([('remove_vertex', 1, current_timestamp), ('remove_vertex', 2, current_timestamp + 1)])
+        graph.merge(other)
+        self.assertEqual(graph.get_vertices(), [1])
+
+    def test_opt_in(self):
+        """
+        This method tests that merges keep the dict path until THRESHOLD is set.
+        """
+        self.assertIsNone(self.threshold)
+        self.assertFalse(vectorized.enabled(range(10 ** 6)))
+        vectorized.THRESHOLD = 4096
+        self.assertTrue(vectorized.enabled(range(4096)))
+
+    def test_mixed_timestamps_fall_back(self):
+        """
+        This method tests that timestamps NumPy can not compare go through the dict path.
+        """
+        self.assertEqual(vectorized.newer_entries({1: 'b'}, {1: 'c', 2: 'a'}), [1, 2])
+
+    def test_int_and_float_timestamps(self):
+        """
+        This method tests timestamps mixing ints and floats above the threshold: they are neither truncated
+        to int64 nor rounded to float64.
+        """
+        vectorized.THRESHOLD = 4096
+        vertices = range(vectorized.THRESHOLD + 1000)
+        graph = LWW_Element_Graph({})
+        graph.apply_batch(('add_vertex', vertex, 100) for vertex in vertices)
+        removals = LWW_Element_Graph({})
+        removals.apply_batch(('remove_vertex', vertex, 100.5) for vertex in vertices)
+        graph.merge(removals)
+        self.assertFalse(graph.check_vertex_exists(0))
+        self.assertEqual(len(graph.get_vertices()), 0)
+
+        adds = LWW_Element_Graph({})
+        adds.apply_batch(('add_vertex', vertex, 100.75) for vertex in vertices)
+        graph.merge(adds)
+        self.assertEqual(graph.add_vertex_set[0], 100.75)
+        self.assertEqual(len(graph.get_vertices()), len(vertices))
+        big = 2 ** 60
+        self.assertEqual(vectorized.newer_entries({1: big, 2: 1.5}, {1: big + 1, 2: 1}), [1])
+        self.assertEqual(vectorized.newer_entries({1: big + 1}, {1: big, 2: big}), [2])
+        self.assertEqual(vectorized.newer_entries({1: 1.5}, {1: 2 ** 62, 2: 1.0}), [1, 2])
+        self.assertEqual(vectorized.liveness_flips({1: big, 2: big}, {1: big + 1, 2: 1.5}, {1, 2}, [1, 2]), [1, 2])
+        self.assertEqual(vectorized.liveness_flips({1: big, 2: big}, {1: big + 1}, {1, 2}, [1, 2]), [1])
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,77 @@
+"""
+This module contains the parallel merge of many replicas of the (Last-Write-Wins)LWW-element-graph.
+
+Merge is associative and commutative, so the replicas are split in groups merged in a process pool, each into
+plain timestamp dicts, and the partial states are then reduced in the parent before a single merge into the graph.
+With the fork start method the workers inherit the replicas, nothing is pickled on the way in.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lww_element_graph import LWW_SETS, Delta
+
+# replica states of the worker, see _share
+_states = ()
+
+
+def merge_states(states) -> Delta:
+    """
+    Merges the four timestamp sets of many states, preference is given to latest timestamp.
+    :param states: iterable of Delta, LWW_Element_Graph or any object holding the four timestamp sets.
+    :return: Delta of the merged timestamp dicts.
+    """
+    merged = Delta(None, {}, {}, {}, {})
+    for state in states:
+        for lww_set in LWW_SETS:
+            timestamps = getattr(merged, lww_set)
+            entries = getattr(state, lww_set)
+            if not timestamps:
+                timestamps.update(entries)
+                continue
+            get = timestamps.get
+            for element, timestamp in entries.items():
+                current = get(element)
+                if current is None or timestamp > current:
+                    timestamps[element] = timestamp
+    return merged
+
+
+def _share(states):
+    """
+    Initializer of the workers, keeps the replica states for _merge_group.
+    """
+    global _states
+    _states = states
+
+
+def _merge_group(indexes) -> Delta:
+    """
+    Merges the replica states at the given indexes, in a worker.
+    """
+    return merge_states(_states[index] for index in indexes)
+
+
+def merge_all(graph, replicas, workers=None):
+    """
+    Merges all the replicas in the graph, in the same state as merging them one after the other.
+    :param graph: LWW_Element_Graph to merge into.
+    :param replicas: sequence of Delta, LWW_Element_Graph or any object holding the four timestamp sets.
+    :param workers: number of processes, os.cpu_count() by default, 1 to reduce in the current process.
+    :return: merged graph
+    """
+    replicas = list(replicas)
+    workers = min(workers or os.cpu_count() or 1, len(replicas))
+    if workers <= 1:
+        return graph.merge_delta(merge_states(replicas))
+    if 'fork' in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context('fork')
+        states = [Delta(None, *(getattr(replica, lww_set) for lww_set in LWW_SETS)) for replica in replicas]
+    else:
+        # spawned workers receive the replicas pickled, as plain dicts
+        context = None
+        states = [Delta(None, *(dict(getattr(replica, lww_set)) for lww_set in LWW_SETS)) for replica in replicas]
+    groups = [range(index, len(states), workers) for index in range(workers)]
+    with ProcessPoolExecutor(workers, mp_context=context, initializer=_share, initargs=(states,)) as executor:
+        partial_states = list(executor.map(_merge_group, groups))
+    return graph.merge_delta(merge_states(partial_states))
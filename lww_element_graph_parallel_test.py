@@ -0,0 +1,41 @@
+import unittest
+
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_testing import StateAssertions, random_graph
+
+
+def replicas(count) -> list:
+    """
+    :return: list of random replicas, one out of three with compact storage.
+    """
+    return [random_graph(seed, compact=seed % 3 == 2) for seed in range(count)]
+
+
+class Test_Parallel_Merge(StateAssertions, unittest.TestCase):
+
+    def test_merge_all(self):
+        """
+        This method tests that merge_all gives the state of merging the replicas one after the other.
+        """
+        graphs = replicas(9)
+        for workers in (1, 2, 4):
+            expected = random_graph(100)
+            graph = random_graph(100)
+            for replica in graphs:
+                expected.merge(replica)
+            self.assertIs(graph.merge_all(graphs, workers=workers), graph)
+            self.assertSameState(graph, expected)
+
+    def test_merge_all_delta_mode(self):
+        """
+        This method tests that the writes of merge_all go to the delta buffer like the ones of merge.
+        """
+        graphs = replicas(4)
+        graph = LWW_Element_Graph({}, delta_mode=True)
+        graph.merge_all(graphs, workers=2)
+        peer = LWW_Element_Graph({}).merge_delta(graph.deltas_since(0))
+        self.assertSameState(peer, graph)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -0,0 +1,137 @@
+"""
+This module contains the partial replication of the (Last-Write-Wins)LWW-element-graph.
+
+A Partition is a set of vertices, given by a predicate, a hash partition id or the k-hop neighbourhood of seeds.
+The sub-state of a partition holds the entries of the four timestamp sets which can change the graph around its
+vertices:
+- the entries of the vertices of the partition,
+- the entries of the edges with at least one vertex in the partition, including the edges crossing its boundary,
+- the entries of the vertices outside of the partition linked to it by such an edge, the boundary vertices: a
+  crossing edge is live only while both of its vertices are.
+A replica restricted to a partition (LWW_Element_Graph.restrict) only keeps the sub-state of its partition from
+every merge. The neighbours of the vertices of the partition, their paths inside the partition and the crossing
+edges are the same as on a full replica, the boundary vertices only show their edges into the partition.
+
+A replica syncing a restricted peer sends it LWW_Element_Graph.partition_state(partition, version), which
+completes the boundary from its full state. A delta of deltas_since can not tell that a vertex outside of the
+partition got its first crossing edge after its own entries were sent, so restricted replicas must be fed with
+partition states, whole graphs or whole streamed states (LWW_Element_Graph.load_stream).
+"""
+from hashlib import blake2b
+
+from lww_element_graph import LWW_SETS, Delta, UndirectedView, breadth_first_levels
+from lww_element_graph_codec import encode_element
+
+
+def vertex_hash(vertex) -> int:
+    """
+    :return: 64 bits hash of the vertex, the same in every process unlike hash().
+    """
+    key = bytearray()
+    try:
+        encode_element(vertex, key)
+    except TypeError:
+        key = bytearray(repr(vertex).encode('utf-8'))
+    return int.from_bytes(blake2b(key, digest_size=8).digest(), 'little')
+
+
+def state_size(state) -> int:
+    """
+    :return: number of entries of the four timestamp sets of the state.
+    """
+    return sum(len(getattr(state, lww_set)) for lww_set in LWW_SETS)
+
+
+class Partition:
+    """
+    Set of vertices a replica holds, see the module documentation.
+    """
+
+    def __init__(self, contains):
+        """
+        :param contains: predicate returning True for the vertices of the partition.
+        """
+        self.contains = contains
+
+    @classmethod
+    def of_vertices(cls, vertices):
+        """
+        :param vertices: iterable of the vertices of the partition.
+        :return: Partition
+        """
+        return cls(frozenset(vertices).__contains__)
+
+    @classmethod
+    def hashed(cls, partition_id, partitions):
+        """
+        :param partition_id: id of the partition, 0 to partitions - 1.
+        :param partitions: number of partitions the vertices are spread over by vertex_hash.
+        :return: Partition
+        """
+        if not 0 <= partition_id < partitions:
+            raise ValueError('partition id must be between 0 and %d' % (partitions - 1))
+        return cls(lambda vertex: vertex_hash(vertex) % partitions == partition_id)
+
+    @classmethod
+    def k_hop(cls, graph, seeds, hops):
+        """
+        :param graph: LWW_Element_Graph to explore, whatever the direction of the edges.
+        :param seeds: iterable of vertices, the ones not in the graph are ignored.
+        :param hops: number of hops from the seeds.
+        :return: Partition of the vertices at most hops away from a seed, at the current state of the graph.
+        """
+        adjacency_list = graph.adjacency_list
+        neighbours = UndirectedView(adjacency_list, graph.predecessors) if graph.directed else adjacency_list
+        vertices = set()
+        for seed in seeds:
+            if seed in adjacency_list and seed not in vertices:
+                vertices.update(breadth_first_levels(neighbours, seed, hops))
+        return cls.of_vertices(vertices)
+
+    def holds_edge(self, edge) -> bool:
+        """
+        :return: True if one of the vertices of the edge is in the partition.
+        """
+        return self.contains(edge[0]) or self.contains(edge[1])
+
+    def filter(self, state, graph=None) -> Delta:
+        """
+        :param state: Delta, LWW_Element_Graph or any object holding the four timestamp sets.
+        :param graph: LWW_Element_Graph holding the state, or receiving it, whose incident edges tell the boundary
+                      vertices and whose entries complete the ones of the boundary vertices missing from the state.
+        :return: Delta of the sub-state of the partition in the state.
+        """
+        # the predicate is called once per vertex, a vertex being tested for each of its edges
+        members = {}
+
+        def contains(vertex):
+            member = members.get(vertex)
+            if member is None:
+                member = members[vertex] = self.contains(vertex)
+            return member
+
+        def holds_edge(edge):
+            return contains(edge[0]) or contains(edge[1])
+
+        sub_state = Delta(getattr(state, 'version', None), {}, {}, {}, {})
+        boundary = set()
+        for lww_set in ('add_edge_set', 'remove_edge_set'):
+            entries = getattr(sub_state, lww_set)
+            for edge, timestamp in getattr(state, lww_set).items():
+                if holds_edge(edge):
+                    entries[edge] = timestamp
+                    boundary.update(vertex for vertex in (edge[0], edge[1]) if not contains(vertex))
+        # the edges of a graph filtering its own state are all in the state, the boundary is complete already
+        incident_edges = graph.incident_edges if graph is not None and graph is not state else {}
+        for lww_set in ('add_vertex_set', 'remove_vertex_set'):
+            entries = getattr(sub_state, lww_set)
+            for vertex, timestamp in getattr(state, lww_set).items():
+                if contains(vertex) or vertex in boundary or \
+                        any(holds_edge(edge) for edge in incident_edges.get(vertex, ())):
+                    entries[vertex] = timestamp
+            if graph is not None and graph is not state:
+                timestamps = getattr(graph, lww_set)
+                for vertex in boundary:
+                    if vertex not in entries and vertex in timestamps:
+                        entries[vertex] = timestamps[vertex]
+        return sub_state
@@ -0,0 +1,111 @@
+import time
+import unittest
+
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_partition import Partition, state_size
+from lww_element_graph_testing import StateAssertions, random_operations
+
+
+class Test_Partial_Replication(StateAssertions, unittest.TestCase):
+
+    def assertMatches(self, partial, full, partition):
+        """
+        Asserts that the partial replica answers like the full one around the vertices of the partition.
+        """
+        for vertex in full.add_vertex_set:
+            if partition.contains(vertex):
+                self.assertEqual(partial.check_vertex_exists(vertex), full.check_vertex_exists(vertex))
+                if full.check_vertex_exists(vertex):
+                    self.assertEqual(sorted(partial.query_vertices(vertex)), sorted(full.query_vertices(vertex)))
+        for edge in full.add_edge_set:
+            if partition.holds_edge(edge):
+                self.assertEqual(edge in partial.live_edge_set, edge in full.live_edge_set)
+
+    def test_restricted_merges(self):
+        """
+        This method tests replicas restricted to hash partitions synced by whole graph merges and by partition
+        states, the crossing edges dying with the vertex outside of the partition.
+        """
+        for kwargs in ({}, {'directed': True}, {'directed': False}, {'directed': False, 'multi': True}):
+            start = time.time() + 1
+            full = LWW_Element_Graph({}, delta_mode=True, **kwargs)
+            partitions = [Partition.hashed(partition_id, 3) for partition_id in range(3)]
+            merged = [LWW_Element_Graph({}, **kwargs).restrict(partition) for partition in partitions]
+            synced = [LWW_Element_Graph({}, **kwargs).restrict(partition) for partition in partitions]
+            versions = [0] * len(partitions)
+            for round_number in range(5):
+                for operation, element, timestamp in random_operations(round_number, count=300, vertices=80,
+                                                                       timestamp=start + round_number * 1000):
+                    getattr(full, operation)(element, timestamp)
+                for index, partition in enumerate(partitions):
+                    merged[index].merge(full)
+                    synced[index].merge_delta(full.partition_state(partition, versions[index]))
+                    versions[index] = full.version
+                    self.assertMatches(merged[index], full, partition)
+                    self.assertMatches(synced[index], full, partition)
+                    self.assertEqual(merged[index].add_edge_set, synced[index].add_edge_set)
+            self.assertLess(max(state_size(graph) for graph in synced), state_size(full))
+
+    def test_load_stream(self):
+        """
+        This method tests that a restricted replica loading a streamed state keeps the sub-state a merge keeps.
+        """
+        full = LWW_Element_Graph({})
+        for operation, element, timestamp in random_operations(3, count=300, vertices=80, timestamp=time.time() + 1):
+            getattr(full, operation)(element, timestamp)
+        partition = Partition.hashed(1, 4)
+        merged = LWW_Element_Graph({}).restrict(partition).merge(full)
+        streamed = LWW_Element_Graph({}).restrict(partition)
+        metrics = streamed.enable_metrics(['merge_delta'])
+        self.assertIs(streamed.load_stream(full.iter_state(chunk_size=7)), streamed)
+        self.assertSameState(streamed, merged)
+        self.assertLess(state_size(streamed), state_size(full))
+        self.assertGreater(metrics.merges, 1)
+        self.assertMatches(streamed, full, partition)
+
+    def test_boundary_vertex_removed(self):
+        """
+        This method tests that removing a vertex outside of the partition reaches the replica, without the edge.
+        """
+        vertices = list(range(100))
+        inside = Partition.of_vertices(vertices[:50])
+        full = LWW_Element_Graph({}, delta_mode=True)
+        timestamp = time.time() + 1
+        full.add_vertex(1, timestamp)
+        full.add_vertex(60, timestamp)
+        full.add_vertex(70, timestamp)
+        full.add_edge((1, 60), timestamp)
+        full.add_edge((60, 70), timestamp)
+        partial = LWW_Element_Graph({}).restrict(inside)
+        partial.merge_delta(full.partition_state(inside))
+        self.assertEqual(partial.query_vertices(1), [60])
+        self.assertNotIn(70, partial.add_vertex_set)
+        self.assertNotIn((60, 70), partial.add_edge_set)
+        version = full.version
+        full.remove_vertex(60, timestamp + 1)
+        partial.merge_delta(full.partition_state(inside, version))
+        self.assertEqual(partial.query_vertices(1), [])
+        self.assertEqual(full.query_vertices(1), [])
+
+    def test_k_hop(self):
+        """
+        This method tests the k-hop partition and the restriction of a graph holding a whole state.
+        """
+        graph = LWW_Element_Graph({})
+        timestamp = time.time() + 1
+        for vertex in range(10):
+            graph.add_vertex(vertex, timestamp)
+            if vertex:
+                graph.add_edge((vertex - 1, vertex), timestamp)
+        partition = Partition.k_hop(graph, [0, 9, 42], 2)
+        self.assertEqual([vertex for vertex in range(10) if partition.contains(vertex)], [0, 1, 2, 7, 8, 9])
+        graph.restrict(partition)
+        self.assertEqual(sorted(graph.get_vertices()), [0, 1, 2, 3, 6, 7, 8, 9])
+        self.assertEqual(sorted(graph.add_edge_set), [(0, 1), (1, 2), (2, 3), (6, 7), (7, 8), (8, 9)])
+        self.assertEqual(graph.find_path(0, 2), [0, 1, 2])
+        with self.assertRaises(ValueError):
+            Partition.hashed(3, 3)
+
+
+if __name__ == '__main__':
+    unittest.main()
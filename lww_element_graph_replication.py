@@ -0,0 +1,377 @@
+"""
+This module contains the asyncio replication of the (Last-Write-Wins)LWW-element-graph between processes.
+
+A ReplicationServer exposes a graph over TCP or a Unix socket, a ReplicationClient keeps one connection per peer
+and pulls the deltas of the peers into its graph, or pushes its own deltas to them. Every message is a frame:
+    uint32 payload length, uint8 message type, uint32 request id, payload
+Requests are pipelined: a connection sends up to max_in_flight requests before the first response comes back,
+responses being matched by request id. The server answers the requests of a connection in order and stops reading
+from it while the peer does not read its responses, so a slow peer only holds its own buffers.
+Deltas travel in the encoding of lww_element_graph_codec, a DELTA or ACK response starting with the incarnation of
+the server: a random id drawn when the server starts. A client pulls from a peer from its (incarnation, version)
+cursor: a peer which restarted, or came back with an older state, is met with another incarnation or an older
+version and the client pulls its whole state again, instead of waiting for the peer to reach a version it may never
+reach. Pushes keep the same cursor: a peer acknowledging a push with another incarnation is pushed the whole state.
+Replicas with a digest (see lww_element_graph_digest) can also reconcile: the client walks down the nodes of the
+digest of the peer which differ from its own and pulls the entries of the differing buckets only.
+"""
+import asyncio
+import logging
+import os
+import struct
+
+from lww_element_graph_codec import VERSION, decode_delta, encode_delta, pack_column, unpack_column
+
+HEADER = struct.Struct('<IBI')
+# arity, depth and level of a digest request
+SHAPE = struct.Struct('<BBB')
+# random id of a server, 0 standing for an unknown one in the pull requests
+INCARNATION = struct.Struct('<Q')
+# message types
+PULL, PUSH, DELTA, ACK, ERROR, DIGEST, NODES, BUCKETS = range(1, 9)
+# frames larger than this are rejected, they can only come from a corrupt stream
+MAX_FRAME = 1 << 30
+logger = logging.getLogger(__name__)
+
+
+def encode_frame(kind, request_id, payload) -> bytearray:
+    """
+    :return: frame of the message.
+    """
+    out = bytearray(HEADER.pack(len(payload), kind, request_id))
+    out += payload
+    return out
+
+
+async def read_frame(reader) -> tuple:
+    """
+    Reads the next frame of the stream.
+    :param reader: asyncio.StreamReader.
+    :return: tuple of the message type, the request id and the payload.
+    """
+    length, kind, request_id = HEADER.unpack(await reader.readexactly(HEADER.size))
+    if length > MAX_FRAME:
+        raise ValueError('frame of %d bytes exceeds the limit' % length)
+    return kind, request_id, await reader.readexactly(length)
+
+
+class ReplicationServer:
+    """
+    Serves the deltas of a graph and merges the deltas pushed by the peers.
+    """
+
+    def __init__(self, graph):
+        """
+        :param graph: LWW_Element_Graph to expose, preferably in delta mode so pulls only carry what changed.
+        """
+        self.graph = graph
+        self.server = None
+        self.incarnation = int.from_bytes(os.urandom(INCARNATION.size), 'little') or 1
+
+    async def start(self, host='127.0.0.1', port=0):
+        """
+        Starts serving over TCP.
+        :param port: port to listen on, 0 for any free port.
+        :return: (host, port) address of the server, to give to the clients.
+        """
+        self.server = await asyncio.start_server(self._serve, host, port)
+        return self.server.sockets[0].getsockname()[:2]
+
+    async def start_unix(self, path):
+        """
+        Starts serving over a Unix socket.
+        :param path: path of the socket.
+        :return: path, the address of the server.
+        """
+        self.server = await asyncio.start_unix_server(self._serve, path)
+        return path
+
+    async def close(self):
+        """
+        Stops serving and waits for the server to close.
+        """
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
+
+    def _handle(self, kind, request_id, payload) -> bytearray:
+        """
+        :return: frame of the response to a request.
+        """
+        if kind == PULL:
+            incarnation, = INCARNATION.unpack_from(payload)
+            version, = VERSION.unpack_from(payload, INCARNATION.size)
+            # the version of another incarnation means nothing here, the whole state is sent
+            delta = self.graph.deltas_since(version if incarnation == self.incarnation else 0)
+            response = bytearray(INCARNATION.pack(self.incarnation))
+            encode_delta(delta, response)
+            return encode_frame(DELTA, request_id, response)
+        if kind == PUSH:
+            delta, _ = decode_delta(payload)
+            self.graph.merge_delta(delta)
+            return encode_frame(ACK, request_id, INCARNATION.pack(self.incarnation) + VERSION.pack(self.graph.version))
+        if kind == DIGEST:
+            arity, depth, level = SHAPE.unpack_from(payload)
+            indexes, _ = unpack_column('I', payload, SHAPE.size, (len(payload) - SHAPE.size) // 4)
+            nodes = self._digest(arity, depth).nodes(level, indexes)
+            return encode_frame(NODES, request_id, pack_column('Q', nodes))
+        if kind == BUCKETS:
+            arity, depth, _ = SHAPE.unpack_from(payload)
+            buckets, _ = unpack_column('I', payload, SHAPE.size, (len(payload) - SHAPE.size) // 4)
+            response = bytearray(INCARNATION.pack(self.incarnation))
+            encode_delta(self._digest(arity, depth).delta(buckets), response)
+            return encode_frame(DELTA, request_id, response)
+        return encode_frame(ERROR, request_id, b'unknown message type %d' % kind)
+
+    def _digest(self, arity, depth):
+        """
+        :return: RangeDigest of the graph, enabled on the first digest request.
+        """
+        digest = self.graph.digest
+        if digest is None:
+            digest = self.graph.enable_digest(arity, depth)
+        if (digest.arity, digest.depth) != (arity, depth):
+            raise ValueError('digest of arity %d and depth %d expected' % (digest.arity, digest.depth))
+        return digest
+
+    async def _serve(self, reader, writer):
+        """
+        Answers the requests of one connection until the peer closes it.
+        """
+        try:
+            while True:
+                kind, request_id, payload = await read_frame(reader)
+                try:
+                    response = self._handle(kind, request_id, payload)
+                except (IndexError, TypeError, ValueError, struct.error) as error:
+                    response = encode_frame(ERROR, request_id, str(error).encode('utf-8'))
+                writer.write(response)
+                # back-pressure, the next request is read once the peer reads the responses
+                await writer.drain()
+        except asyncio.IncompleteReadError:
+            pass
+        except (ConnectionError, ValueError, struct.error) as error:
+            logger.error('replication connection dropped: %s', error)
+        finally:
+            writer.close()
+
+
+class Connection:
+    """
+    Pipelined connection to one peer.
+    """
+
+    def __init__(self, reader, writer, max_in_flight):
+        self.reader = reader
+        self.writer = writer
+        self.in_flight = asyncio.Semaphore(max_in_flight)
+        self.pending = {}
+        self.next_request_id = 0
+        self.closed = False
+        # bytes of the frames sent and received
+        self.sent = 0
+        self.received = 0
+        self.receiver = asyncio.get_running_loop().create_task(self._receive())
+
+    async def request(self, kind, payload) -> tuple:
+        """
+        Sends a request and waits for its response.
+        :return: tuple of the message type and the payload of the response.
+        """
+        async with self.in_flight:
+            if self.closed:
+                raise ConnectionError('connection to the peer is closed')
+            self.next_request_id = (self.next_request_id + 1) & 0xFFFFFFFF
+            response = self.pending[self.next_request_id] = asyncio.get_running_loop().create_future()
+            frame = encode_frame(kind, self.next_request_id, payload)
+            self.sent += len(frame)
+            self.writer.write(frame)
+            await self.writer.drain()
+            kind, payload = await response
+            if kind == ERROR:
+                raise ValueError('peer rejected the request: %s' % payload.decode('utf-8', 'replace'))
+            return kind, payload
+
+    async def _receive(self):
+        """
+        Hands the responses to the pending requests.
+        """
+        try:
+            while True:
+                kind, request_id, payload = await read_frame(self.reader)
+                self.received += HEADER.size + len(payload)
+                response = self.pending.pop(request_id, None)
+                if response is not None and not response.done():
+                    response.set_result((kind, payload))
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError, struct.error):
+            pass
+        finally:
+            self.closed = True
+            for response in self.pending.values():
+                if not response.done():
+                    response.set_exception(ConnectionError('connection to the peer was lost'))
+            self.pending.clear()
+
+    async def close(self):
+        """
+        Closes the connection, the pending requests fail with ConnectionError.
+        """
+        self.writer.close()
+        self.receiver.cancel()
+        try:
+            await self.receiver
+        except asyncio.CancelledError:
+            pass
+
+
+class ReplicationClient:
+    """
+    Pulls and pushes the deltas of a graph from and to many peers, over a pool of pipelined connections.
+    A peer is the address returned by ReplicationServer.start or start_unix.
+    """
+
+    def __init__(self, graph, max_in_flight=16):
+        """
+        :param graph: local LWW_Element_Graph, preferably in delta mode so pushes only carry what changed.
+        :param max_in_flight: number of requests sent to a peer before waiting for their responses.
+        """
+        self.graph = graph
+        self.max_in_flight = max_in_flight
+        self.connections = {}
+        self.opening = {}
+        # (incarnation, version) of each peer as of the last pull,
+        # and (incarnation of the peer, local version) as of the last push to each peer
+        self.pulled = {}
+        self.pushed = {}
+
+    async def _connection(self, peer) -> Connection:
+        """
+        :return: open connection to the peer, from the pool.
+        """
+        # concurrent requests to a peer wait for the same connection to open
+        async with self.opening.setdefault(peer, asyncio.Lock()):
+            connection = self.connections.get(peer)
+            if connection is None or connection.closed:
+                if isinstance(peer, str):
+                    streams = await asyncio.open_unix_connection(peer)
+                else:
+                    streams = await asyncio.open_connection(*peer)
+                connection = self.connections[peer] = Connection(*streams, self.max_in_flight)
+            return connection
+
+    async def pull(self, peer):
+        """
+        Merges the deltas of the peer written since the last pull into the graph.
+        :param peer: address of the peer.
+        :return: the pulled Delta.
+        """
+        connection = await self._connection(peer)
+        incarnation, requested = self.pulled.get(peer, (0, 0))
+        _, payload = await connection.request(PULL, INCARNATION.pack(incarnation) + VERSION.pack(requested))
+        incarnation, = INCARNATION.unpack_from(payload)
+        delta, _ = decode_delta(payload, INCARNATION.size)
+        self.graph.merge_delta(delta)
+        known_incarnation, known = self.pulled.get(peer, (0, 0))
+        if incarnation == known_incarnation and delta.version >= requested:
+            # concurrent pulls may complete out of order
+            self.pulled[peer] = (incarnation, max(delta.version, known))
+        else:
+            # the peer restarted or went back to an older state, the delta holds its whole state
+            self.pulled[peer] = (incarnation, delta.version)
+        return delta
+
+    async def push(self, peer) -> int:
+        """
+        Sends the deltas of the graph written since the last push to the peer.
+        :param peer: address of the peer.
+        :return: version of the peer after the merge.
+        """
+        connection = await self._connection(peer)
+        known_incarnation, version = self.pushed.get(peer, (0, 0))
+        while True:
+            delta = self.graph.deltas_since(version)
+            payload = bytearray()
+            encode_delta(delta, payload)
+            _, response = await connection.request(PUSH, payload)
+            incarnation, = INCARNATION.unpack_from(response)
+            if incarnation == known_incarnation or not version:
+                break
+            # the peer restarted since the last push and may have lost the older entries, it gets the whole state
+            known_incarnation, version = incarnation, 0
+        self.pushed[peer] = (incarnation, delta.version)
+        return VERSION.unpack_from(response, INCARNATION.size)[0]
+
+    async def reconcile(self, peer, push=False) -> list:
+        """
+        Compares the digest of the graph with the one of the peer and pulls the entries of the buckets which differ,
+        enabling the digests if needed. Between converged replicas this is a single request for the root.
+        :param peer: address of the peer.
+        :param push: also push the local entries of the differing buckets to the peer.
+        :return: list of the buckets which differed.
+        """
+        digest = self.graph.digest
+        if digest is None:
+            digest = self.graph.enable_digest()
+        connection = await self._connection(peer)
+        walk = digest.descend()
+        level, indexes = next(walk)
+        try:
+            while True:
+                payload = bytearray(SHAPE.pack(digest.arity, digest.depth, level))
+                payload += pack_column('I', indexes)
+                _, response = await connection.request(DIGEST, payload)
+                level, indexes = walk.send(unpack_column('Q', response, 0, len(indexes))[0])
+        except StopIteration as stop:
+            buckets = stop.value
+        if buckets:
+            local = digest.delta(buckets)
+            payload = bytearray(SHAPE.pack(digest.arity, digest.depth, 0))
+            payload += pack_column('I', buckets)
+            _, response = await connection.request(BUCKETS, payload)
+            self.graph.merge_delta(decode_delta(response, INCARNATION.size)[0])
+            if push:
+                payload = bytearray()
+                encode_delta(local, payload)
+                await connection.request(PUSH, payload)
+        return buckets
+
+    async def sync(self, peers, push=False):
+        """
+        Runs one anti-entropy round: pulls from all the peers at once, then pushes to them if asked.
+        A peer which can not be reached is skipped until the next round.
+        :param peers: iterable of peer addresses.
+        :param push: also push the local deltas to the peers.
+        :return: list of the peers which could not be reached.
+        """
+        peers = list(peers)
+        unreachable = []
+        for step in (self.pull, self.push) if push else (self.pull,):
+            results = await asyncio.gather(*(step(peer) for peer in peers), return_exceptions=True)
+            for peer, result in zip(peers, results):
+                if isinstance(result, (OSError, ValueError)):
+                    logger.warning('replication with %s failed: %s', peer, result)
+                    if peer not in unreachable:
+                        unreachable.append(peer)
+                elif isinstance(result, BaseException):
+                    raise result
+        return unreachable
+
+    async def close(self):
+        """
+        Closes the connections of the pool.
+        """
+        connections, self.connections = self.connections, {}
+        for connection in connections.values():
+            await connection.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import tempfile
+import time
+import unittest
+
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_codec import decode_delta, encode_delta
+from lww_element_graph_replication import PUSH, ReplicationClient, ReplicationServer
+from lww_element_graph_testing import StateAssertions, random_graph
+
+
+def replica(seed, vertices=50, first_vertex=0) -> LWW_Element_Graph:
+    """
+    :return: random graph in delta mode over the vertices from first_vertex.
+    """
+    return random_graph(seed, count=2 * vertices, vertices=vertices, first_vertex=first_vertex, delta_mode=True)
+
+
+class Test_Replication(StateAssertions, unittest.TestCase):
+
+    def test_encode_delta(self):
+        """
+        This method tests that a delta goes through the wire encoding unchanged.
+        """
+        graph = replica(0, 10)
+        graph.add_vertex('name', time.time())
+        graph.add_edge(('name', 3), time.time())
+        graph.remove_vertex(5, time.time() + 1)
+        buffer = bytearray()
+        encode_delta(graph.deltas_since(0), buffer)
+        delta, offset = decode_delta(buffer)
+        self.assertEqual(offset, len(buffer))
+        self.assertEqual(delta, graph.deltas_since(0))
+
+    def test_anti_entropy(self):
+        """
+        This method tests that replicas syncing with each other over TCP converge, pulling only what changed.
+        """
+        async def run():
+            graphs = [replica(index, first_vertex=index * 100) for index in range(3)]
+            servers = [ReplicationServer(graph) for graph in graphs]
+            peers = [await server.start() for server in servers]
+            clients = [ReplicationClient(graph) for graph in graphs]
+            for client, peer in zip(clients, peers):
+                await client.sync(other for other in peers if other != peer)
+            for graph in graphs[1:]:
+                self.assertSameState(graph, graphs[0])
+            self.assertEqual(len(graphs[0].add_vertex_set), 150)
+            # pulls what the peers merged after the first pull
+            await clients[0].sync(peers[1:])
+
+            graphs[1].remove_vertex(120, time.time() + 1)
+            delta = await clients[0].pull(peers[1])
+            self.assertEqual(delta.remove_vertex_set, {120: graphs[1].remove_vertex_set[120]})
+            self.assertNotIn(120, graphs[0].get_vertices())
+
+            graphs[0].add_vertex(1000, time.time())
+            await clients[0].sync(peers[1:], push=True)
+            self.assertIn(1000, graphs[2].get_vertices())
+            for client in clients:
+                await client.close()
+            for server in servers:
+                await server.close()
+        asyncio.run(run())
+
+    def test_peer_restart(self):
+        """
+        This method tests that a client pulls the whole state of a peer which restarted or went back to an older
+        state, whatever its version compared with the one the client pulled before.
+        """
+        async def run():
+            local = LWW_Element_Graph({})
+            async with ReplicationClient(local) as client:
+                async with ReplicationServer(replica(0)) as server:
+                    peer = await server.start()
+                    await client.pull(peer)
+                    # same server, older state
+                    server.graph = replica(1, 10)
+                    server.graph.add_vertex(100, time.time() + 1)
+                    await client.pull(peer)
+                    self.assertIn(100, local.get_vertices())
+                    # the cursor follows the older state, the next pull only carries the new write
+                    server.graph.add_vertex(102, time.time() + 1)
+                    self.assertEqual(list((await client.pull(peer)).add_vertex_set), [102])
+                    await client.close()
+                # restarted server at the same address, its version already past the one pulled before
+                restarted = replica(2, 80, first_vertex=200)
+                restarted.add_vertex(101, time.time() + 1)
+                self.assertGreater(restarted.version, client.pulled[peer][1])
+                async with ReplicationServer(restarted) as server:
+                    await server.start(*peer)
+                    await client.pull(peer)
+                    self.assertIn(101, local.get_vertices())
+                    self.assertEqual(client.pulled[peer], (server.incarnation, restarted.version))
+                    restarted.add_vertex(103, time.time() + 1)
+                    self.assertEqual(list((await client.pull(peer)).add_vertex_set), [103])
+        asyncio.run(run())
+
+    def test_push_to_restarted_peer(self):
+        """
+        This method tests that a peer which restarted empty is pushed the whole state, not only the later writes,
+        and that a truncated request is answered with an error on a connection which stays open.
+        """
+        async def run():
+            local = replica(0, 20)
+            async with ReplicationClient(local) as client:
+                async with ReplicationServer(LWW_Element_Graph({})) as server:
+                    peer = await server.start()
+                    await client.push(peer)
+                    self.assertEqual(client.pulled, {})
+                    self.assertEqual(client.pushed[peer], (server.incarnation, local.version))
+                    await client.close()
+                local.add_vertex(100, time.time() + 1)
+                async with ReplicationServer(LWW_Element_Graph({})) as server:
+                    await server.start(*peer)
+                    self.assertEqual(await client.push(peer), local.version)
+                    self.assertSameState(server.graph, local)
+                    self.assertEqual(client.pushed[peer], (server.incarnation, local.version))
+                    connection = await client._connection(peer)
+                    with self.assertRaises(ValueError):
+                        await connection.request(PUSH, bytes(8))
+                    local.add_vertex(101, time.time() + 1)
+                    await client.push(peer)
+                    self.assertIn(101, server.graph.get_vertices())
+                    self.assertIs(client.connections[peer], connection)
+        asyncio.run(run())
+
+    def test_reconcile(self):
+        """
+        This method tests that replicas reconcile through their digests, an idle round costing a single request.
+        """
+        async def run():
+            local, remote = replica(0, 200), replica(0, 200)
+            remote.merge(local)
+            local.merge(remote)
+            async with ReplicationServer(remote) as server:
+                peer = await server.start()
+                async with ReplicationClient(local) as client:
+                    self.assertEqual(await client.reconcile(peer), [])
+                    connection = client.connections[peer]
+                    self.assertEqual(connection.sent, 16)
+
+                    remote.add_vertex(1000, time.time())
+                    local.remove_edge((10, 11), time.time() + 1)
+                    buckets = await client.reconcile(peer, push=True)
+                    self.assertLessEqual(len(buckets), 2)
+                    self.assertSameState(local, remote)
+                    self.assertEqual(local.digest.root(), remote.digest.root())
+                    self.assertLess(connection.received, 2000)
+        asyncio.run(run())
+
+    def test_pipelined_unix_socket(self):
+        """
+        This method tests many requests in flight on one pooled connection over a Unix socket.
+        """
+        async def run():
+            with tempfile.TemporaryDirectory() as directory:
+                source = replica(0)
+                async with ReplicationServer(source) as server:
+                    peer = await server.start_unix(os.path.join(directory, 'graph.sock'))
+                    async with ReplicationClient(LWW_Element_Graph({}), max_in_flight=4) as client:
+                        deltas = await asyncio.gather(*(client.pull(peer) for _ in range(20)))
+                        self.assertEqual(len(client.connections), 1)
+                        self.assertEqual(max(len(delta.add_vertex_set) for delta in deltas), 50)
+                        self.assertSameState(client.graph, source)
+                    self.assertEqual(await ReplicationClient(source).sync(['/missing.sock']), ['/missing.sock'])
+        asyncio.run(run())
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
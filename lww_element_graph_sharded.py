@@ -0,0 +1,309 @@
+"""
+This module contains the sharded (Last-Write-Wins)LWW-element-graph for multi-threaded writers.
+
+Vertices are partitioned across N shards by hash, an edge belongs to the shard of its first vertex. Each shard has
+its own lock and its own four timestamp sets, plus the candidate neighbours of its vertices: every vertex it shares
+an added edge with, in either direction. Liveness is checked on read, so a write only touches the shards of its
+vertices; operations on two shards take both locks in shard order, which can not deadlock.
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager, nullcontext
+
+from lww_element_graph import LWW_Element_Graph, LWW_SETS, Delta
+
+logger = logging.getLogger(__name__)
+
+
+class Shard:
+    """
+    Lock, timestamp sets and candidate neighbours of the vertices of one shard.
+    """
+    __slots__ = ('lock', 'neighbours') + LWW_SETS
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.add_vertex_set = {}
+        self.remove_vertex_set = {}
+        self.add_edge_set = {}
+        self.remove_edge_set = {}
+        self.neighbours = {}
+
+    def vertex_alive(self, vertex) -> bool:
+        """
+        :return: True if the vertex is in the graph, biased towards add.
+        """
+        added = self.add_vertex_set.get(vertex)
+        if added is None:
+            return False
+        removed = self.remove_vertex_set.get(vertex)
+        return removed is None or removed <= added
+
+    def edge_alive(self, edge) -> bool:
+        """
+        Checks the timestamps of an edge of the shard only, its vertices are not checked.
+        """
+        added = self.add_edge_set.get(edge)
+        if added is None:
+            return False
+        removed = self.remove_edge_set.get(edge)
+        return removed is None or removed <= added
+
+    def link(self, vertex, neighbour):
+        """
+        Registers neighbour as a candidate neighbour of vertex, which belongs to the shard.
+        """
+        neighbours = self.neighbours.get(vertex)
+        if neighbours is None:
+            self.neighbours[vertex] = {neighbour}
+        else:
+            neighbours.add(neighbour)
+
+
+class ShardedGraph:
+    """
+    LWW element graph partitioned across shards, safe to share between writer threads.
+    """
+
+    def __init__(self, shards=16):
+        """
+        :param shards: number of shards.
+        """
+        self.shards = [Shard() for _ in range(shards)]
+
+    def _index(self, vertex) -> int:
+        """
+        :return: index of the shard of the vertex.
+        """
+        return hash(vertex) % len(self.shards)
+
+    def _shard(self, vertex) -> Shard:
+        """
+        :return: shard of the vertex.
+        """
+        return self.shards[hash(vertex) % len(self.shards)]
+
+    @contextmanager
+    def _locked(self, *vertices):
+        """
+        Holds the locks of the shards of the vertices, taken in shard order.
+        """
+        locks = [self.shards[index].lock for index in sorted({self._index(vertex) for vertex in vertices})]
+        for lock in locks:
+            lock.acquire()
+        try:
+            yield
+        finally:
+            for lock in reversed(locks):
+                lock.release()
+
+    def check_vertex_exists(self, vertex) -> bool:
+        """
+        Checks if vertex exists in the graph.
+        :param vertex: integer
+        :return: boolean
+        """
+        return self._shard(vertex).vertex_alive(vertex)
+
+    def check_edge_exists(self, edge) -> bool:
+        """
+        Checks if edge exists in the graph: both vertices exist and the edge is in add_set,
+        and either not in remove_set or removed before (or when) it was added.
+        :param edge: tuple of vertices
+        :return: boolean
+        """
+        return self._shard(edge[0]).edge_alive(edge) and \
+            self.check_vertex_exists(edge[0]) and self.check_vertex_exists(edge[1])
+
+    def add_vertex(self, vertex, timestamp):
+        """
+        Add vertex in the graph with the given timestamp.
+        :param vertex: integer
+        :param timestamp: string
+        :return: True if success else False
+        """
+        try:
+            with self._locked(vertex):
+                shard = self._shard(vertex)
+                current_timestamp = time.time()
+                if shard.vertex_alive(vertex):
+                    return False
+                if vertex not in shard.remove_vertex_set or shard.remove_vertex_set[vertex] <= timestamp:
+                    shard.add_vertex_set[vertex] = max(timestamp, current_timestamp)
+                    return True
+        except TypeError as error:
+            logger.error(str(error))
+
+    def add_edge(self, pair_tuple, timestamp):
+        """
+        Add edge in the graph with the given timestamp.
+        :param pair_tuple: tuple of vertex in between new edge will be added
+        :param timestamp: timestamp of adding new edge
+        :return: True if success else False
+        """
+        try:
+            first, second = pair_tuple[0], pair_tuple[1]
+            with self._locked(first, second):
+                if not (self.check_vertex_exists(first) and self.check_vertex_exists(second)):
+                    return False
+                shard = self._shard(first)
+                if shard.edge_alive(pair_tuple):
+                    return False
+                shard.add_edge_set[pair_tuple] = timestamp
+                shard.link(first, second)
+                self._shard(second).link(second, first)
+                return True
+        except TypeError as error:
+            logger.error(str(error))
+
+    def remove_vertex(self, vertex, timestamp):
+        """
+        Removes vertex from the graph by following LWW methodology.
+        This function is biased towards add operation.
+        :param vertex: integer value of vertex.
+        :param timestamp: timestamp of vertex removal from the graph.
+        :return: True if success else False.
+        """
+        try:
+            with self._locked(vertex):
+                shard = self._shard(vertex)
+                exists = shard.vertex_alive(vertex)
+                if vertex not in shard.remove_vertex_set or shard.remove_vertex_set[vertex] < timestamp:
+                    shard.remove_vertex_set[vertex] = timestamp
+                return exists and not shard.vertex_alive(vertex)
+        except TypeError as error:
+            logger.error(str(error))
+
+    def remove_edge(self, edge, timestamp):
+        """
+        Removes edge from the graph by following LWW methodology.
+        This function is biased towards add operation.
+        :param edge:
+        :param timestamp: timestamp of edge removal from the graph.
+        :return: True if success else False.
+        """
+        try:
+            with self._locked(edge[0], edge[1]):
+                shard = self._shard(edge[0])
+                exists = self.check_edge_exists(edge)
+                if edge not in shard.remove_edge_set or shard.remove_edge_set[edge] < timestamp:
+                    shard.remove_edge_set[edge] = timestamp
+                return exists and not shard.edge_alive(edge)
+        except TypeError as error:
+            logger.error(str(error))
+
+    def get_vertices(self) -> list:
+        """
+        This method returns the list of vertices present in the graph.
+        :return: list of vertices.
+        """
+        vertices = []
+        for shard in self.shards:
+            with shard.lock:
+                vertices.extend(vertex for vertex in shard.add_vertex_set if shard.vertex_alive(vertex))
+        return vertices
+
+    def query_vertices(self, vertex):
+        """
+        This method returns the neighbours of the given vertex.
+        :param vertex: integer value of vertex.
+        :return: list of neighbours if the vertex is in the graph else None.
+        """
+        try:
+            shard = self._shard(vertex)
+            with shard.lock:
+                if not shard.vertex_alive(vertex):
+                    return None
+                candidates = list(shard.neighbours.get(vertex, ()))
+            neighbours = []
+            for neighbour in candidates:
+                if self.check_vertex_exists(neighbour) and \
+                        (shard.edge_alive((vertex, neighbour)) or
+                         self._shard(neighbour).edge_alive((neighbour, vertex))):
+                    neighbours.append(neighbour)
+            return neighbours
+        except TypeError as error:
+            logger.error(str(error))
+
+    def merge(self, lww_element_graph, workers=None):
+        """
+        This method merges the given graph with current graph, shard by shard in a thread pool.
+        For merging within a (add/remove) set, preference is given to latest timestamp.
+        :param lww_element_graph: ShardedGraph, LWW_Element_Graph or any object holding the four timestamp sets.
+        :param workers: number of threads, one per shard by default.
+        :return: merged ShardedGraph
+        """
+        if isinstance(lww_element_graph, ShardedGraph) and len(lww_element_graph.shards) == len(self.shards):
+            parts = lww_element_graph.shards
+        else:
+            if isinstance(lww_element_graph, ShardedGraph):
+                lww_element_graph = lww_element_graph.state()
+            parts = [Delta(None, {}, {}, {}, {}) for _ in self.shards]
+            for lww_set in LWW_SETS:
+                by_vertex = lww_set.endswith('vertex_set')
+                for element, timestamp in getattr(lww_element_graph, lww_set).items():
+                    part = parts[self._index(element if by_vertex else element[0])]
+                    getattr(part, lww_set)[element] = timestamp
+        with ThreadPoolExecutor(max_workers=workers or len(self.shards)) as executor:
+            added = list(executor.map(self._merge_shard, self.shards, parts))
+            links = [[] for _ in self.shards]
+            for edges in added:
+                for first, second in edges:
+                    links[self._index(first)].append((first, second))
+                    links[self._index(second)].append((second, first))
+            list(executor.map(self._link_shard, self.shards, links))
+        return self
+
+    @staticmethod
+    def _merge_shard(shard, part) -> list:
+        """
+        Merges the four timestamp sets of part in the shard.
+        :return: list of the edges new to the add set of the shard.
+        """
+        if part is shard:
+            return []
+        # part is copied before taking the lock of the shard, two graphs merging each other can not deadlock
+        with part.lock if isinstance(part, Shard) else nullcontext():
+            entries = [dict(getattr(part, lww_set)) for lww_set in LWW_SETS]
+        added = []
+        with shard.lock:
+            for lww_set, items in zip(LWW_SETS, entries):
+                timestamps = getattr(shard, lww_set)
+                for element, timestamp in items.items():
+                    current = timestamps.get(element)
+                    if current is None or timestamp > current:
+                        if current is None and lww_set == 'add_edge_set':
+                            added.append(element)
+                        timestamps[element] = timestamp
+        return added
+
+    @staticmethod
+    def _link_shard(shard, links):
+        """
+        Registers the candidate neighbours of the vertices of the shard.
+        """
+        with shard.lock:
+            for vertex, neighbour in links:
+                shard.link(vertex, neighbour)
+
+    def state(self) -> Delta:
+        """
+        This method copies the four timestamp sets of all the shards, each shard under its lock.
+        :return: Delta of the timestamp sets.
+        """
+        state = Delta(None, {}, {}, {}, {})
+        for shard in self.shards:
+            with shard.lock:
+                for lww_set in LWW_SETS:
+                    getattr(state, lww_set).update(getattr(shard, lww_set))
+        return state
+
+    def to_graph(self) -> LWW_Element_Graph:
+        """
+        This method copies the state of all the shards into a new LWW_Element_Graph,
+        e.g. to run the traversals of LWW_Element_Graph.
+        :return: LWW_Element_Graph
+        """
+        return LWW_Element_Graph({}).replace_state(self.state())
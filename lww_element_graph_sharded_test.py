@@ -0,0 +1,74 @@
+import threading
+import time
+import unittest
+
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_sharded import ShardedGraph
+from lww_element_graph_testing import random_graph, random_operations
+
+
+class Test_Sharded_Graph(unittest.TestCase):
+
+    def assertSameGraph(self, sharded, graph):
+        """
+        Checks that the sharded graph answers like the graph.
+        """
+        self.assertEqual(sorted(sharded.get_vertices()), sorted(graph.get_vertices()))
+        for vertex in range(70):
+            neighbours = sharded.query_vertices(vertex)
+            expected = graph.query_vertices(vertex)
+            self.assertEqual(neighbours and sorted(neighbours), expected and sorted(expected))
+            for other in range(70):
+                self.assertEqual(sharded.check_edge_exists((vertex, other)), graph.check_edge_exists((vertex, other)))
+
+    def test_same_answers_as_graph(self):
+        """
+        This method tests that the sharded graph gives the results and answers of the graph.
+        """
+        sharded = ShardedGraph(shards=4)
+        graph = LWW_Element_Graph({})
+        for operation, element, timestamp in random_operations(1, count=3000, vertices=60, timestamp=time.time()):
+            self.assertEqual(getattr(sharded, operation)(element, timestamp),
+                             getattr(graph, operation)(element, timestamp), (operation, element))
+        self.assertSameGraph(sharded, graph)
+        self.assertSameGraph(sharded, sharded.to_graph())
+
+    def test_concurrent_writers(self):
+        """
+        This method tests that writers sharing the graph lose no write.
+        """
+        sharded = ShardedGraph(shards=4)
+        timestamp = time.time()
+
+        def write(offset):
+            for vertex in range(offset, offset + 500):
+                sharded.add_vertex(vertex, timestamp)
+                sharded.add_vertex(vertex + 1, timestamp)
+                sharded.add_edge((vertex, vertex + 1), timestamp)
+        threads = [threading.Thread(target=write, args=(offset,)) for offset in range(0, 4000, 500)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(len(sharded.get_vertices()), 4001)
+        self.assertEqual(sorted(sharded.query_vertices(500)), [499, 501])
+        self.assertEqual(sharded.to_graph().shortest_path(0, 4000), list(range(4001)))
+
+    def test_merge(self):
+        """
+        This method tests that merging sharded graphs gives the state of merging graphs.
+        """
+        graphs = []
+        for shards in (4, 4, 3):
+            sharded = ShardedGraph(shards=shards)
+            sharded.merge(random_graph(len(graphs), vertices=60))
+            graphs.append(sharded)
+        graphs[0].merge(graphs[1])
+        graphs[0].merge(graphs[2])
+        expected = random_graph(0, vertices=60)
+        expected.merge(random_graph(1, vertices=60)).merge(random_graph(2, vertices=60))
+        self.assertSameGraph(graphs[0], expected)
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
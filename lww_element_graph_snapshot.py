@@ -0,0 +1,290 @@
+"""
+This module contains the binary snapshot format of the (Last-Write-Wins)LWW-element-graph.
+
+A snapshot is a little-endian header followed by columns:
+    vertex ids (int64, sorted), vertex add / remove timestamps (float64, NaN when absent),
+    edge offsets (int64, one more than the vertices) and second vertex (vertex index) of the edges sorted by
+    their first vertex, edge add / remove timestamps (float64),
+    the timestamps being int64 (-2**63 when absent) instead when they all are, e.g. with a hybrid logical clock,
+    adjacency offsets (int64) and adjacency (vertex indexes) of the live graph.
+Vertex indexes are int32 unless the snapshot holds 2**31 vertices or more. Only integer vertex ids fit in the format.
+"""
+import math
+import mmap
+import os
+import struct
+import sys
+from array import array
+from bisect import bisect_left
+
+from lww_element_graph import LWW_SETS, Delta
+
+MAGIC = b'LWWG'
+FORMAT_VERSION = 1
+HEADER = struct.Struct('<4sHccQQQ')
+NAN = float('nan')
+# absent timestamp of each timestamp typecode
+ABSENT = {'d': NAN, 'q': -2 ** 63}
+
+
+def _columns(header):
+    """
+    :return: list of (name, typecode, length) of the columns following the header, in file order.
+    """
+    _, _, timestamp_typecode, index_typecode, vertices, edges, adjacency = header
+    timestamp_typecode = timestamp_typecode.decode()
+    index_typecode = index_typecode.decode()
+    return [
+        ('vertex_ids', 'q', vertices),
+        ('vertex_add', timestamp_typecode, vertices),
+        ('vertex_remove', timestamp_typecode, vertices),
+        ('edge_offsets', 'q', vertices + 1),
+        ('edge_second', index_typecode, edges),
+        ('edge_add', timestamp_typecode, edges),
+        ('edge_remove', timestamp_typecode, edges),
+        ('adjacency_offsets', 'q', vertices + 1),
+        ('adjacency', index_typecode, adjacency),
+    ]
+
+
+def _padding(column) -> int:
+    """
+    :return: number of bytes after the column to keep the next one 8-byte aligned.
+    """
+    return -len(column) * column.itemsize % 8
+
+
+def save_snapshot(graph, path):
+    """
+    Writes the state of the graph in a binary snapshot. The file is replaced atomically.
+    :param graph: LWW_Element_Graph with integer vertex ids.
+    :param path: path of the snapshot file.
+    """
+    vertex_ids = set(graph.add_vertex_set)
+    vertex_ids.update(graph.remove_vertex_set)
+    edges = set(graph.add_edge_set)
+    edges.update(graph.remove_edge_set)
+    for edge in edges:
+        if len(edge) != 2:
+            raise TypeError('binary snapshots only hold edges between two vertices, got %r' % (edge,))
+        vertex_ids.update(edge)
+    for vertex in vertex_ids:
+        if type(vertex) is not int:
+            raise TypeError('binary snapshots only hold integer vertex ids, got %r' % (vertex,))
+    # integer ids sort like their indexes, so the edges sorted by ids are sorted by indexes too
+    vertex_ids = sorted(vertex_ids)
+    edges = sorted(edges)
+    index = {vertex: position for position, vertex in enumerate(vertex_ids)}
+    index_typecode = 'i' if len(vertex_ids) < 2 ** 31 else 'q'
+    adjacency = array(index_typecode)
+    adjacency_offsets = array('q', [0])
+    edge_offsets = array('q', [0])
+    for vertex in vertex_ids:
+        adjacency.extend([index[neighbour] for neighbour in graph.adjacency_list.get(vertex, ())])
+        adjacency_offsets.append(len(adjacency))
+        edge_offsets.append(edge_offsets[-1])
+    for first, _ in edges:
+        edge_offsets[index[first] + 1] += 1
+    for position in range(len(vertex_ids)):
+        edge_offsets[position + 1] += edge_offsets[position]
+    timestamp_typecode = 'q' if all(type(timestamp) is int for lww_set in LWW_SETS
+                                    for timestamp in getattr(graph, lww_set).values()) else 'd'
+    absent = ABSENT[timestamp_typecode]
+    columns = {
+        'vertex_ids': array('q', vertex_ids),
+        'vertex_add': array(timestamp_typecode, [graph.add_vertex_set.get(vertex, absent) for vertex in vertex_ids]),
+        'vertex_remove': array(timestamp_typecode,
+                               [graph.remove_vertex_set.get(vertex, absent) for vertex in vertex_ids]),
+        'edge_offsets': edge_offsets,
+        'edge_second': array(index_typecode, [index[second] for _, second in edges]),
+        'edge_add': array(timestamp_typecode, [graph.add_edge_set.get(edge, absent) for edge in edges]),
+        'edge_remove': array(timestamp_typecode, [graph.remove_edge_set.get(edge, absent) for edge in edges]),
+        'adjacency_offsets': adjacency_offsets,
+        'adjacency': adjacency,
+    }
+
+    header = (MAGIC, FORMAT_VERSION, timestamp_typecode.encode(), index_typecode.encode(),
+              len(vertex_ids), len(edges), len(adjacency))
+    temporary_path = '%s.tmp' % path
+    with open(temporary_path, 'wb') as snapshot:
+        snapshot.write(HEADER.pack(*header))
+        for name, _, _ in _columns(header):
+            column = columns[name]
+            if sys.byteorder == 'big':
+                column.byteswap()
+            column.tofile(snapshot)
+            snapshot.write(bytes(_padding(column)))
+        snapshot.flush()
+        os.fsync(snapshot.fileno())
+    os.replace(temporary_path, path)
+
+
+def _read_header(buffer):
+    """
+    :return: unpacked header of the snapshot held in buffer.
+    """
+    header = HEADER.unpack_from(buffer)
+    if header[0] != MAGIC or header[1] != FORMAT_VERSION:
+        raise ValueError('not a version %d LWW-element-graph snapshot' % FORMAT_VERSION)
+    return header
+
+
+def read_snapshot(path) -> dict:
+    """
+    Reads all the columns of a binary snapshot.
+    :param path: path of the snapshot file.
+    :return: dict of column name to array.
+    """
+    with open(path, 'rb') as snapshot:
+        header = _read_header(snapshot.read(HEADER.size))
+        columns = {}
+        for name, typecode, length in _columns(header):
+            column = array(typecode)
+            column.fromfile(snapshot, length)
+            snapshot.read(_padding(column))
+            if sys.byteorder == 'big':
+                column.byteswap()
+            columns[name] = column
+    return columns
+
+
+def load_snapshot(graph, path):
+    """
+    Merges the state held in a binary snapshot into the graph.
+    :param graph: LWW_Element_Graph to load the snapshot into.
+    :param path: path of the snapshot file.
+    :return: the graph.
+    """
+    columns = read_snapshot(path)
+    vertex_ids = columns['vertex_ids']
+    edge_offsets = columns['edge_offsets']
+    edge_second = columns['edge_second']
+    edges = [(vertex_ids[first], vertex_ids[second])
+             for first in range(len(vertex_ids))
+             for second in edge_second[edge_offsets[first]:edge_offsets[first + 1]]]
+    state = Delta(None,
+                  _present(vertex_ids, columns['vertex_add']),
+                  _present(vertex_ids, columns['vertex_remove']),
+                  _present(edges, columns['edge_add']),
+                  _present(edges, columns['edge_remove']))
+    if graph.version == 0 and not graph.adjacency_list:
+        return graph.replace_state(state)
+    return graph.merge_delta(state)
+
+
+def _present(elements, timestamps) -> dict:
+    """
+    :return: dict of element to timestamp, leaving out the absent timestamps.
+    """
+    if timestamps.typecode == 'q':
+        absent = ABSENT['q']
+        return {element: timestamp for element, timestamp in zip(elements, timestamps) if timestamp != absent}
+    return {element: timestamp for element, timestamp in zip(elements, timestamps) if timestamp == timestamp}
+
+
+class MappedGraph:
+    """
+    Read-only view of a binary snapshot mapped in memory.
+    Lookups binary search the sorted columns, nothing is deserialized up front.
+    """
+
+    def __init__(self, path):
+        if sys.byteorder == 'big':
+            raise ValueError('mapped snapshots need a little-endian host, use load_snapshot instead')
+        with open(path, 'rb') as snapshot:
+            self._mmap = mmap.mmap(snapshot.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        header = _read_header(buffer)
+        # NaN never equals itself, -2**63 is below every other int64 timestamp
+        self._absent = None if header[2] == b'd' else ABSENT['q']
+        offset = HEADER.size
+        self._views = [buffer]
+        for name, typecode, length in _columns(header):
+            size = length * array(typecode).itemsize
+            view = buffer[offset:offset + size].cast(typecode)
+            self._views.append(view)
+            setattr(self, name, view)
+            offset += size + _padding(view)
+
+    def close(self):
+        """
+        Releases the memory map, the view can not be used afterwards.
+        """
+        for view in reversed(self._views):
+            view.release()
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _vertex_index(self, vertex):
+        """
+        :return: index of the vertex in the vertex ids, None if the vertex is not in the snapshot.
+        """
+        if type(vertex) is not int:
+            return None
+        position = bisect_left(self.vertex_ids, vertex)
+        if position < len(self.vertex_ids) and self.vertex_ids[position] == vertex:
+            return position
+        return None
+
+    def _index_alive(self, position) -> bool:
+        """
+        :return: True if the vertex at position is in the graph, biased towards add.
+        """
+        return self._alive(self.vertex_add[position], self.vertex_remove[position])
+
+    def _alive(self, added, removed) -> bool:
+        """
+        :return: True if an element with these timestamps is in the graph, biased towards add.
+        """
+        if self._absent is None:
+            return not math.isnan(added) and (math.isnan(removed) or removed <= added)
+        return added != self._absent and removed <= added
+
+    def check_vertex_exists(self, vertex) -> bool:
+        """
+        Checks if vertex exists in the snapshot.
+        :param vertex: integer
+        :return: boolean
+        """
+        position = self._vertex_index(vertex)
+        return position is not None and self._index_alive(position)
+
+    def check_edge_exists(self, edge) -> bool:
+        """
+        Checks if edge exists in the snapshot.
+        :param edge: tuple of vertices.
+        :return: boolean
+        """
+        first = self._vertex_index(edge[0])
+        second = self._vertex_index(edge[1])
+        if first is None or second is None or not (self._index_alive(first) and self._index_alive(second)):
+            return False
+        low, high = self.edge_offsets[first], self.edge_offsets[first + 1]
+        position = bisect_left(self.edge_second, second, low, high)
+        if position == high or self.edge_second[position] != second:
+            return False
+        return self._alive(self.edge_add[position], self.edge_remove[position])
+
+    def query_vertices(self, vertex):
+        """
+        This method returns the neighbours of the given vertex.
+        :param vertex: integer value of vertex.
+        :return: list of neighbours if the vertex is in the snapshot else None.
+        """
+        position = self._vertex_index(vertex)
+        if position is None or not self._index_alive(position):
+            return None
+        start, end = self.adjacency_offsets[position], self.adjacency_offsets[position + 1]
+        return [self.vertex_ids[neighbour] for neighbour in self.adjacency[start:end]]
+
+    def get_vertices(self) -> list:
+        """
+        This method returns the list of vertices present in the snapshot.
+        :return: list of vertices.
+        """
+        return [vertex for position, vertex in enumerate(self.vertex_ids) if self._index_alive(position)]
@@ -0,0 +1,67 @@
+import os
+import tempfile
+import time
+import unittest
+from lww_element_graph import LWW_Element_Graph
+
+
+class Test_LWW_Element_Graph_Snapshot(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Builds a graph with removed vertices and edges, and a path for its snapshot.
+        """
+        current_timestamp = time.time()
+        self.graph = LWW_Element_Graph({})
+        for vertex in range(1, 6):
+            self.graph.add_vertex(vertex, current_timestamp)
+        self.graph.add_edge((1, 2), current_timestamp)
+        self.graph.add_edge((3, 2), current_timestamp)
+        self.graph.add_edge((4, 5), current_timestamp)
+        self.graph.remove_vertex(5, current_timestamp + 100)
+        self.graph.remove_edge((1, 2), current_timestamp + 100)
+        self.graph.remove_vertex(6, current_timestamp + 100)
+        directory = tempfile.mkdtemp()
+        self.path = os.path.join(directory, 'graph.lwwg')
+        self.addCleanup(os.rmdir, directory)
+        self.addCleanup(lambda: os.path.exists(self.path) and os.remove(self.path))
+
+    def test_save_load(self):
+        """
+        This method tests that loading a snapshot gives back the same state.
+        """
+        self.graph.save(self.path)
+        loaded = LWW_Element_Graph.load(self.path)
+        for lww_set in ('add_vertex_set', 'remove_vertex_set', 'add_edge_set', 'remove_edge_set'):
+            self.assertEqual(getattr(loaded, lww_set), getattr(self.graph, lww_set))
+        self.assertEqual(loaded.adjacency_list, self.graph.adjacency_list)
+
+    def test_mapped_load(self):
+        """
+        This method tests the queries of a memory-mapped snapshot.
+        """
+        self.graph.save(self.path)
+        with LWW_Element_Graph.load(self.path, mmap=True) as mapped:
+            self.assertEqual(mapped.get_vertices(), [1, 2, 3, 4])
+            self.assertTrue(mapped.check_vertex_exists(1))
+            self.assertFalse(mapped.check_vertex_exists(5))
+            self.assertFalse(mapped.check_vertex_exists(6))
+            self.assertFalse(mapped.check_vertex_exists('1'))
+            self.assertTrue(mapped.check_edge_exists((3, 2)))
+            self.assertFalse(mapped.check_edge_exists((1, 2)))
+            self.assertFalse(mapped.check_edge_exists((4, 5)))
+            self.assertEqual(mapped.query_vertices(2), [3])
+            self.assertEqual(mapped.query_vertices(4), [])
+            self.assertIsNone(mapped.query_vertices(5))
+
+    def test_save_non_integer_vertices(self):
+        """
+        This method tests that only integer vertex ids can be saved.
+        """
+        self.graph.add_vertex('a', time.time())
+        self.assertRaises(TypeError, self.graph.save, self.path)
+        self.assertFalse(os.path.exists(self.path))
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,5 +1,6 @@
 import unittest
-from lww_element_graph import LWW_Element_Graph
+from lww_element_graph import Delta, EventCounter, LWW_Element_Graph, LWW_SETS, canonical_edge
+from lww_element_graph_testing import random_graph
 import time
 
 
@@ -309,6 +310,451 @@ class Test_LWW_Element_Graph(unittest.TestCase):
         graph = LWW_Element_Graph({})
         self.assertEqual(graph.remove_edge([1, 2, 3], current_timestamp), None)
 
+    def test_deltas_since(self):
+        """
+        This method tests that deltas_since only returns the elements written after the given version.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({}, delta_mode=True)
+        graph.add_vertex(1, current_timestamp)
+        graph.add_vertex(2, current_timestamp)
+        version = graph.version
+        graph.add_vertex(3, current_timestamp)
+        graph.add_edge((1, 3), current_timestamp)
+        graph.remove_vertex(2, current_timestamp + 100)
+        delta = graph.deltas_since(version)
+        self.assertEqual(delta.version, graph.version)
+        self.assertEqual(list(delta.add_vertex_set), [3])
+        self.assertEqual(list(delta.remove_vertex_set), [2])
+        self.assertEqual(list(delta.add_edge_set), [(1, 3)])
+        self.assertEqual(delta.remove_edge_set, {})
+        self.assertEqual(graph.deltas_since(graph.version).add_vertex_set, {})
+        # a version the graph never reached gets the whole state
+        self.assertEqual(sorted(graph.deltas_since(graph.version + 1).add_vertex_set), [1, 2, 3])
+
+    def test_older_remove_keeps_tombstone(self):
+        """
+        This method tests that a remove older than the stored one, on a vertex biased towards add, writes nothing.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({}, delta_mode=True)
+        graph.add_vertex(1, current_timestamp + 10)
+        self.assertFalse(graph.remove_vertex(1, current_timestamp + 5))
+        version = graph.version
+        self.assertFalse(graph.remove_vertex(1, current_timestamp + 1))
+        self.assertEqual(graph.remove_vertex_set[1], current_timestamp + 5)
+        self.assertEqual(graph.version, version)
+        self.assertEqual(graph.deltas_since(version).remove_vertex_set, {})
+
+    def test_delta_sync_converges(self):
+        """
+        This method tests that two replicas exchanging deltas end up in the same state as a full merge.
+        """
+        current_timestamp = time.time()
+        graph_a = LWW_Element_Graph({}, delta_mode=True)
+        graph_b = LWW_Element_Graph({}, delta_mode=True)
+        graph_a.add_vertex(1, current_timestamp)
+        graph_a.add_vertex(2, current_timestamp)
+        graph_b.merge_delta(graph_a.deltas_since(0))
+        synced_version = graph_a.version
+        graph_a.add_vertex(3, current_timestamp)
+        graph_a.add_edge((1, 2), current_timestamp)
+        graph_a.add_edge((2, 3), current_timestamp)
+        graph_b.add_vertex(4, current_timestamp)
+        graph_b.merge_delta(graph_a.deltas_since(synced_version))
+        graph_a.merge_delta(graph_b.deltas_since(0))
+        self.assertEqual(sorted(graph_a.get_vertices()), [1, 2, 3, 4])
+        self.assertEqual(sorted(graph_b.get_vertices()), [1, 2, 3, 4])
+        self.assertTrue(graph_b.check_edge_exists((2, 3)))
+        self.assertEqual(sorted(graph_b.query_vertices(2)), [1, 3])
+        graph_a.remove_vertex(2, current_timestamp + 100)
+        graph_b.merge_delta(graph_a.deltas_since(synced_version))
+        self.assertFalse(graph_b.check_vertex_exists(2))
+        self.assertEqual(graph_b.query_vertices(1), [])
+        self.assertEqual(graph_b.query_vertices(3), [])
+
+    def test_truncate_deltas(self):
+        """
+        This method tests that a peer behind the truncated delta buffer receives the whole state.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({}, delta_mode=True)
+        graph.add_vertex(1, current_timestamp)
+        graph.add_vertex(2, current_timestamp)
+        graph.truncate_deltas(graph.version)
+        self.assertEqual(graph.delta_buffer, [])
+        graph.add_vertex(3, current_timestamp)
+        self.assertEqual(list(graph.deltas_since(graph.delta_base).add_vertex_set), [3])
+        self.assertEqual(list(graph.deltas_since(0).add_vertex_set), [1, 2, 3])
+
+    def test_remove_vertex_updates_neighbours(self):
+        """
+        This method tests that removing a vertex unlinks it from its neighbours only,
+        and that re-adding it links back its edges that are still alive.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        for vertex in range(1, 5):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_edge((1, 3), current_timestamp)
+        graph.add_edge((3, 4), current_timestamp)
+        self.assertTrue(graph.remove_vertex(1, current_timestamp + 100))
+        self.assertEqual(graph.query_vertices(2), [])
+        self.assertEqual(graph.query_vertices(3), [4])
+        self.assertNotIn(1, graph.adjacency_list)
+        graph.add_vertex(1, current_timestamp + 200)
+        self.assertTrue(graph.check_edge_exists((1, 2)))
+        self.assertEqual(sorted(graph.query_vertices(1)), [2, 3])
+        self.assertEqual(sorted(graph.query_vertices(3)), [1, 4])
+
+    def test_remove_edge_keeps_reverse_edge(self):
+        """
+        This method tests that removing (a, b) keeps the adjacency of a live (b, a) edge.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        graph.add_vertex(1, current_timestamp)
+        graph.add_vertex(2, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_edge((2, 1), current_timestamp)
+        self.assertEqual(graph.query_vertices(1), [2])
+        graph.remove_edge((1, 2), current_timestamp + 100)
+        self.assertEqual(graph.query_vertices(1), [2])
+        graph.remove_edge((2, 1), current_timestamp + 100)
+        self.assertEqual(graph.query_vertices(1), [])
+        self.assertEqual(graph.query_vertices(2), [])
+
+    def test_merge_updates_adjacency(self):
+        """
+        This method tests that the adjacency list matches the merged timestamp sets.
+        """
+        current_timestamp = time.time()
+        graph_a = LWW_Element_Graph({})
+        graph_b = LWW_Element_Graph({})
+        for graph in (graph_a, graph_b):
+            graph.add_vertex(1, current_timestamp)
+            graph.add_vertex(2, current_timestamp)
+            graph.add_vertex(3, current_timestamp)
+        graph_a.add_edge((1, 2), current_timestamp)
+        graph_b.add_edge((2, 3), current_timestamp)
+        graph_b.remove_vertex(1, current_timestamp + 100)
+        graph_a.merge(graph_b)
+        self.assertFalse(graph_a.check_vertex_exists(1))
+        self.assertEqual(graph_a.query_vertices(2), [3])
+        self.assertEqual(graph_a.query_vertices(3), [2])
+        graph_b.add_vertex(4, current_timestamp)
+        self.assertNotIn(4, graph_a.adjacency_list)
+
+    def test_find_path_long_chain(self):
+        """
+        This method tests that find_path works on chains longer than the recursion limit.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        for vertex in range(5000):
+            graph.add_vertex(vertex, current_timestamp)
+        for vertex in range(4999):
+            graph.add_edge((vertex, vertex + 1), current_timestamp)
+        self.assertEqual(graph.find_path(0, 4999), list(range(5000)))
+        self.assertEqual(graph.distances(0)[4999], 4999)
+
+    def test_shortest_path(self):
+        """
+        This method tests that the shortest path only goes through live vertices and edges.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        for vertex in range(1, 7):
+            graph.add_vertex(vertex, current_timestamp)
+        for edge in [(1, 2), (2, 3), (3, 4), (1, 5), (5, 4), (4, 6)]:
+            graph.add_edge(edge, current_timestamp)
+        self.assertEqual(graph.shortest_path(1, 6), [1, 5, 4, 6])
+        graph.remove_vertex(5, current_timestamp + 100)
+        self.assertEqual(graph.shortest_path(1, 6), [1, 2, 3, 4, 6])
+        graph.remove_edge((3, 4), current_timestamp + 100)
+        self.assertIsNone(graph.shortest_path(1, 6))
+        self.assertFalse(graph.is_reachable(1, 6))
+        self.assertTrue(graph.is_reachable(4, 6))
+        self.assertIsNone(graph.shortest_path(1, 5))
+        self.assertEqual(graph.find_path(1, 3, [0]), [0, 1, 2, 3])
+
+    def test_connected_components(self):
+        """
+        This method tests the connected component queries of the graph.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        for vertex in range(1, 6):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_edge((3, 4), current_timestamp)
+        self.assertEqual(graph.connected_component(1), {1, 2})
+        self.assertEqual(graph.connected_component(7), set())
+        self.assertEqual(sorted(map(sorted, graph.connected_components())), [[1, 2], [3, 4], [5]])
+        self.assertEqual(graph.distances(3, max_depth=0), {3: 0})
+
+    def test_apply_batch(self):
+        """
+        This method tests that a batch keeps the latest timestamp of every element and matches the single operations.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        result = graph.apply_batch([
+            ('add_vertex', 1, current_timestamp),
+            ('add_vertex', 2, current_timestamp),
+            ('add_vertex', 3, current_timestamp),
+            ('add_edge', (1, 2), current_timestamp),
+            ('add_edge', (2, 3), current_timestamp),
+            ('remove_vertex', 3, current_timestamp + 10),
+            ('add_vertex', 3, current_timestamp + 5),
+            ('remove_edge', (1, 2), current_timestamp - 10),
+            ('move_vertex', 4, current_timestamp),
+            ('add_edge', 5, current_timestamp),
+            ('add_vertex', [6], current_timestamp),
+        ])
+        self.assertEqual(result, (11, 3, 2, 3))
+        self.assertEqual(graph.add_vertex_set[3], current_timestamp + 5)
+        self.assertEqual(sorted(graph.get_vertices()), [1, 2])
+        self.assertTrue(graph.check_edge_exists((1, 2)))
+        self.assertFalse(graph.check_edge_exists((2, 3)))
+        self.assertEqual(graph.query_vertices(2), [1])
+
+        result = graph.apply_batch([
+            ('add_vertex', 7, None),
+            ('add_vertex', 1, 'later'),
+            ('add_vertex', 8),
+            ('add_vertex', 9, current_timestamp, 'extra'),
+            ('add_vertex', 10, current_timestamp),
+        ])
+        self.assertEqual(result, (5, 1, 0, 4))
+        self.assertNotIn(7, graph.add_vertex_set)
+        graph.remove_vertex(1, current_timestamp + 20)
+        self.assertEqual(sorted(graph.get_vertices()), [2, 10])
+
+    def test_add_vertices_and_edges(self):
+        """
+        This method tests the bulk helpers, edges added before their vertices show up once the vertices are added.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        graph.add_edges([(1, 2), (2, 3)], current_timestamp)
+        self.assertFalse(graph.check_edge_exists((1, 2)))
+        self.assertEqual(graph.add_vertices([1, 2, 3], current_timestamp).changed_vertices, 3)
+        self.assertTrue(graph.check_edge_exists((1, 2)))
+        self.assertEqual(sorted(graph.query_vertices(2)), [1, 3])
+        self.assertEqual(graph.find_path(1, 3), [1, 2, 3])
+
+    def test_collect_garbage(self):
+        """
+        This method tests that garbage collection purges the elements removed before the watermark
+        and the dominated tombstones without changing the graph.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        for vertex in range(1, 6):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_edge((2, 3), current_timestamp)
+        graph.remove_edge((1, 2), current_timestamp + 10)
+        graph.remove_vertex(3, current_timestamp + 10)
+        graph.remove_vertex(4, current_timestamp - 10)
+        graph.remove_vertex(5, current_timestamp + 1000)
+        graph.remove_vertex(6, current_timestamp + 10)
+        vertices = sorted(graph.get_vertices())
+        self.assertEqual(LWW_Element_Graph.stable_watermark([current_timestamp + 100, current_timestamp + 500]),
+                         current_timestamp + 100)
+        result = graph.collect_garbage(current_timestamp + 100)
+        self.assertEqual(result[:3], (2, 1, 1))
+        self.assertGreater(result.bytes_reclaimed, 0)
+        self.assertEqual(sorted(graph.get_vertices()), vertices)
+        self.assertEqual(sorted(graph.add_vertex_set), [1, 2, 4, 5])
+        self.assertEqual(sorted(graph.remove_vertex_set), [5])
+        self.assertEqual(list(graph.add_edge_set), [(2, 3)])
+        self.assertEqual(graph.remove_edge_set, {})
+        self.assertNotIn(1, graph.incident_edges)
+        graph.add_vertex(3, current_timestamp + 200)
+        self.assertTrue(graph.check_edge_exists((2, 3)))
+        self.assertEqual(sorted(graph.query_vertices(2)), [3])
+
+
+    def test_live_view(self):
+        """
+        This method tests that the live vertices, edges and counts follow adds, removals and merges.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        graph.add_vertices(range(1, 5), current_timestamp)
+        graph.add_edges([(1, 2), (2, 3), (3, 4)], current_timestamp)
+        vertices = graph.live_vertices()
+        self.assertEqual((len(graph), graph.vertex_count(), graph.edge_count()), (4, 4, 3))
+        self.assertIn(3, graph)
+        graph.remove_vertex(3, current_timestamp + 10)
+        self.assertNotIn(3, graph)
+        self.assertEqual(sorted(vertices), [1, 2, 4])
+        self.assertEqual(list(graph.live_edges()), [(1, 2)])
+        self.assertFalse(graph.check_edge_exists((2, 3)))
+        replica = LWW_Element_Graph({})
+        replica.add_vertex(3, current_timestamp + 20)
+        graph.merge(replica)
+        self.assertEqual(sorted(graph.live_edges()), [(1, 2), (2, 3), (3, 4)])
+        graph.remove_edge((1, 2), current_timestamp + 10)
+        self.assertEqual((len(graph), graph.edge_count()), (4, 2))
+        self.assertFalse(graph.check_edge_exists((1, 2)))
+
+
+    def test_event_listeners(self):
+        """
+        This method tests that the listeners receive the outcome of every single operation until unsubscribed.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        events = []
+        counter = graph.subscribe(EventCounter())
+        graph.subscribe(lambda event, element, timestamp: events.append((event, element)))
+        graph.add_vertex(1, current_timestamp)
+        graph.add_vertex(1, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_vertex(2, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.remove_edge((1, 2), current_timestamp + 10)
+        graph.remove_vertex(3, current_timestamp)
+        self.assertEqual(events, [('vertex_added', 1), ('vertex_exists', 1), ('invalid_vertices', (1, 2)),
+                                  ('vertex_added', 2), ('edge_added', (1, 2)), ('edge_removed', (1, 2)),
+                                  ('vertex_missing', 3)])
+        self.assertEqual(counter['vertex_added'], 2)
+        graph.unsubscribe(counter)
+        graph.remove_vertex(2, current_timestamp + 10)
+        self.assertEqual(counter['vertex_removed'], 0)
+        self.assertEqual(events[-1], ('vertex_removed', 2))
+
+    def test_stream_state(self):
+        """
+        This method tests that a graph streamed in bounded chunks is rebuilt with the same state.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({})
+        for vertex in range(10):
+            graph.add_vertex(vertex, current_timestamp)
+        for vertex in range(9):
+            graph.add_edge((vertex, vertex + 1), current_timestamp)
+        graph.remove_vertex(4, current_timestamp + 1)
+        graph.remove_vertex(20, current_timestamp + 1)
+        graph.remove_edge((7, 8), current_timestamp + 1)
+        self.assertEqual(sorted(graph.iter_vertices()), sorted(graph.get_vertices()))
+        self.assertEqual(set(graph.iter_edges()), set(graph.live_edges()))
+        chunks = list(graph.iter_state(chunk_size=4))
+        self.assertTrue(all(1 <= len(chunk.rows) <= 4 for chunk in chunks))
+        self.assertEqual([chunk.kind for chunk in chunks], ['vertices'] * 3 + ['edges'] * 3)
+        self.assertIn((20, None, current_timestamp + 1), chunks[2].rows)
+        copy = LWW_Element_Graph({}).load_stream(iter(chunks))
+        for lww_set in LWW_SETS:
+            self.assertEqual(getattr(copy, lww_set), getattr(graph, lww_set))
+        self.assertEqual(copy.adjacency_list, graph.adjacency_list)
+        self.assertEqual(str(LWW_Element_Graph({}).load_stream(graph.iter_state())), str(graph))
+        self.assertEqual(str(LWW_Element_Graph({1: {2}})), '1:\t{2}\n')
+        self.assertRaises(ValueError, graph.iter_state, 0)
+
+
+    def test_undirected_canonical_edges(self):
+        """
+        This method tests that an undirected graph keys (a, b) and (b, a) as the same edge.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({}, directed=False)
+        for vertex in (1, 2, 'a'):
+            graph.add_vertex(vertex, current_timestamp)
+        self.assertTrue(graph.add_edge((2, 1), current_timestamp))
+        self.assertFalse(graph.add_edge((1, 2), current_timestamp))
+        self.assertTrue(graph.check_edge_exists((1, 2)))
+        self.assertEqual(list(graph.add_edge_set), [(1, 2)])
+        self.assertTrue(graph.remove_edge((1, 2), current_timestamp + 1))
+        self.assertFalse(graph.check_edge_exists((2, 1)))
+        self.assertEqual(graph.query_vertices(1), [])
+        graph.add_edge(('a', 1), current_timestamp + 2)
+        self.assertTrue(graph.check_edge_exists((1, 'a')))
+        self.assertEqual(graph.apply_batch([('remove_edge', ('a', 1), current_timestamp + 3)]).changed_edges, 1)
+        self.assertEqual(graph.edge_count(), 0)
+        # sets are only ordered by inclusion
+        first, second, superset = frozenset({1}), frozenset({2}), frozenset({1, 2})
+        for vertex in (first, second, superset):
+            graph.add_vertex(vertex, current_timestamp)
+        for edge in ((second, first), (superset, first)):
+            self.assertEqual(canonical_edge(edge), canonical_edge(edge[::-1]))
+            self.assertEqual(canonical_edge(canonical_edge(edge)), canonical_edge(edge))
+            self.assertTrue(graph.add_edge(edge, current_timestamp))
+            self.assertTrue(graph.check_edge_exists(edge[::-1]))
+            self.assertTrue(graph.remove_edge(edge, current_timestamp + 1))
+            self.assertFalse(graph.check_edge_exists(edge))
+
+    def test_directed_graph(self):
+        """
+        This method tests the successors, predecessors and paths of a directed graph, also after a merge.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({}, directed=True)
+        for vertex in range(1, 5):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_edge((2, 3), current_timestamp)
+        graph.add_edge((3, 2), current_timestamp)
+        self.assertEqual(graph.query_vertices(2), [3])
+        self.assertEqual(sorted(graph.query_predecessors(2)), [1, 3])
+        self.assertEqual(graph.find_path(1, 3), [1, 2, 3])
+        self.assertIsNone(graph.find_path(3, 1))
+        self.assertEqual(graph.distances(3), {3: 0, 2: 1})
+        self.assertEqual(sorted(map(sorted, graph.connected_components())), [[1, 2, 3], [4]])
+        graph.remove_edge((2, 3), current_timestamp + 1)
+        self.assertEqual(graph.query_vertices(2), [])
+        self.assertEqual(graph.query_vertices(3), [2])
+        replica = LWW_Element_Graph({}, directed=True)
+        replica.merge(graph)
+        replica.remove_vertex(2, current_timestamp + 2)
+        self.assertEqual(replica.query_vertices(1), [])
+        self.assertEqual(replica.query_predecessors(3), [])
+        self.assertEqual(replica.edge_count(), 0)
+        replica.add_vertex(2, current_timestamp + 3)
+        self.assertEqual(replica.query_vertices(3), [2])
+        self.assertEqual(replica.query_predecessors(2), [1, 3])
+
+    def test_multi_edges(self):
+        """
+        This method tests that labeled edges between the same vertices live and die independently.
+        """
+        current_timestamp = time.time()
+        graph = LWW_Element_Graph({}, directed=False, multi=True)
+        graph.add_vertex(1, current_timestamp)
+        graph.add_vertex(2, current_timestamp)
+        self.assertTrue(graph.add_edge((1, 2, 'road'), current_timestamp))
+        self.assertTrue(graph.add_edge((2, 1, 'rail'), current_timestamp))
+        self.assertIsNone(graph.add_edge((1, 2), current_timestamp))
+        self.assertEqual(graph.edge_count(), 2)
+        self.assertTrue(graph.check_edge_exists((2, 1, 'road')))
+        graph.remove_edge((1, 2, 'road'), current_timestamp + 1)
+        self.assertEqual(graph.query_vertices(1), [2])
+        graph.remove_edge((1, 2, 'rail'), current_timestamp + 1)
+        self.assertEqual(graph.query_vertices(1), [])
+        graph.add_edge((1, 2, 'air'), current_timestamp + 2)
+        graph.remove_vertex(2, current_timestamp + 3)
+        self.assertEqual(graph.edge_count(), 0)
+        with self.assertRaises(ValueError):
+            LWW_Element_Graph({}, compact=True, multi=True)
+
+    def test_merge_adjacency_matches_rebuild(self):
+        """
+        This method tests that the adjacency patched by merges of diverged replicas is the one rebuilt from the
+        merged timestamp sets, in every edge mode.
+        """
+        for mode in ({}, {'directed': False}, {'directed': True}, {'directed': False, 'multi': True}):
+            labels = 'abc' if mode.get('multi') else None
+            replicas = [random_graph(seed, count=300, vertices=30, labels=labels, **mode) for seed in range(3)]
+            merged = replicas[0].merge(replicas[1]).merge(replicas[2])
+            rebuilt = LWW_Element_Graph({}, **mode).replace_state(
+                Delta(None, *(dict(getattr(merged, lww_set)) for lww_set in LWW_SETS)))
+            self.assertEqual(merged.adjacency_list, rebuilt.adjacency_list, mode)
+            self.assertEqual(merged.predecessors, rebuilt.predecessors, mode)
+            self.assertEqual(merged.live_edge_set, rebuilt.live_edge_set, mode)
+
 
 if __name__ == '__main__':
     unittest.main(verbosity=2)
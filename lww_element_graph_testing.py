@@ -0,0 +1,70 @@
+"""
+This module contains the helpers shared by the tests of the (Last-Write-Wins)LWW-element-graph: random replicas and
+the assertions comparing them.
+"""
+import random
+
+from lww_element_graph import LWW_Element_Graph, LWW_SETS
+
+OPERATIONS = ('add_vertex', 'remove_vertex', 'add_edge', 'remove_edge')
+
+
+def random_operations(seed, count=2000, vertices=100, timestamp=1000.0, spread=100, first_vertex=0,
+                      operations=OPERATIONS, labels=None) -> list:
+    """
+    :param seed: seed of the random generator, the same seed gives the same operations.
+    :param count: number of random operations following the addition of every vertex.
+    :param vertices: number of vertices, first_vertex to first_vertex + vertices - 1, all added first at timestamp.
+    :param timestamp: lowest timestamp of the operations.
+    :param spread: the random operations take timestamps from timestamp to timestamp + spread - 1, the replicas
+                   built from a small spread tie on many timestamps.
+    :param operations: operations to choose from.
+    :param labels: sequence of the labels of the edges of a multi-edge graph, None for pairs of vertices.
+    :return: list of (operation, element, timestamp), for apply_batch or the single operation methods.
+    """
+    rng = random.Random(seed)
+    ids = range(first_vertex, first_vertex + vertices)
+    result = [('add_vertex', vertex, timestamp) for vertex in ids]
+    for _ in range(count):
+        operation = rng.choice(operations)
+        if operation.endswith('vertex'):
+            element = rng.choice(ids)
+        else:
+            element = (rng.choice(ids), rng.choice(ids))
+            if labels:
+                element += (rng.choice(labels),)
+        result.append((operation, element, timestamp + rng.randrange(spread)))
+    return result
+
+
+def random_graph(seed, count=2000, vertices=100, timestamp=1000.0, spread=100, first_vertex=0, operations=OPERATIONS,
+                 labels=None, **kwargs) -> LWW_Element_Graph:
+    """
+    :param kwargs: arguments of the graph, the others being the ones of random_operations.
+    :return: graph holding the random operations, applied by apply_batch.
+    """
+    graph = LWW_Element_Graph({}, **kwargs)
+    graph.apply_batch(random_operations(seed, count, vertices, timestamp, spread, first_vertex, operations, labels))
+    return graph
+
+
+def live_state(graph) -> tuple:
+    """
+    :return: tuple of the adjacency list, the predecessors and the live edges of a graph or a snapshot, deep copied.
+    """
+    return ({vertex: set(neighbours) for vertex, neighbours in graph.adjacency_list.items()},
+            {vertex: set(neighbours) for vertex, neighbours in graph.predecessors.items()}, set(graph.live_edge_set))
+
+
+class StateAssertions:
+    """
+    Assertions of the test cases comparing replicas, mixed into unittest.TestCase.
+    """
+
+    def assertSameState(self, graph, expected, msg=None):
+        """
+        Asserts that both graphs hold the same timestamp sets, whatever their storage, and the same live state.
+        """
+        for lww_set in LWW_SETS:
+            self.assertEqual(dict(getattr(graph, lww_set)), dict(getattr(expected, lww_set)), msg or lww_set)
+        self.assertEqual(live_state(graph), live_state(expected), msg)
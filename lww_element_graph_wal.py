@@ -0,0 +1,181 @@
+"""
+This module contains the append-only operation log (write-ahead log) of the (Last-Write-Wins)LWW-element-graph.
+
+Every write into the four timestamp sets of a graph is appended to the log as a frame:
+    uint32 payload length, uint32 CRC-32 of the payload, payload
+with the payload made of the uint8 index of the set in LWW_SETS, the timestamp and the element.
+Frames are buffered and written in groups; a torn or corrupt tail left by a crash is dropped on recovery.
+A crash loses the writes still buffered, whatever the fsync policy: at most group_size - 1 writes, none of them
+older than fsync_interval seconds when the next append comes. The last writes before a pause stay buffered until
+the next append, sync() or close(). With the 'interval' and 'never' policies the operating system may also lose the
+committed writes which are not fsync'ed yet.
+"""
+import logging
+import os
+import struct
+import time
+import types
+import zlib
+
+from lww_element_graph import BATCH_OPERATIONS, LWW_SETS
+from lww_element_graph_codec import decode_element, decode_timestamp, encode_element, encode_timestamp
+from lww_element_graph_snapshot import load_snapshot, save_snapshot
+
+FRAME = struct.Struct('<II')
+FSYNC_POLICIES = ('always', 'interval', 'never')
+logger = logging.getLogger(__name__)
+OPERATIONS = {lww_set: operation for operation, lww_set in BATCH_OPERATIONS.items()}
+
+
+class OperationLog:
+    """
+    Append-only log of the writes of a graph, with group commit and snapshot compaction.
+    The snapshot of the log at path is kept at path + '.snapshot'.
+    """
+
+    def __init__(self, path, fsync='interval', group_size=256, fsync_interval=1.0):
+        """
+        :param path: path of the log file, created if missing.
+        :param fsync: 'always' to fsync every group commit, 'interval' to fsync at most every fsync_interval
+                      seconds, 'never' to leave it to the operating system.
+        :param group_size: number of buffered writes triggering a group commit.
+        :param fsync_interval: seconds between two fsync with the 'interval' policy, and after which an append
+                               commits the buffered writes whatever their number.
+        """
+        if fsync not in FSYNC_POLICIES:
+            raise ValueError('fsync must be one of %s' % ', '.join(FSYNC_POLICIES))
+        self.path = path
+        self.snapshot_path = path + '.snapshot'
+        self.fsync = fsync
+        self.group_size = group_size
+        self.fsync_interval = fsync_interval
+        self.file = open(path, 'ab')
+        self.pending = bytearray()
+        self.pending_count = 0
+        self.last_fsync = self.last_commit = time.monotonic()
+
+    def append(self, lww_set, element, timestamp):
+        """
+        Buffers one write, the buffer is committed once it holds group_size writes or fsync_interval seconds
+        passed since the last commit.
+        :param lww_set: name of the timestamp set, one of LWW_SETS.
+        :param element: vertex or edge.
+        :param timestamp: stored timestamp.
+        """
+        payload = bytearray((LWW_SETS.index(lww_set),))
+        encode_timestamp(timestamp, payload)
+        encode_element(element, payload)
+        self.pending += FRAME.pack(len(payload), zlib.crc32(payload))
+        self.pending += payload
+        self.pending_count += 1
+        if self.pending_count >= self.group_size or time.monotonic() - self.last_commit >= self.fsync_interval:
+            self.commit()
+
+    def commit(self):
+        """
+        Writes the buffered frames to the log file and applies the fsync policy.
+        """
+        if self.pending:
+            self.file.write(self.pending)
+            self.pending.clear()
+            self.pending_count = 0
+        self.file.flush()
+        self.last_commit = time.monotonic()
+        if self.fsync == 'always' or \
+                (self.fsync == 'interval' and time.monotonic() - self.last_fsync >= self.fsync_interval):
+            os.fsync(self.file.fileno())
+            self.last_fsync = time.monotonic()
+
+    def sync(self):
+        """
+        Commits the buffered frames and forces them to disk whatever the fsync policy.
+        """
+        self.commit()
+        os.fsync(self.file.fileno())
+        self.last_fsync = time.monotonic()
+
+    def close(self):
+        """
+        Commits the buffered frames and closes the log file.
+        """
+        if not self.file.closed:
+            self.sync()
+            self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def read(self):
+        """
+        Reads the committed frames of the log, stopping at the first torn or corrupt frame.
+        :return: tuple of the list of (operation, element, timestamp) and the size of the valid part of the log.
+        """
+        with open(self.path, 'rb') as log:
+            data = log.read()
+        operations = []
+        offset = 0
+        while offset + FRAME.size <= len(data):
+            length, checksum = FRAME.unpack_from(data, offset)
+            start = offset + FRAME.size
+            payload = data[start:start + length]
+            if len(payload) < length or zlib.crc32(payload) != checksum:
+                break
+            try:
+                timestamp, position = decode_timestamp(payload, 1)
+                element, position = decode_element(payload, position)
+                operation = OPERATIONS[LWW_SETS[payload[0]]]
+            except (IndexError, ValueError, struct.error, UnicodeDecodeError):
+                break
+            operations.append((operation, element, timestamp))
+            offset = start + length
+        return operations, offset
+
+    def recover(self, graph):
+        """
+        Rebuilds the graph from the snapshot and the log, drops the torn tail of the log if any,
+        then attaches the log to the graph so its next writes are logged.
+        :param graph: empty LWW_Element_Graph.
+        :return: BatchResult of the replay of the log.
+        """
+        self.commit()
+        graph.operation_log = None
+        if os.path.exists(self.snapshot_path):
+            load_snapshot(graph, self.snapshot_path)
+        operations, valid_size = self.read()
+        if valid_size < os.path.getsize(self.path):
+            logger.warning('dropping %d bytes of torn log tail', os.path.getsize(self.path) - valid_size)
+            self.file.truncate(valid_size)
+        result = graph.apply_batch(operations)
+        graph.operation_log = self
+        return result
+
+    def compact(self, graph):
+        """
+        Folds the log into a new snapshot of the graph and empties the log.
+        Tombstones dominated by an add of the same element are left out of the snapshot, they can never win.
+        The snapshot format only holds integer vertex ids.
+        :param graph: LWW_Element_Graph the log is attached to.
+        """
+        self.sync()
+        state = types.SimpleNamespace(
+            add_vertex_set=graph.add_vertex_set,
+            remove_vertex_set=_live_tombstones(graph.remove_vertex_set, graph.add_vertex_set),
+            add_edge_set=graph.add_edge_set,
+            remove_edge_set=_live_tombstones(graph.remove_edge_set, graph.add_edge_set),
+            adjacency_list=graph.adjacency_list,
+        )
+        save_snapshot(state, self.snapshot_path)
+        # a crash before the truncation only replays writes already in the snapshot
+        self.file.truncate(0)
+        self.sync()
+
+
+def _live_tombstones(remove_set, add_set) -> dict:
+    """
+    :return: the entries of remove_set which are not dominated by an entry of add_set.
+    """
+    return {element: removed for element, removed in remove_set.items()
+            if element not in add_set or removed > add_set[element]}
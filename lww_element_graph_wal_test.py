@@ -0,0 +1,119 @@
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from lww_element_graph import LWW_Element_Graph
+from lww_element_graph_wal import OperationLog
+
+
+class Test_LWW_Element_Graph_WAL(unittest.TestCase):
+
+    def setUp(self):
+        """
+        Creates a directory for the log files.
+        """
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.path = os.path.join(directory, 'graph.log')
+
+    def recover(self, **kwargs):
+        """
+        Recovers a new graph from the log.
+        :return: tuple of the graph, the log and the result of the replay.
+        """
+        graph = LWW_Element_Graph({})
+        log = OperationLog(self.path, **kwargs)
+        self.addCleanup(log.close)
+        return graph, log, log.recover(graph)
+
+    def populate(self, graph, current_timestamp):
+        """
+        Applies vertex and edge additions and removals to the graph.
+        """
+        for vertex in range(1, 5):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.add_edge((2, 3), current_timestamp)
+        graph.add_edge((3, 4), current_timestamp)
+        graph.remove_edge((3, 4), current_timestamp + 100)
+        graph.remove_vertex(1, current_timestamp + 100)
+        graph.add_vertex('five', current_timestamp)
+
+    def test_recover(self):
+        """
+        This method tests that a graph recovered from the log has the state of the logged graph.
+        """
+        current_timestamp = time.time()
+        graph, log, result = self.recover(group_size=4)
+        self.assertEqual(result.operations, 0)
+        self.populate(graph, current_timestamp)
+        log.close()
+        recovered, _, result = self.recover()
+        self.assertEqual(result.operations, 10)
+        for lww_set in ('add_vertex_set', 'remove_vertex_set', 'add_edge_set', 'remove_edge_set'):
+            self.assertEqual(getattr(recovered, lww_set), getattr(graph, lww_set))
+        self.assertEqual(recovered.adjacency_list, graph.adjacency_list)
+        self.assertIs(recovered.operation_log.path, self.path)
+
+    def test_recover_torn_tail(self):
+        """
+        This method tests that a torn frame at the end of the log is dropped on recovery.
+        """
+        current_timestamp = time.time()
+        graph, log, _ = self.recover(fsync='always', group_size=1)
+        graph.add_vertex(1, current_timestamp)
+        graph.add_vertex(2, current_timestamp)
+        log.close()
+        with open(self.path, 'r+b') as file:
+            file.truncate(os.path.getsize(self.path) - 3)
+        recovered, log, result = self.recover()
+        self.assertEqual(result.operations, 1)
+        self.assertEqual(recovered.get_vertices(), [1])
+        recovered.add_vertex(3, current_timestamp)
+        log.close()
+        recovered, _, _ = self.recover()
+        self.assertEqual(sorted(recovered.get_vertices()), [1, 3])
+
+    def test_compact(self):
+        """
+        This method tests that compaction empties the log and drops the dominated tombstones.
+        """
+        current_timestamp = time.time()
+        graph, log, _ = self.recover()
+        for vertex in range(1, 4):
+            graph.add_vertex(vertex, current_timestamp)
+        graph.add_edge((1, 2), current_timestamp)
+        graph.remove_vertex(2, current_timestamp)
+        graph.remove_vertex(3, current_timestamp + 100)
+        log.compact(graph)
+        self.assertEqual(os.path.getsize(self.path), 0)
+        graph.add_vertex(4, current_timestamp)
+        log.close()
+        recovered, _, result = self.recover()
+        self.assertEqual(result.operations, 1)
+        self.assertEqual(sorted(recovered.get_vertices()), [1, 2, 4])
+        self.assertEqual(list(recovered.remove_vertex_set), [3])
+        self.assertTrue(recovered.check_edge_exists((1, 2)))
+
+    def test_interval_commit(self):
+        """
+        This method tests that a quiet log commits its buffered writes on the first append after fsync_interval.
+        """
+        current_timestamp = time.time()
+        graph, log, _ = self.recover(group_size=256, fsync_interval=0.05)
+        graph.add_vertex(1, current_timestamp)
+        self.assertEqual(log.read()[0], [])
+        time.sleep(0.06)
+        graph.add_vertex(2, current_timestamp)
+        self.assertEqual([element for _, element, _ in log.read()[0]], [1, 2])
+
+    def test_invalid_fsync_policy(self):
+        """
+        This method tests that an unknown fsync policy is rejected.
+        """
+        self.assertRaises(ValueError, OperationLog, self.path, fsync='sometimes')
+
+
+if __name__ == '__main__':
+    unittest.main(verbosity=2)
@@ -1,3 +1,3 @@
 #!/usr/bin/sh
 
-python lww_element_graph_test.py
\ No newline at end of file
+python -m unittest discover -p "*_test.py"
\ No newline at end of file